@@ -24,6 +24,17 @@ let
   snapshotParent = name: "${snapshotRoot}/${name}";
   snapshotCurrent = name: "${snapshotParent name}/current";
 
+  # DEFAULT_CACHE_DIR in microvm_image_backup.py.
+  cacheDir = "/var/cache/microvm-image-backup";
+
+  # `current` is a fresh subvolume on every run, so borg's files cache must
+  # not compare inode/ctime or it re-reads every image.  The path itself
+  # stays stable, which is what the cache is keyed on.  The cache works per
+  # whole file: any write to a running VM's image changes its mtime, so only
+  # images of stopped or idle VMs are skipped.  This is the only copy of the
+  # mode; `backup --run` reads it from the manifest.
+  filesCacheMode = "mtime,size";
+
   qgaClient = pkgs.writers.writePython3Bin "microvm-qga" {
     flakeIgnore = [
       "E501"
@@ -31,6 +42,9 @@ let
     ];
   } (builtins.readFile ./qga_client.py);
 
+  # The backup CLI drives guest freezes in-process for `backup --run`.
+  qgaModule = pkgs.writeTextDir "lib/qga_client.py" (builtins.readFile ./qga_client.py);
+
   borgJobs = lib.mapAttrs' (
     name: machine:
     let
@@ -54,15 +68,25 @@ let
         environment = {
           BORG_RSH = "ssh -o StrictHostKeyChecking=accept-new -o UserKnownHostsFile=/root/.config/borg/known_hosts -i ${backup.sshKeyPath}";
         };
-        readWritePaths = [ snapshotRoot ];
+        # The postHook refreshes the archive index kept in cacheDir.
+        readWritePaths = [
+          snapshotRoot
+          cacheDir
+        ];
         paths = [ "${vmSnapshotCurrent}/./." ];
         prune.keep = backup.pruneKeep;
-        extraCreateArgs = [ "-p" ];
+        extraCreateArgs = [
+          "-p"
+          "--files-cache=${filesCacheMode}"
+        ];
         preHook = ''
           set -eu
 
+          # Subvolume roots always have inode 256; stat avoids the tree search
+          # that `btrfs subvolume show` performs.
           is_btrfs_subvolume() {
-            ${pkgs.btrfs-progs}/bin/btrfs subvolume show "$1" >/dev/null 2>&1
+            [ "$(${pkgs.coreutils}/bin/stat --format=%i "$1" 2>/dev/null)" = 256 ] &&
+              [ "$(${pkgs.coreutils}/bin/stat --file-system --format=%T "$1" 2>/dev/null)" = btrfs ]
           }
 
           ${pkgs.coreutils}/bin/mkdir -p '${vmSnapshotParent}'
@@ -84,14 +108,26 @@ let
         postHook = ''
           set +e
 
+          is_btrfs_subvolume() {
+            [ "$(${pkgs.coreutils}/bin/stat --format=%i "$1" 2>/dev/null)" = 256 ] &&
+              [ "$(${pkgs.coreutils}/bin/stat --file-system --format=%T "$1" 2>/dev/null)" = btrfs ]
+          }
+
           if [ -e '${vmSnapshotCurrent}' ]; then
-            if ${pkgs.btrfs-progs}/bin/btrfs subvolume show '${vmSnapshotCurrent}' >/dev/null 2>&1; then
+            if is_btrfs_subvolume '${vmSnapshotCurrent}'; then
               ${pkgs.btrfs-progs}/bin/btrfs subvolume delete '${vmSnapshotCurrent}'
             else
               echo "warning: expected snapshot path to be a btrfs subvolume: ${vmSnapshotCurrent}" >&2
             fi
           fi
 
+          # Keep the local archive index current so `list`/`search` can skip
+          # remote listings; a failure here must not fail the backup, but it
+          # must show up in the journal.
+          if ! ${backupCli}/bin/microvm-image-backup index '${name}'; then
+            echo "warning: failed to refresh the archive index for ${name}" >&2
+          fi
+
           if [ -d '${vmSnapshotParent}' ] && \
              [ -z "$(${pkgs.findutils}/bin/find '${vmSnapshotParent}' -mindepth 1 -maxdepth 1 -print -quit)" ]; then
             ${pkgs.coreutils}/bin/rmdir '${vmSnapshotParent}'
@@ -110,6 +146,11 @@ let
       repo = backup.repo;
       passFile = backup.passFile;
       sshKeyPath = backup.sshKeyPath;
+      archivePrefix = backup.archivePrefix;
+      compression = backup.compression;
+      pruneKeep = backup.pruneKeep;
+      qgaSocket = "/var/lib/microvms/${name}/qga.sock";
+      filesCache = filesCacheMode;
     }
   ) backupMachines;
 
@@ -135,12 +176,22 @@ let
         "PATH"
         ":"
         "${lib.makeBinPath runtimeInputs}"
+        "--prefix"
+        "PYTHONPATH"
+        ":"
+        "${qgaModule}/lib"
       ];
   } (builtins.readFile ./microvm_image_backup.py);
 
   backupManifest = {
-    inherit volumePath;
+    inherit volumePath snapshotRoot;
     vms = backupManifestVms;
+  }
+  // lib.optionalAttrs (registry ? previewWorkers) {
+    inherit (registry) previewWorkers;
+  }
+  // lib.optionalAttrs (registry ? previewBypassLock) {
+    inherit (registry) previewBypassLock;
   };
 in
 {
@@ -151,10 +202,52 @@ in
     if hasBackupMachines then [
       "d ${snapshotRoot} 0750 root root - -"
       "f /root/.config/borg/known_hosts 0600 root root - - "
+      "d ${cacheDir} 0700 root root - -"
       ] else [ ];
 
   services.borgbackup.jobs = borgJobs;
 
+  # Socket-activated daemon that keeps SSH masters, archive listings and info
+  # caches warm for `list`/`restore`; it exits again after being idle.
+  systemd.sockets.microvm-image-backup = lib.mkIf (backupMachines != { }) {
+    description = "MicroVM image backup control socket";
+    wantedBy = [ "sockets.target" ];
+    socketConfig = {
+      ListenStream = "/run/microvm-image-backup/control.sock";
+      SocketMode = "0600";
+      RemoveOnStop = true;
+    };
+  };
+
+  systemd.services.microvm-image-backup = lib.mkIf (backupMachines != { }) {
+    description = "MicroVM image backup daemon";
+    requires = [ "microvm-image-backup.socket" ];
+    after = [ "microvm-image-backup.socket" ];
+    serviceConfig = {
+      Type = "simple";
+      ExecStart = "${backupCli}/bin/microvm-image-backup daemon";
+    };
+  };
+
+  # Restores with deferred cleanup park old images in .restore-trash; empty
+  # it regularly instead of waiting for someone to run `cleanup` by hand.
+  systemd.services.microvm-image-backup-cleanup = lib.mkIf (backupMachines != { }) {
+    description = "Delete MicroVM images queued by deferred restores";
+    serviceConfig = {
+      Type = "oneshot";
+      ExecStart = "${backupCli}/bin/microvm-image-backup cleanup";
+    };
+  };
+
+  systemd.timers.microvm-image-backup-cleanup = lib.mkIf (backupMachines != { }) {
+    wantedBy = [ "timers.target" ];
+    timerConfig = {
+      OnCalendar = "daily";
+      Persistent = true;
+      RandomizedDelaySec = "1h";
+    };
+  };
+
   environment.etc."microvm-backup/manifest.json".text = builtins.toJSON backupManifest;
   environment.systemPackages = [
     backupCli
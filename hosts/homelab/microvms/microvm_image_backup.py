@@ -1,31 +1,86 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
 import concurrent.futures
+import contextlib
+import dataclasses
+import hashlib
 import json
 import logging
 import os
+import queue
 import random
+import resource
 import shlex
 import shutil
+import signal
 import socket
+import sqlite3
+import stat
 import subprocess
 import sys
+import tempfile
 import threading
 import time
+import urllib.parse
 from collections import deque
 from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import Callable, Mapping, Sequence
+from typing import IO, Callable, Coroutine, Generic, Iterator, Mapping, Protocol, Sequence, TypeVar
+
+import qga_client
 
 
 DEFAULT_MANIFEST_PATH = "/etc/microvm-backup/manifest.json"
+DEFAULT_CACHE_DIR = "/var/cache/microvm-image-backup"
+DEFAULT_SNAPSHOT_ROOT = "/srv/.snapshots/microvm-borg"
+BACKUP_ARCHIVE_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+BACKUP_HISTORY_SAMPLES = 5
+ARCHIVE_CACHE_VERSION = 3
+ARCHIVE_CACHE_MAX_AGE = 24 * 3600.0
+ARCHIVE_INDEX_VERSION = 4
+ARCHIVE_INDEX_FILE = "archives.sqlite3"
+ARCHIVE_INDEX_MAX_AGE = 900.0
+ARCHIVE_SORT_KEYS = ("name", "start", "duration", "size")
+INDEX_WORKERS = 4
+ARCHIVE_LIST_FORMAT = "{hostname}{username}{start}{end}{command_line}"
+PREFETCH_WINDOW = 8
 PREVIEW_SOCKET_ENV = "MICROVM_BACKUP_PREVIEW_SOCKET"
 PREVIEW_WAIT_MS = 10_000
 PREVIEW_CLEAR_SCREEN = "\x1b[2J\x1b[H"
 FETCH_WORKERS = 2
+MAX_FETCH_WORKERS = 8
+ADAPTIVE_SCALE_UP_SUCCESSES = 4
+PREVIEW_CLIENT_THREADS = 16
+PREVIEW_OUTBOX_FRAMES = 256
+FRAME_HEADER = 4
+MAX_FRAME = 1 << 24
 LOCK_RETRY_BASE_DELAY = 0.08
 LOCK_RETRY_MAX_DELAY = 0.30
+SSH_CONTROL_TIMEOUT = 30.0
+SSH_CONTROL_PERSIST = 600
+SSH_SERVER_ALIVE_INTERVAL = 15
+SSH_SERVER_ALIVE_COUNT_MAX = 3
+EXTRACT_METRICS_INTERVAL = 1.0
+EXTRACT_PROGRESS_LOG_INTERVAL = 15.0
+SUBPROCESS_LINE_LIMIT = 1 << 20
+SUBPROCESS_TERMINATE_GRACE = 5.0
+SUBPROCESS_POLL_INTERVAL = 0.05
+SUBPROCESS_FANOUT = 8
+BTRFS_SUBVOLUME_INODE = 256
+DEFAULT_DAEMON_SOCKET = "/run/microvm-image-backup/control.sock"
+DAEMON_SOCKET_ENV = "MICROVM_BACKUP_DAEMON_SOCKET"
+DAEMON_CLIENT_COMMANDS = {"list", "restore"}
+DAEMON_CLIENT_THREADS = 16
+DAEMON_IDLE_TIMEOUT = 600.0
+DAEMON_LISTING_TTL = 60.0
+SD_LISTEN_FDS_START = 3
+RESTORE_MODE_FLAGS = {"stage_only", "use_staged", "delta", "defer_cleanup"}
+STAGE_VERIFY_MODES = ("size", "sha256")
+VERIFY_READ_SIZE = 4 << 20
+VERIFY_REPORT_LIMIT = 20
 LOGGER = logging.getLogger("microvm-image-backup")
 _BORG_KNOWN_HOSTS = Path("/root/.config/borg/known_hosts")
 ANSI_RESET = "\x1b[0m"
@@ -49,12 +104,21 @@ class VmBackupConfig:
     repo: str
     pass_file: Path
     ssh_key_path: Path
+    archive_prefix: str | None = None
+    compression: str | None = None
+    prune_keep: tuple[tuple[str, str], ...] = ()
+    qga_socket: Path | None = None
+    files_cache: str | None = None
+    name: str = ""
 
 
 @dataclass(frozen=True)
 class Manifest:
     volume_path: Path
     vms: dict[str, VmBackupConfig]
+    preview_workers: int = MAX_FETCH_WORKERS
+    preview_bypass_lock: bool = False
+    snapshot_root: Path = Path(DEFAULT_SNAPSHOT_ROOT)
 
 
 @dataclass(frozen=True)
@@ -62,37 +126,99 @@ class VmPaths:
     target: Path
     stage: Path
     old: Path
+    stage_marker: Path
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ArchiveInfo:
     archive: str
-    start: str
-    end: str
-    duration: str
+    start: datetime | None
+    end: datetime | None
+    duration: float | None
     hostname: str
     username: str
     source_path: str
     command_line: str
-    file_count: str
-    original_size: str
-    compressed_size: str
-    deduplicated_size: str
+    file_count: int | None
+    original_size: int | None
+    compressed_size: int | None
+    deduplicated_size: int | None
 
+    def __post_init__(self) -> None:
+        # Archives of one VM repeat these verbatim; share one copy per value.
+        # command_line names its archive, so it is unique and left alone.
+        for name in ("hostname", "username", "source_path"):
+            object.__setattr__(self, name, sys.intern(getattr(self, name)))
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
+class ArchiveItem:
+    path: str
+    type: str
+    size: int | None
+    mtime: str
+    linktarget: str
+    sha256: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
 class ArchiveSelection:
     archive: str
     info: ArchiveInfo | None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PreviewRecord:
     status: str
     text: str
     info: ArchiveInfo | None
 
 
+@dataclass(frozen=True, slots=True)
+class StageVerification:
+    items: int
+    hashed_bytes: int
+    seconds: float
+    mismatches: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class RestoreJob:
+    vm: str
+    archive: str
+    vm_data: VmBackupConfig
+    repo_host: str
+    disk: str
+
+
+@dataclass(frozen=True)
+class BackupJob:
+    vm: str
+    vm_data: VmBackupConfig
+    repo_host: str
+    disk: str
+    expected_seconds: float | None
+
+
+class BatchJob(Protocol):
+    # Properties, so the frozen job dataclasses match read-only members.
+    @property
+    def vm(self) -> str:
+        ...
+
+    @property
+    def repo_host(self) -> str:
+        ...
+
+    @property
+    def disk(self) -> str:
+        ...
+
+
+JobT = TypeVar("JobT", bound=BatchJob)
+ResultT = TypeVar("ResultT")
+
+
 @dataclass(frozen=True)
 class AppContext:
     manifest: Manifest
@@ -100,6 +226,7 @@ class AppContext:
     btrfs: "BtrfsManager"
     borg: "BorgService"
     systemd: "SystemdManager"
+    daemon: "DaemonClient | None" = None
 
 
 class ColorLevelFormatter(logging.Formatter):
@@ -172,11 +299,23 @@ def stylize_key_value_block(text: str, *, enabled: bool) -> str:
 
 
 def ensure_root_for_privileged_command(command: str, *, dry_run: bool) -> None:
-    if command not in {"backup", "list", "restore"}:
+    if command not in {
+        "backup",
+        "list",
+        "restore",
+        "restore-batch",
+        "cleanup",
+        "daemon",
+        "index",
+        "search",
+        "stats",
+    }:
         return
-    # `list` still talks to Borg and reads root-owned credentials in dry-run mode,
-    # so only skip auto-escalation for commands that remain fully non-privileged.
-    if dry_run and command != "list":
+    # `list`, `index` and `stats` still talk to Borg and read root-owned
+    # credentials in dry-run mode, `cleanup` queries btrfs and `search` reads the root-owned
+    # index, so only skip auto-escalation for commands that remain fully
+    # non-privileged.
+    if dry_run and command not in {"list", "cleanup", "index", "search", "stats"}:
         return
     if os.geteuid() == 0:
         return
@@ -201,11 +340,21 @@ def _read_absolute_path_field(raw: object, *, field_path: str) -> Path:
     return path
 
 
-def load_manifest(manifest_override: str | None) -> Manifest:
-    manifest_path = manifest_override or os.environ.get(
-        "MICROVM_BACKUP_MANIFEST", DEFAULT_MANIFEST_PATH
+def _read_positive_int_field(raw: object, *, field_path: str) -> int:
+    if isinstance(raw, bool) or not isinstance(raw, int) or raw < 1:
+        raise CliError(f"{field_path} must be a positive integer")
+    return raw
+
+
+def _manifest_path(manifest_override: str | None) -> Path:
+    return Path(
+        manifest_override
+        or os.environ.get("MICROVM_BACKUP_MANIFEST", DEFAULT_MANIFEST_PATH)
     )
-    path = Path(manifest_path)
+
+
+def load_manifest(manifest_override: str | None) -> Manifest:
+    path = _manifest_path(manifest_override)
     if not path.exists():
         raise CliError(f"manifest file does not exist: {path}")
 
@@ -221,6 +370,22 @@ def load_manifest(manifest_override: str | None) -> Manifest:
         raw.get("volumePath"), field_path="manifest.volumePath"
     )
 
+    preview_workers = MAX_FETCH_WORKERS
+    if raw.get("previewWorkers") is not None:
+        preview_workers = _read_positive_int_field(
+            raw["previewWorkers"], field_path="manifest.previewWorkers"
+        )
+
+    preview_bypass_lock = raw.get("previewBypassLock", False)
+    if not isinstance(preview_bypass_lock, bool):
+        raise CliError("manifest.previewBypassLock must be a boolean")
+
+    snapshot_root = Path(DEFAULT_SNAPSHOT_ROOT)
+    if raw.get("snapshotRoot") is not None:
+        snapshot_root = _read_absolute_path_field(
+            raw["snapshotRoot"], field_path="manifest.snapshotRoot"
+        )
+
     raw_vms = raw.get("vms")
     if not isinstance(raw_vms, dict):
         raise CliError("manifest.vms must be an object keyed by vm name")
@@ -242,11 +407,43 @@ def load_manifest(manifest_override: str | None) -> Manifest:
             raw_vm.get("sshKeyPath"),
             field_path=f"manifest.vms.{vm_name}.sshKeyPath",
         )
+        optional: dict[str, object] = {}
+        for key, field_name in (
+            ("archivePrefix", "archive_prefix"),
+            ("compression", "compression"),
+            ("filesCache", "files_cache"),
+        ):
+            if raw_vm.get(key) is not None:
+                optional[field_name] = _read_string_field(
+                    raw_vm[key], field_path=f"manifest.vms.{vm_name}.{key}"
+                )
+        if raw_vm.get("qgaSocket") is not None:
+            optional["qga_socket"] = _read_absolute_path_field(
+                raw_vm["qgaSocket"], field_path=f"manifest.vms.{vm_name}.qgaSocket"
+            )
+        raw_keep = raw_vm.get("pruneKeep", {})
+        if not isinstance(raw_keep, dict) or any(
+            isinstance(value, bool) or not isinstance(value, (int, str))
+            for value in raw_keep.values()
+        ):
+            raise CliError(
+                f"manifest.vms.{vm_name}.pruneKeep must map keep rules to numbers or strings"
+            )
+        optional["prune_keep"] = tuple(
+            (str(key), str(value)) for key, value in sorted(raw_keep.items())
+        )
         vms[vm_name] = VmBackupConfig(
-            repo=repo, pass_file=pass_file, ssh_key_path=ssh_key_path
+            name=vm_name,
+            repo=repo, pass_file=pass_file, ssh_key_path=ssh_key_path, **optional
         )
 
-    return Manifest(volume_path=volume_path, vms=vms)
+    return Manifest(
+        volume_path=volume_path,
+        vms=vms,
+        preview_workers=preview_workers,
+        preview_bypass_lock=preview_bypass_lock,
+        snapshot_root=snapshot_root,
+    )
 
 
 def vm_paths(volume_path: Path, vm: str) -> VmPaths:
@@ -254,9 +451,18 @@ def vm_paths(volume_path: Path, vm: str) -> VmPaths:
         target=volume_path / vm,
         stage=volume_path / f".{vm}.restore-new",
         old=volume_path / f".{vm}.restore-old",
+        stage_marker=volume_path / f".{vm}.restore-new.json",
     )
 
 
+def backup_snapshot_path(snapshot_root: Path, vm: str) -> Path:
+    return snapshot_root / vm / "current"
+
+
+def deletion_queue_dir(volume_path: Path) -> Path:
+    return volume_path / ".restore-trash"
+
+
 def require_vm(manifest: Manifest, vm: str) -> VmBackupConfig:
     vm_data = manifest.vms.get(vm)
     if vm_data is None:
@@ -318,9 +524,152 @@ def _format_seconds(raw: object) -> str:
     return f"{hours}h {minutes}m {seconds}s"
 
 
+def _format_rate(raw: object) -> str:
+    if not isinstance(raw, (int, float)):
+        return "N/A"
+    return f"{_format_bytes(int(raw))}/s"
+
+
+def _format_ratio(raw: object) -> str:
+    if not isinstance(raw, (int, float)):
+        return "N/A"
+    return f"{raw:.1f}x"
+
+
+def _parse_timestamp(raw: object) -> datetime | None:
+    if isinstance(raw, datetime):
+        return raw
+    if not isinstance(raw, str) or raw == "":
+        return None
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        return None
+
+
+def _local_timestamp(value: datetime) -> str:
+    # Borg reports naive local times; aware values are converted to match.
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def _format_timestamp(value: datetime | None) -> str:
+    if value is None:
+        return "N/A"
+    return value.isoformat(sep=" ", timespec="seconds")
+
+
+def archive_info_to_json(info: ArchiveInfo) -> dict[str, object]:
+    raw = dataclasses.asdict(info)
+    for name in ("start", "end"):
+        value = raw[name]
+        raw[name] = value.isoformat() if isinstance(value, datetime) else None
+    return raw
+
+
+def archive_info_from_json(raw: object) -> ArchiveInfo | None:
+    if not isinstance(raw, dict):
+        return None
+    text_fields = ("archive", "hostname", "username", "source_path", "command_line")
+    int_fields = ("file_count", "original_size", "compressed_size", "deduplicated_size")
+    if any(not isinstance(raw.get(name), str) for name in text_fields):
+        return None
+    if any(
+        raw.get(name) is not None
+        and (isinstance(raw[name], bool) or not isinstance(raw[name], int))
+        for name in int_fields
+    ):
+        return None
+    duration = raw.get("duration")
+    if duration is not None and (
+        isinstance(duration, bool) or not isinstance(duration, (int, float))
+    ):
+        return None
+    return ArchiveInfo(
+        archive=raw["archive"],
+        start=_parse_timestamp(raw.get("start")),
+        end=_parse_timestamp(raw.get("end")),
+        duration=float(duration) if duration is not None else None,
+        hostname=raw["hostname"],
+        username=raw["username"],
+        source_path=raw["source_path"],
+        command_line=raw["command_line"],
+        file_count=raw.get("file_count"),
+        original_size=raw.get("original_size"),
+        compressed_size=raw.get("compressed_size"),
+        deduplicated_size=raw.get("deduplicated_size"),
+    )
+
+
+def sort_archive_infos(infos: Sequence[ArchiveInfo], key: str) -> list[ArchiveInfo]:
+    if key == "name":
+        return sorted(infos, key=lambda info: info.archive, reverse=True)
+    values: dict[str, Callable[[ArchiveInfo], object]] = {
+        # Compared as local ISO text so naive and aware starts can mix.
+        "start": lambda info: _local_timestamp(info.start) if info.start is not None else None,
+        "duration": lambda info: info.duration,
+        "size": lambda info: info.original_size,
+    }
+    value_of = values[key]
+    known = [info for info in infos if value_of(info) is not None]
+    unknown = [info for info in infos if value_of(info) is None]
+    # Every key sorts descending, like name: newest/longest/largest first;
+    # archives missing the field keep listing order.
+    known.sort(key=value_of, reverse=True)
+    return known + unknown
+
+
+def _seconds_between(start: object, end: object) -> float | None:
+    start_at = _parse_timestamp(start)
+    end_at = _parse_timestamp(end)
+    if start_at is None or end_at is None:
+        return None
+    try:
+        delta = end_at - start_at
+    except TypeError:
+        return None
+    return max(delta.total_seconds(), 0.0)
+
+
+class BackgroundCommand(Generic[ResultT]):
+    # Runs a runner coroutine on its own event loop thread.  Cancelling the
+    # task makes run_async terminate the child it is waiting on, so whoever
+    # holds this handle owns the process.
+    def __init__(
+        self, coro: Coroutine[object, object, ResultT], *, name: str
+    ) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(coro)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            with contextlib.suppress(BaseException):
+                # The outcome stays on the task for result().
+                self._loop.run_until_complete(self._task)
+        finally:
+            self._loop.close()
+
+    def result(self) -> ResultT:
+        self._thread.join()
+        return self._task.result()
+
+    def cancel(self) -> None:
+        if self._thread.is_alive():
+            with contextlib.suppress(RuntimeError):
+                # The loop closes as soon as the task ends on its own.
+                self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join()
+
+
 class CommandRunner:
-    def __init__(self, *, dry_run: bool) -> None:
+    def __init__(self, *, dry_run: bool, trace_path: Path | None = None) -> None:
         self.dry_run = dry_run
+        self.trace_path = trace_path
+        self.session = f"{os.getpid()}-{int(time.time())}"
+        self._trace_lock = threading.Lock()
 
     @staticmethod
     def _coerce_cmd(cmd: Sequence[object]) -> list[str]:
@@ -334,6 +683,34 @@ class CommandRunner:
         env: Mapping[str, str] | None = None,
         capture_output: bool = False,
         mutating: bool = False,
+        timeout: float | None = None,
+        on_stdout_line: Callable[[str], None] | None = None,
+        on_stderr_line: Callable[[str], None] | None = None,
+    ) -> subprocess.CompletedProcess[str]:
+        return asyncio.run(
+            self.run_async(
+                cmd,
+                cwd=cwd,
+                env=env,
+                capture_output=capture_output,
+                mutating=mutating,
+                timeout=timeout,
+                on_stdout_line=on_stdout_line,
+                on_stderr_line=on_stderr_line,
+            )
+        )
+
+    async def run_async(
+        self,
+        cmd: Sequence[object],
+        *,
+        cwd: Path | None = None,
+        env: Mapping[str, str] | None = None,
+        capture_output: bool = False,
+        mutating: bool = False,
+        timeout: float | None = None,
+        on_stdout_line: Callable[[str], None] | None = None,
+        on_stderr_line: Callable[[str], None] | None = None,
     ) -> subprocess.CompletedProcess[str]:
         cmd_list = self._coerce_cmd(cmd)
         cmd_display = shlex.join(cmd_list)
@@ -347,14 +724,179 @@ class CommandRunner:
             )
 
         LOGGER.debug("run: %s", cmd_display)
-        return subprocess.run(
+        pipe_stdout = capture_output or on_stdout_line is not None
+        pipe_stderr = capture_output or on_stderr_line is not None
+        # Spawn outside asyncio's child watcher so the exit can be reaped with
+        # wait4 and the child's own rusage recorded.
+        proc = subprocess.Popen(
             cmd_list,
             cwd=str(cwd) if cwd is not None else None,
             env=dict(env) if env is not None else None,
-            text=True,
-            capture_output=capture_output,
-            check=False,
+            stdout=subprocess.PIPE if pipe_stdout else None,
+            stderr=subprocess.PIPE if pipe_stderr else None,
+        )
+        started = time.monotonic()
+        stdout_reader, stdout_transport = await self._open_reader(proc.stdout)
+        stderr_reader, stderr_transport = await self._open_reader(proc.stderr)
+        stdout_parts: list[str] = []
+        stderr_parts: list[str] = []
+        try:
+            _, _, usage = await asyncio.wait_for(
+                asyncio.gather(
+                    self._pump(stdout_reader, stdout_parts, on_stdout_line),
+                    self._pump(stderr_reader, stderr_parts, on_stderr_line),
+                    self._wait4(proc),
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            usage = await self._terminate(proc)
+            self._record(cmd_list, proc, started, usage, outcome="timeout")
+            raise CliError(
+                f"command timed out after {timeout:g}s: {cmd_display}"
+            ) from None
+        except BaseException:
+            usage = await asyncio.shield(self._terminate(proc))
+            self._record(cmd_list, proc, started, usage, outcome="cancelled")
+            raise
+        finally:
+            for transport in (stdout_transport, stderr_transport):
+                if transport is not None:
+                    transport.close()
+
+        self._record(cmd_list, proc, started, usage, outcome="exited")
+        assert proc.returncode is not None
+        return subprocess.CompletedProcess(
+            cmd_list,
+            proc.returncode,
+            stdout="".join(stdout_parts) if capture_output else None,
+            stderr="".join(stderr_parts) if capture_output else None,
+        )
+
+    @staticmethod
+    async def _open_reader(
+        pipe: IO[bytes] | None,
+    ) -> tuple[asyncio.StreamReader | None, asyncio.BaseTransport | None]:
+        if pipe is None:
+            return None, None
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=SUBPROCESS_LINE_LIMIT, loop=loop)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader, loop=loop), pipe
+        )
+        return reader, transport
+
+    @staticmethod
+    async def _pump(
+        stream: asyncio.StreamReader | None,
+        sink: list[str],
+        on_line: Callable[[str], None] | None,
+    ) -> None:
+        if stream is None:
+            return
+        if on_line is None:
+            sink.append((await stream.read()).decode("utf-8", errors="replace"))
+            return
+        while True:
+            try:
+                raw = await stream.readline()
+            except ValueError:
+                # Overlong line: hand over what fits instead of dropping output.
+                raw = await stream.read(SUBPROCESS_LINE_LIMIT)
+            if not raw:
+                return
+            line = raw.decode("utf-8", errors="replace")
+            sink.append(line)
+            try:
+                on_line(line.rstrip("\n"))
+            except Exception:
+                LOGGER.debug("output handler failed", exc_info=True)
+
+    @staticmethod
+    async def _wait4(proc: subprocess.Popen[bytes]) -> resource.struct_rusage:
+        # Only reap once the child has exited, so cancelling this coroutine
+        # never loses the exit status.
+        pidfd: int | None = None
+        with contextlib.suppress(AttributeError, OSError):
+            pidfd = os.pidfd_open(proc.pid)
+        try:
+            while True:
+                pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                if pid != 0:
+                    proc.returncode = os.waitstatus_to_exitcode(status)
+                    return usage
+                if pidfd is None:
+                    await asyncio.sleep(SUBPROCESS_POLL_INTERVAL)
+                    continue
+                loop = asyncio.get_running_loop()
+                ready = loop.create_future()
+                loop.add_reader(
+                    pidfd, lambda: ready.done() or ready.set_result(None)
+                )
+                try:
+                    await ready
+                finally:
+                    loop.remove_reader(pidfd)
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+
+    async def _terminate(
+        self, proc: subprocess.Popen[bytes]
+    ) -> resource.struct_rusage | None:
+        if proc.returncode is not None:
+            return None
+        # Popen.terminate() polls first, which would reap the child and drop
+        # its rusage, so signal the pid directly.
+        with contextlib.suppress(ProcessLookupError):
+            os.kill(proc.pid, signal.SIGTERM)
+        try:
+            return await asyncio.wait_for(
+                self._wait4(proc), SUBPROCESS_TERMINATE_GRACE
+            )
+        except asyncio.TimeoutError:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(proc.pid, signal.SIGKILL)
+            return await self._wait4(proc)
+
+    def _record(
+        self,
+        cmd_list: list[str],
+        proc: subprocess.Popen[bytes],
+        started: float,
+        usage: resource.struct_rusage | None,
+        *,
+        outcome: str,
+    ) -> None:
+        record: dict[str, object] = {
+            "session": self.session,
+            "time": datetime.now().astimezone().isoformat(timespec="milliseconds"),
+            "cmd": cmd_list,
+            "pid": proc.pid,
+            "outcome": outcome,
+            "returncode": proc.returncode,
+            "wall_seconds": round(time.monotonic() - started, 6),
+            "user_seconds": round(usage.ru_utime, 6) if usage is not None else None,
+            "sys_seconds": round(usage.ru_stime, 6) if usage is not None else None,
+            "max_rss_kib": usage.ru_maxrss if usage is not None else None,
+        }
+        LOGGER.debug(
+            "%s: %s (exit %s, %.3fs wall, %ss user, %ss sys, %s KiB max RSS)",
+            outcome,
+            shlex.join(cmd_list),
+            record["returncode"],
+            record["wall_seconds"],
+            record["user_seconds"],
+            record["sys_seconds"],
+            record["max_rss_kib"],
         )
+        if self.trace_path is None:
+            return
+        try:
+            with self._trace_lock, self.trace_path.open("a", encoding="utf-8") as fp:
+                fp.write(json.dumps(record, sort_keys=True) + "\n")
+        except OSError as exc:
+            LOGGER.warning("failed to write command trace %s: %s", self.trace_path, exc)
 
     def check(
         self,
@@ -364,13 +906,44 @@ class CommandRunner:
         env: Mapping[str, str] | None = None,
         capture_output: bool = False,
         mutating: bool = False,
+        timeout: float | None = None,
+        on_stdout_line: Callable[[str], None] | None = None,
+        on_stderr_line: Callable[[str], None] | None = None,
+    ) -> subprocess.CompletedProcess[str]:
+        return asyncio.run(
+            self.check_async(
+                cmd,
+                cwd=cwd,
+                env=env,
+                capture_output=capture_output,
+                mutating=mutating,
+                timeout=timeout,
+                on_stdout_line=on_stdout_line,
+                on_stderr_line=on_stderr_line,
+            )
+        )
+
+    async def check_async(
+        self,
+        cmd: Sequence[object],
+        *,
+        cwd: Path | None = None,
+        env: Mapping[str, str] | None = None,
+        capture_output: bool = False,
+        mutating: bool = False,
+        timeout: float | None = None,
+        on_stdout_line: Callable[[str], None] | None = None,
+        on_stderr_line: Callable[[str], None] | None = None,
     ) -> subprocess.CompletedProcess[str]:
-        result = self.run(
+        result = await self.run_async(
             cmd,
             cwd=cwd,
             env=env,
             capture_output=capture_output,
             mutating=mutating,
+            timeout=timeout,
+            on_stdout_line=on_stdout_line,
+            on_stderr_line=on_stderr_line,
         )
         if result.returncode != 0:
             cmd_display = shlex.join(self._coerce_cmd(cmd))
@@ -384,20 +957,104 @@ class CommandRunner:
             )
         return result
 
+    def check_many(
+        self,
+        cmds: Sequence[Sequence[object]],
+        *,
+        limit: int = SUBPROCESS_FANOUT,
+        capture_output: bool = False,
+        mutating: bool = False,
+        timeout: float | None = None,
+    ) -> list[subprocess.CompletedProcess[str]]:
+        async def run_all() -> list[subprocess.CompletedProcess[str]]:
+            semaphore = asyncio.Semaphore(max(1, limit))
+
+            async def run_one(cmd: Sequence[object]) -> subprocess.CompletedProcess[str]:
+                async with semaphore:
+                    return await self.check_async(
+                        cmd,
+                        capture_output=capture_output,
+                        mutating=mutating,
+                        timeout=timeout,
+                    )
+
+            # On the first failure asyncio.run cancels the remaining siblings,
+            # which terminates their children instead of orphaning them.
+            return list(await asyncio.gather(*(run_one(cmd) for cmd in cmds)))
+
+        return asyncio.run(run_all())
+
 
 class BtrfsManager:
     def __init__(self, runner: CommandRunner) -> None:
         self.runner = runner
+        self._subvolumes: dict[Path, bool] = {}
+        self._btrfs_devices: dict[int, bool] = {}
+
+    def inspect(self, paths: Sequence[Path]) -> dict[Path, bool]:
+        # A btrfs subvolume root always has inode 256 (BTRFS_FIRST_FREE_OBJECTID),
+        # so lstat rules out most paths without forking; the filesystem type of
+        # the remaining candidates is resolved with a single `stat -f` per batch.
+        candidates: dict[Path, int] = {}
+        for path in paths:
+            if path in self._subvolumes:
+                continue
+            try:
+                st = os.lstat(path)
+            except OSError:
+                # Not cached: a missing path may well be created as a
+                # subvolume later in the same transaction.
+                continue
+            if st.st_ino != BTRFS_SUBVOLUME_INODE or not stat.S_ISDIR(st.st_mode):
+                self._subvolumes[path] = False
+                continue
+            candidates[path] = st.st_dev
+
+        unknown: dict[int, Path] = {}
+        for path, dev in candidates.items():
+            if dev not in self._btrfs_devices:
+                unknown.setdefault(dev, path)
+        if unknown:
+            probes = list(unknown.items())
+            result = self.runner.run(
+                ["stat", "--file-system", "--format=%T", *(path for _, path in probes)],
+                capture_output=True,
+            )
+            fs_types = (result.stdout or "").splitlines()
+            if result.returncode != 0 or len(fs_types) != len(probes):
+                fs_types = [self._probe_fs_type(path) for _, path in probes]
+            for (dev, _), fs_type in zip(probes, fs_types):
+                self._btrfs_devices[dev] = fs_type.strip() == "btrfs"
 
-    @staticmethod
-    def is_subvolume(path: Path) -> bool:
-        result = subprocess.run(
-            ["btrfs", "subvolume", "show", str(path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=False,
+        for path, dev in candidates.items():
+            self._subvolumes[path] = self._btrfs_devices[dev]
+        return {path: self._subvolumes.get(path, False) for path in paths}
+
+    def _probe_fs_type(self, path: Path) -> str:
+        result = self.runner.run(
+            ["stat", "--file-system", "--format=%T", str(path)], capture_output=True
         )
-        return result.returncode == 0
+        return (result.stdout or "").strip() if result.returncode == 0 else ""
+
+    def is_subvolume(self, path: Path) -> bool:
+        return self.inspect([path])[path]
+
+    def forget(self, *paths: Path) -> None:
+        for path in paths:
+            self._subvolumes.pop(path, None)
+
+    def reset(self) -> None:
+        # Paths change behind our back between transactions (other CLI runs,
+        # the borgbackup hooks), so answers only hold within one transaction.
+        self._subvolumes.clear()
+
+    def _remember(self, path: Path, is_subvolume: bool) -> None:
+        if self.runner.dry_run:
+            return
+        if is_subvolume:
+            self._subvolumes[path] = True
+        else:
+            self._subvolumes.pop(path, None)
 
     def delete_subvolume_strict_if_exists(self, path: Path, label: str) -> None:
         if not path.exists():
@@ -405,6 +1062,7 @@ class BtrfsManager:
         if not self.is_subvolume(path):
             raise CliError(f"Refusing to delete non-btrfs {label} at {path}")
         self.runner.check(["btrfs", "subvolume", "delete", str(path)], mutating=True)
+        self._remember(path, False)
 
     def cleanup_subvolume_best_effort(self, path: Path, label: str) -> None:
         if not path.exists():
@@ -417,9 +1075,93 @@ class BtrfsManager:
         )
         if result.returncode != 0:
             LOGGER.warning("failed to delete %s at %s", label, path)
+            return
+        self._remember(path, False)
 
     def create_subvolume(self, path: Path) -> None:
         self.runner.check(["btrfs", "subvolume", "create", str(path)], mutating=True)
+        self._remember(path, True)
+
+    def snapshot_subvolume(
+        self, source: Path, dest: Path, *, readonly: bool = False
+    ) -> None:
+        cmd = ["btrfs", "subvolume", "snapshot"]
+        if readonly:
+            cmd.append("-r")
+        self.runner.check([*cmd, str(source), str(dest)], mutating=True)
+        self._remember(dest, True)
+
+    def snapshot_subvolumes(
+        self, pairs: Sequence[tuple[Path, Path]], *, readonly: bool = False
+    ) -> None:
+        # Issued concurrently so a group of snapshots costs about as long as
+        # the slowest one, which is what bounds a shared freeze window.
+        flag = ["-r"] if readonly else []
+        self.runner.check_many(
+            [
+                ["btrfs", "subvolume", "snapshot", *flag, str(source), str(dest)]
+                for source, dest in pairs
+            ],
+            mutating=True,
+        )
+        for _, dest in pairs:
+            self._remember(dest, True)
+
+    def queue_deletion(self, path: Path, queue_dir: Path, label: str) -> Path | None:
+        if not path.exists():
+            return None
+        if not self.is_subvolume(path):
+            LOGGER.warning("%s at %s exists but is not a btrfs subvolume", label, path)
+            return None
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        dest = queue_dir / f"{path.name.lstrip('.')}.{stamp}"
+        if self.runner.dry_run:
+            LOGGER.info("[dry-run] mv %s -> %s", path, dest)
+            return dest
+        try:
+            queue_dir.mkdir(mode=0o700, exist_ok=True)
+            path.rename(dest)
+        except OSError as exc:
+            LOGGER.warning("failed to queue %s at %s for deletion: %s", label, path, exc)
+            return None
+        self.forget(path)
+        self._remember(dest, True)
+        return dest
+
+    @staticmethod
+    def queued_deletions(queue_dir: Path) -> list[Path]:
+        try:
+            return sorted(queue_dir.iterdir())
+        except FileNotFoundError:
+            return []
+
+    def delete_subvolumes(self, paths: Sequence[Path]) -> None:
+        if not paths:
+            return
+        # Without --commit-each this returns once the subvolumes are unlinked;
+        # the btrfs cleaner reclaims their extents in the background.
+        self.runner.check(
+            ["btrfs", "subvolume", "delete", *(str(path) for path in paths)],
+            mutating=True,
+        )
+        for path in paths:
+            self._remember(path, False)
+
+    def cleaner_backlog(self, path: Path) -> list[int]:
+        result = self.runner.check(
+            ["btrfs", "subvolume", "list", "-d", str(path)], capture_output=True
+        )
+        ids: list[int] = []
+        for line in (result.stdout or "").splitlines():
+            fields = line.split()
+            if len(fields) >= 2 and fields[0] == "ID" and fields[1].isdigit():
+                ids.append(int(fields[1]))
+        return ids
+
+    def wait_for_cleaner(self, path: Path, subvolume_ids: Sequence[int]) -> None:
+        self.runner.check(
+            ["btrfs", "subvolume", "sync", str(path), *(str(i) for i in subvolume_ids)]
+        )
 
 
 class SystemdManager:
@@ -478,53 +1220,817 @@ class SystemdManager:
                 LOGGER.warning("failed to restart VM service after rollback: %s", service)
 
 
-class BorgService:
-    def __init__(self, runner: CommandRunner) -> None:
-        self.runner = runner
+class ArchiveInfoCache:
+    # An entry is only valid while the archive with the same name and id
+    # exists.  Archives are immutable but their deduplicated size is not: it
+    # shrinks as newer archives share chunks, so entries also expire.
+    def __init__(
+        self,
+        root: Path,
+        *,
+        max_age: float = ARCHIVE_CACHE_MAX_AGE,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.root = root
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._repos: dict[str, dict[str, dict[str, object]]] = {}
+        self._dirty: set[str] = set()
+
+    def get(self, repo: str, archive: str, archive_id: str) -> ArchiveInfo | None:
+        with self._lock:
+            entry = self._load_locked(repo).get(archive)
+        if entry is None or entry.get("id") != archive_id:
+            return None
+        cached_at = entry.get("cached_at")
+        if not isinstance(cached_at, (int, float)) or self._clock() - cached_at > self.max_age:
+            return None
+        return archive_info_from_json(entry.get("info"))
+
+    def put(self, repo: str, archive: str, archive_id: str, info: ArchiveInfo) -> None:
+        # Written out by flush(), so a cold prefetch rewrites each file once
+        # instead of once per archive.
+        with self._lock:
+            entries = self._load_locked(repo)
+            entries[archive] = {
+                "id": archive_id,
+                "cached_at": self._clock(),
+                "info": archive_info_to_json(info),
+            }
+            self._dirty.add(repo)
+
+    def flush(self) -> None:
+        with self._lock:
+            for repo in sorted(self._dirty):
+                self._save_locked(repo, self._repos[repo])
+            self._dirty.clear()
+
+    def retain(self, repo: str, archive_ids: Mapping[str, str]) -> None:
+        with self._lock:
+            entries = self._load_locked(repo)
+            stale = [
+                name
+                for name, entry in entries.items()
+                if archive_ids.get(name) != entry.get("id")
+            ]
+            if not stale:
+                return
+            for name in stale:
+                del entries[name]
+            LOGGER.debug("evicting %d stale archive cache entries", len(stale))
+            self._save_locked(repo, entries)
+            self._dirty.discard(repo)
+
+    def _path(self, repo: str) -> Path:
+        digest = hashlib.sha256(repo.encode("utf-8")).hexdigest()[:32]
+        return self.root / f"{digest}.json"
+
+    def _load_locked(self, repo: str) -> dict[str, dict[str, object]]:
+        entries = self._repos.get(repo)
+        if entries is not None:
+            return entries
+
+        entries = {}
+        path = self._path(repo)
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raw = None
+        except (OSError, ValueError) as exc:
+            LOGGER.warning("ignoring unreadable archive cache %s: %s", path, exc)
+            raw = None
+
+        if (
+            isinstance(raw, dict)
+            and raw.get("version") == ARCHIVE_CACHE_VERSION
+            and raw.get("repo") == repo
+            and isinstance(raw.get("archives"), dict)
+        ):
+            for name, entry in raw["archives"].items():
+                if isinstance(name, str) and isinstance(entry, dict):
+                    entries[name] = entry
+        self._repos[repo] = entries
+        return entries
+
+    def _save_locked(self, repo: str, entries: Mapping[str, object]) -> None:
+        payload = {
+            "version": ARCHIVE_CACHE_VERSION,
+            "repo": repo,
+            "archives": entries,
+        }
+        path = self._path(repo)
+        tmp_name: str | None = None
+        try:
+            self.root.mkdir(mode=0o700, parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=self.root,
+                prefix=f".{path.name}.",
+                delete=False,
+            ) as handle:
+                tmp_name = handle.name
+                json.dump(payload, handle, separators=(",", ":"))
+            os.replace(tmp_name, path)
+        except OSError as exc:
+            LOGGER.warning("failed to write archive cache %s: %s", path, exc)
+            if tmp_name is not None:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+
+
+_ARCHIVE_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    repo TEXT PRIMARY KEY,
+    vm TEXT NOT NULL,
+    refreshed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archives (
+    repo TEXT NOT NULL,
+    vm TEXT NOT NULL,
+    name TEXT NOT NULL,
+    archive_id TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    duration_seconds REAL,
+    hostname TEXT NOT NULL,
+    username TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    command_line TEXT NOT NULL,
+    file_count INTEGER,
+    original_size INTEGER,
+    compressed_size INTEGER,
+    deduplicated_size INTEGER,
+    PRIMARY KEY (repo, name)
+);
+CREATE INDEX IF NOT EXISTS archives_start ON archives (start);
+CREATE TABLE IF NOT EXISTS created_stats (
+    repo TEXT NOT NULL,
+    name TEXT NOT NULL,
+    deduplicated_size INTEGER,
+    PRIMARY KEY (repo, name)
+);
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedArchive:
+    vm: str
+    archive_id: str
+    info: ArchiveInfo
+    # What `borg create` reported as new data; borg info's deduplicated_size
+    # shrinks as later archives share chunks, so it cannot stand in for this.
+    created_deduplicated_size: int | None = None
+
+
+class ArchiveIndex:
+    def __init__(self, path: Path, *, clock: Callable[[], float] = time.time) -> None:
+        self.path = path
+        self._clock = clock
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != ARCHIVE_INDEX_VERSION:
+                conn.executescript(
+                    "DROP TABLE IF EXISTS archives; DROP TABLE IF EXISTS repos;"
+                    "DROP TABLE IF EXISTS created_stats;"
+                    + _ARCHIVE_INDEX_SCHEMA
+                    + f"PRAGMA user_version = {ARCHIVE_INDEX_VERSION};"
+                )
+            with conn:
+                yield conn
+        except sqlite3.Error as exc:
+            raise CliError(f"archive index {self.path} failed: {exc}") from exc
+        finally:
+            conn.close()
 
     @staticmethod
-    def environment(vm_data: VmBackupConfig) -> dict[str, str]:
-        env = os.environ.copy()
-        env["BORG_REPO"] = vm_data.repo
-        env["BORG_RSH"] = (
-            "ssh "
-            "-o StrictHostKeyChecking=accept-new "
-            f"-o UserKnownHostsFile={_BORG_KNOWN_HOSTS} "
-            f"-i {vm_data.ssh_key_path}"
+    def _decode_row(row: sqlite3.Row) -> IndexedArchive:
+        info = ArchiveInfo(
+            archive=row["name"],
+            start=_parse_timestamp(row["start"]),
+            end=_parse_timestamp(row["end"]),
+            duration=row["duration_seconds"],
+            hostname=row["hostname"],
+            username=row["username"],
+            source_path=row["source_path"],
+            command_line=row["command_line"],
+            file_count=row["file_count"],
+            original_size=row["original_size"],
+            compressed_size=row["compressed_size"],
+            deduplicated_size=row["deduplicated_size"],
+        )
+        created = row["created_size"] if "created_size" in row.keys() else None
+        return IndexedArchive(
+            vm=row["vm"],
+            archive_id=row["archive_id"],
+            info=info,
+            created_deduplicated_size=created,
         )
-        env["BORG_PASSCOMMAND"] = f"cat {vm_data.pass_file}"
-        return env
 
     @staticmethod
-    def is_lock_failure(exc: Exception) -> bool:
-        message = str(exc).lower()
-        lock_markers = (
-            "lock",
-            "already locked",
-            "another borg process",
-            "failed to create/acquire the lock",
-            "failed to acquire",
-            "lock timeout",
-        )
-        return any(marker in message for marker in lock_markers)
+    def _sort_key(value: datetime | None) -> str:
+        # Stored as fixed-width naive local ISO text so range filters compare
+        # lexically; see _timestamp_arg for the query side.
+        return _local_timestamp(value) if value is not None else ""
+
+    def fresh_listing(self, repo: str, *, max_age: float) -> list[IndexedArchive] | None:
+        with self._connect() as conn:
+            refreshed = conn.execute(
+                "SELECT refreshed_at FROM repos WHERE repo = ?", (repo,)
+            ).fetchone()
+            if refreshed is None or self._clock() - refreshed[0] > max_age:
+                return None
+            rows = conn.execute(
+                "SELECT * FROM archives WHERE repo = ? ORDER BY name DESC", (repo,)
+            ).fetchall()
+        return [self._decode_row(row) for row in rows]
+
+    def get(self, repo: str, archive: str, archive_id: str) -> ArchiveInfo | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM archives WHERE repo = ? AND name = ? AND archive_id = ?",
+                (repo, archive, archive_id),
+            ).fetchone()
+        return self._decode_row(row).info if row is not None else None
+
+    def known_ids(self, repo: str) -> dict[str, str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name, archive_id FROM archives WHERE repo = ?", (repo,)
+            ).fetchall()
+        return {row["name"]: row["archive_id"] for row in rows}
+
+    def replace(
+        self,
+        *,
+        vm: str,
+        repo: str,
+        archive_ids: Mapping[str, str],
+        updates: Sequence[IndexedArchive],
+    ) -> int:
+        with self._connect() as conn:
+            stale = [
+                row["name"]
+                for row in conn.execute(
+                    "SELECT name, archive_id FROM archives WHERE repo = ?", (repo,)
+                )
+                if archive_ids.get(row["name"]) != row["archive_id"]
+            ]
+            conn.executemany(
+                "DELETE FROM archives WHERE repo = ? AND name = ?",
+                [(repo, name) for name in stale],
+            )
+            conn.executemany(
+                "DELETE FROM created_stats WHERE repo = ? AND name = ?",
+                [(repo, name) for name in stale if name not in archive_ids],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO archives VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        repo,
+                        vm,
+                        item.info.archive,
+                        item.archive_id,
+                        self._sort_key(item.info.start),
+                        self._sort_key(item.info.end),
+                        item.info.duration,
+                        item.info.hostname,
+                        item.info.username,
+                        item.info.source_path,
+                        item.info.command_line,
+                        item.info.file_count,
+                        item.info.original_size,
+                        item.info.compressed_size,
+                        item.info.deduplicated_size,
+                    )
+                    for item in updates
+                ],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO repos VALUES (?, ?, ?)", (repo, vm, self._clock())
+            )
+        return len([name for name in stale if name not in archive_ids])
 
-    def list_archives(self, vm_data: VmBackupConfig) -> None:
-        self.runner.check(["borg", "list", "--short"], env=self.environment(vm_data))
+    def invalidate(self, repo: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM repos WHERE repo = ?", (repo,))
 
-    def list_archive_names(self, vm_data: VmBackupConfig) -> list[str]:
-        result = self.runner.check(
-            ["borg", "list", "--short"],
-            env=self.environment(vm_data),
-            capture_output=True,
+    def record_created(
+        self, repo: str, archive: str, *, deduplicated_size: int | None
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO created_stats VALUES (?, ?, ?)",
+                (repo, archive, deduplicated_size),
+            )
+
+    def search(
+        self,
+        *,
+        vms: Sequence[str] = (),
+        after: str | None = None,
+        before: str | None = None,
+        min_size: int | None = None,
+        max_size: int | None = None,
+        latest: bool = False,
+        limit: int | None = None,
+    ) -> list[IndexedArchive]:
+        clauses: list[str] = []
+        params: list[object] = []
+        if vms:
+            clauses.append(f"vm IN ({', '.join('?' for _ in vms)})")
+            params.extend(vms)
+        if after is not None:
+            clauses.append("start >= ?")
+            params.append(after)
+        if before is not None:
+            clauses.append("start < ?")
+            params.append(before)
+        if min_size is not None:
+            clauses.append("original_size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            clauses.append("original_size <= ?")
+            params.append(max_size)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (
+            "SELECT archives.*, created_stats.deduplicated_size AS created_size"
+            " FROM archives LEFT JOIN created_stats USING (repo, name)"
+            f" {where} ORDER BY vm, start DESC, name DESC"
+        )
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        results = [self._decode_row(row) for row in rows]
+        if latest:
+            newest: dict[str, IndexedArchive] = {}
+            for item in results:
+                newest.setdefault(item.vm, item)
+            results = list(newest.values())
+        return results
+
+
+def _borg_ssh_command(ssh_key_path: Path) -> list[str]:
+    return [
+        "ssh",
+        "-o",
+        "StrictHostKeyChecking=accept-new",
+        "-o",
+        f"UserKnownHostsFile={_BORG_KNOWN_HOSTS}",
+        "-i",
+        str(ssh_key_path),
+    ]
+
+
+def _ssh_destination(repo: str) -> tuple[str, str | None] | None:
+    if repo.startswith("ssh://"):
+        parsed = urllib.parse.urlsplit(repo)
+        if not parsed.hostname:
+            return None
+        host = parsed.hostname
+        if ":" in host:
+            host = f"[{host}]"
+        destination = f"{parsed.username}@{host}" if parsed.username else host
+        port = str(parsed.port) if parsed.port is not None else None
+        return destination, port
+
+    # scp-style `[user@]host:path`; anything else is a local repository.
+    if "://" in repo or ":" not in repo:
+        return None
+    destination = repo.split(":", 1)[0]
+    if destination == "" or "/" in destination:
+        return None
+    return destination, None
+
+
+class SshMultiplexer:
+    # Masters are started explicitly with -f and detached stdio: a master that
+    # borg's ssh spawned through ControlMaster=auto would inherit borg's
+    # captured stderr and keep our pipes open until ControlPersist expires.
+    # Keepalives make a master notice a dead link and exit; every reuse checks
+    # it is still answering, and an idle master left behind by a killed
+    # process exits after ControlPersist.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._control_dir: Path | None = None
+        self._masters: dict[
+            tuple[str, str | None, Path], concurrent.futures.Future[Path | None]
+        ] = {}
+
+    def __enter__(self) -> "SshMultiplexer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+        return False
+
+    def control_path(self, vm_data: VmBackupConfig) -> Path | None:
+        target = _ssh_destination(vm_data.repo)
+        if target is None:
+            return None
+        destination, port = target
+        key = (destination, port, vm_data.ssh_key_path)
+        with self._lock:
+            pending = self._masters.get(key)
+            owner = pending is None
+            if pending is None:
+                if self._control_dir is None:
+                    self._control_dir = Path(
+                        tempfile.mkdtemp(prefix="microvm-image-backup-ssh-")
+                    )
+                pending = concurrent.futures.Future()
+                self._masters[key] = pending
+            control_dir = self._control_dir
+        if owner:
+            # Started outside the lock: a slow host only delays its own
+            # callers, which wait on the future below.
+            try:
+                pending.set_result(
+                    self._start_master(
+                        control_dir, destination, port, vm_data.ssh_key_path
+                    )
+                )
+            except BaseException as exc:
+                pending.set_exception(exc)
+        path = pending.result()
+        if owner or path is None or self._master_alive(destination, path):
+            return path
+
+        LOGGER.info("ssh control master for %s stopped answering; restarting it.", destination)
+        with self._lock:
+            if self._masters.get(key) is pending:
+                del self._masters[key]
+        self._stop_master(destination, path)
+        return self.control_path(vm_data)
+
+    @staticmethod
+    def _control_command(destination: str, path: Path, operation: str) -> list[str]:
+        return ["ssh", "-o", f"ControlPath={path}", "-O", operation, destination]
+
+    @classmethod
+    def _master_alive(cls, destination: str, path: Path) -> bool:
+        try:
+            result = subprocess.run(
+                cls._control_command(destination, path, "check"),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=SSH_CONTROL_TIMEOUT,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return result.returncode == 0
+
+    @classmethod
+    def _stop_master(cls, destination: str, path: Path) -> None:
+        cmd = cls._control_command(destination, path, "exit")
+        LOGGER.debug("stopping ssh control master: %s", shlex.join(cmd))
+        try:
+            subprocess.run(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=SSH_CONTROL_TIMEOUT,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            LOGGER.warning("failed to stop ssh control master for %s: %s", destination, exc)
+        # A hung master may leave its socket behind, which would stop a new
+        # master from binding the same path.
+        with contextlib.suppress(OSError):
+            path.unlink()
+
+    def close(self) -> None:
+        with self._lock:
+            masters = [
+                (destination, future.result())
+                for (destination, _, _), future in self._masters.items()
+                if future.done()
+                and future.exception() is None
+                and future.result() is not None
+            ]
+            self._masters.clear()
+            control_dir = self._control_dir
+            self._control_dir = None
+
+        for destination, path in masters:
+            self._stop_master(destination, path)
+        if control_dir is not None:
+            shutil.rmtree(control_dir, ignore_errors=True)
+
+    @staticmethod
+    def _start_master(
+        control_dir: Path, destination: str, port: str | None, ssh_key_path: Path
+    ) -> Path | None:
+        digest = hashlib.sha256(
+            f"{destination}\0{port}\0{ssh_key_path}".encode("utf-8")
+        ).hexdigest()[:16]
+        path = control_dir / digest
+
+        cmd = [
+            *_borg_ssh_command(ssh_key_path),
+            "-M",
+            "-N",
+            "-f",
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            f"ControlPersist={SSH_CONTROL_PERSIST}",
+            "-o",
+            f"ServerAliveInterval={SSH_SERVER_ALIVE_INTERVAL}",
+            "-o",
+            f"ServerAliveCountMax={SSH_SERVER_ALIVE_COUNT_MAX}",
+            "-o",
+            f"ControlPath={path}",
+        ]
+        if port is not None:
+            cmd.extend(["-p", port])
+        cmd.append(destination)
+
+        LOGGER.debug("starting ssh control master: %s", shlex.join(cmd))
+        try:
+            result = subprocess.run(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=SSH_CONTROL_TIMEOUT,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            LOGGER.warning(
+                "cannot start ssh control master for %s, using direct connections: %s",
+                destination,
+                exc,
+            )
+            return None
+        if result.returncode != 0:
+            LOGGER.warning(
+                "cannot start ssh control master for %s (exit %d), using direct connections",
+                destination,
+                result.returncode,
+            )
+            return None
+        return path
+
+
+class BorgService:
+    def __init__(
+        self,
+        runner: CommandRunner,
+        *,
+        cache: ArchiveInfoCache | None = None,
+        ssh: SshMultiplexer | None = None,
+        index: ArchiveIndex | None = None,
+    ) -> None:
+        self.runner = runner
+        self.cache = cache
+        self.ssh = ssh
+        self.index = index
+        self._archive_ids: dict[str, dict[str, str]] = {}
+
+    def flush_cache(self) -> None:
+        if self.cache is not None:
+            self.cache.flush()
+
+    def environment(
+        self, vm_data: VmBackupConfig, *, mutating: bool = False
+    ) -> dict[str, str]:
+        env = os.environ.copy()
+        env["BORG_REPO"] = vm_data.repo
+        rsh = _borg_ssh_command(vm_data.ssh_key_path)
+        # Dry-run only prints mutating commands, so they get no master.
+        if self.ssh is not None and not (mutating and self.runner.dry_run):
+            control_path = self.ssh.control_path(vm_data)
+            if control_path is not None:
+                rsh.extend(
+                    ["-o", "ControlMaster=no", "-o", f"ControlPath={control_path}"]
+                )
+        env["BORG_RSH"] = shlex.join(rsh)
+        env["BORG_PASSCOMMAND"] = f"cat {vm_data.pass_file}"
+        return env
+
+    @staticmethod
+    def is_lock_failure(exc: Exception) -> bool:
+        message = str(exc).lower()
+        lock_markers = (
+            "lock",
+            "already locked",
+            "another borg process",
+            "failed to create/acquire the lock",
+            "failed to acquire",
+            "lock timeout",
         )
-        names = [line.strip() for line in result.stdout.splitlines() if line.strip()]
-        return sorted(names, reverse=True)
+        return any(marker in message for marker in lock_markers)
+
+    def list_archives(self, vm_data: VmBackupConfig) -> None:
+        self.runner.check(["borg", "list", "--short"], env=self.environment(vm_data))
+
+    def create_archive(
+        self,
+        vm_data: VmBackupConfig,
+        archive: str,
+        paths: Sequence[str],
+        *,
+        compression: str | None = None,
+        files_cache: str | None = None,
+        on_file_status: Callable[[str, str], None] | None = None,
+    ) -> dict[str, object]:
+        cmd = ["borg", "create", "--json"]
+        if compression is not None:
+            cmd.extend(["--compression", compression])
+        if files_cache is not None:
+            cmd.append(f"--files-cache={files_cache}")
+        on_stderr_line: Callable[[str], None] | None = None
+        if on_file_status is not None:
+            # U(nchanged) entries are the ones borg skipped via its files cache.
+            cmd.extend(["--list", "--filter=AMEU", "--log-json"])
+
+            def relay_file_status(line: str) -> None:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    return
+                if (
+                    isinstance(event, dict)
+                    and event.get("type") == "file_status"
+                    and isinstance(event.get("status"), str)
+                    and isinstance(event.get("path"), str)
+                ):
+                    on_file_status(event["status"], event["path"])
 
-    def fetch_archive_info(self, vm_data: VmBackupConfig, archive: str) -> ArchiveInfo:
+            on_stderr_line = relay_file_status
+
+        cmd.append(f"::{archive}")
+        cmd.extend(paths)
         result = self.runner.check(
-            ["borg", "info", "--json", f"::{archive}"],
-            env=self.environment(vm_data),
+            cmd,
+            env=self.environment(vm_data, mutating=True),
             capture_output=True,
+            mutating=True,
+            on_stderr_line=on_stderr_line,
+        )
+        if self.runner.dry_run:
+            return {}
+        try:
+            raw = json.loads(result.stdout)
+        except json.JSONDecodeError as exc:
+            raise CliError(f"failed to parse borg create output for '{archive}': {exc}") from exc
+        if not isinstance(raw, dict) or not isinstance(raw.get("archive"), dict):
+            raise CliError(f"unexpected borg create output for '{archive}'")
+        return raw["archive"]
+
+    def prune_archives(
+        self, vm_data: VmBackupConfig, *, glob: str, keep: Sequence[tuple[str, str]]
+    ) -> None:
+        cmd = ["borg", "prune", "--glob-archives", glob]
+        cmd.extend(f"--keep-{rule}={value}" for rule, value in keep)
+        try:
+            self.runner.check(
+                cmd, env=self.environment(vm_data, mutating=True), mutating=True
+            )
+        finally:
+            # Even a failed prune may have deleted archives, so the next
+            # listing must not be served from the index.
+            if self.index is not None and not self.runner.dry_run:
+                self.index.invalidate(vm_data.repo)
+
+    def compact_archives(self, vm_data: VmBackupConfig) -> None:
+        self.runner.check(
+            ["borg", "compact"],
+            env=self.environment(vm_data, mutating=True),
+            mutating=True,
+        )
+
+    def _query_metadata(
+        self, vm_data: VmBackupConfig, args: Sequence[str], *, bypass_lock: bool
+    ) -> subprocess.CompletedProcess[str]:
+        env = self.environment(vm_data)
+        if bypass_lock:
+            try:
+                return self.runner.check(
+                    ["borg", args[0], "--bypass-lock", *args[1:]],
+                    env=env,
+                    capture_output=True,
+                )
+            except CliError as exc:
+                LOGGER.debug("lock-free borg %s failed, retrying with lock: %s", args[0], exc)
+        return self.runner.check(["borg", *args], env=env, capture_output=True)
+
+    def list_archive_metadata(
+        self,
+        vm_data: VmBackupConfig,
+        *,
+        bypass_lock: bool = False,
+        refresh: bool = False,
+    ) -> list[ArchiveInfo]:
+        if self.index is not None and not refresh:
+            indexed = self.index.fresh_listing(
+                vm_data.repo, max_age=ARCHIVE_INDEX_MAX_AGE
+            )
+            if indexed is not None:
+                LOGGER.debug("archive listing served from index: %s", vm_data.repo)
+                self._archive_ids[vm_data.repo] = {
+                    item.info.archive: item.archive_id for item in indexed
+                }
+                return [item.info for item in indexed]
+
+        entries = self.list_archive_entries(vm_data, bypass_lock=bypass_lock)
+        infos = [self._archive_info_from_entry(entry, str(entry["name"])) for entry in entries]
+        return sorted(infos, key=lambda info: info.archive, reverse=True)
+
+    def list_archive_entries(
+        self, vm_data: VmBackupConfig, *, bypass_lock: bool = False
+    ) -> list[dict[str, object]]:
+        # With --json, borg ignores the layout of --format but adds every key it
+        # names to each archive entry, so one call yields all non-stats fields.
+        result = self._query_metadata(
+            vm_data,
+            ["list", "--json", "--format", ARCHIVE_LIST_FORMAT],
+            bypass_lock=bypass_lock,
+        )
+        try:
+            payload = json.loads(result.stdout)
+        except json.JSONDecodeError as exc:
+            raise CliError(f"failed to parse borg list JSON: {exc}") from exc
+
+        archive_ids: dict[str, str] = {}
+        entries: list[dict[str, object]] = []
+        raw_archives = payload.get("archives") if isinstance(payload, dict) else None
+        for entry in raw_archives if isinstance(raw_archives, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            name = entry.get("name") or entry.get("archive")
+            if not isinstance(name, str) or not name.strip():
+                continue
+            name = name.strip()
+            archive_ids[name] = _string_or_na(entry.get("id"))
+            entries.append({**entry, "name": name})
+
+        self._archive_ids[vm_data.repo] = archive_ids
+        if self.cache is not None:
+            self.cache.retain(vm_data.repo, archive_ids)
+        return entries
+
+    def list_archive_names(self, vm_data: VmBackupConfig) -> list[str]:
+        return [info.archive for info in self.list_archive_metadata(vm_data)]
+
+    def latest_archive(self, vm_data: VmBackupConfig) -> str:
+        infos = self.list_archive_metadata(vm_data)
+        if not infos:
+            raise CliError(f"No archives found in repository: {vm_data.repo}")
+        # Undated archives only win when nothing has a start time.
+        dated = [info for info in infos if info.start is not None]
+        if not dated:
+            return max(info.archive for info in infos)
+        return max(
+            dated, key=lambda info: (_local_timestamp(info.start), info.archive)
+        ).archive
+
+    def fetch_archive_info(
+        self, vm_data: VmBackupConfig, archive: str, *, bypass_lock: bool = False
+    ) -> ArchiveInfo:
+        archive_id = self._archive_ids.get(vm_data.repo, {}).get(archive)
+        if self.cache is not None and archive_id is not None:
+            cached = self.cache.get(vm_data.repo, archive, archive_id)
+            if cached is not None:
+                LOGGER.debug("archive info cache hit: %s", archive)
+                return cached
+        if self.index is not None and archive_id is not None:
+            indexed = self.index.get(vm_data.repo, archive, archive_id)
+            if indexed is not None:
+                LOGGER.debug("archive info served from index: %s", archive)
+                return indexed
+
+        entry = self.fetch_archive_entry(vm_data, archive, bypass_lock=bypass_lock)
+        info = self._archive_info_from_entry(entry, archive)
+
+        entry_id = entry.get("id")
+        if self.cache is not None and isinstance(entry_id, str) and entry_id != "":
+            self.cache.put(vm_data.repo, archive, entry_id, info)
+        return info
+
+    def fetch_archive_entry(
+        self, vm_data: VmBackupConfig, archive: str, *, bypass_lock: bool = False
+    ) -> dict[str, object]:
+        result = self._query_metadata(
+            vm_data, ["info", "--json", f"::{archive}"], bypass_lock=bypass_lock
         )
         try:
             payload = json.loads(result.stdout)
@@ -532,9 +2038,13 @@ class BorgService:
             raise CliError(
                 f"failed to parse borg info JSON for '{archive}': {exc}"
             ) from exc
+        return self._extract_archive_entry(payload)
 
-        entry = self._extract_archive_entry(payload)
-        stats = entry.get("stats") if isinstance(entry.get("stats"), dict) else {}
+    def _archive_info_from_entry(
+        self, entry: Mapping[str, object], archive: str
+    ) -> ArchiveInfo:
+        raw_stats = entry.get("stats")
+        stats = raw_stats if isinstance(raw_stats, dict) else {}
 
         command_line_raw = entry.get("command_line")
         if isinstance(command_line_raw, list):
@@ -542,29 +2052,41 @@ class BorgService:
         else:
             command_line = _string_or_na(command_line_raw)
 
+        start = _parse_timestamp(entry.get("start"))
+        end = _parse_timestamp(entry.get("end"))
+        duration = entry.get("duration")
+        if isinstance(duration, bool) or not isinstance(duration, (int, float)):
+            duration = _seconds_between(start, end)
+
         return ArchiveInfo(
             archive=_string_or_na(entry.get("name") or archive),
-            start=_string_or_na(entry.get("start")),
-            end=_string_or_na(entry.get("end")),
-            duration=_format_seconds(entry.get("duration")),
+            start=start,
+            end=end,
+            duration=float(duration) if duration is not None else None,
             hostname=_string_or_na(entry.get("hostname")),
             username=_string_or_na(entry.get("username")),
             source_path=self._extract_source_path(entry, command_line),
             command_line=command_line,
-            file_count=_string_or_na(stats.get("nfiles")),
-            original_size=_format_bytes(stats.get("original_size")),
-            compressed_size=_format_bytes(stats.get("compressed_size")),
-            deduplicated_size=_format_bytes(stats.get("deduplicated_size")),
+            file_count=_int_or_none(stats.get("nfiles")),
+            original_size=_int_or_none(stats.get("original_size")),
+            compressed_size=_int_or_none(stats.get("compressed_size")),
+            deduplicated_size=_int_or_none(stats.get("deduplicated_size")),
         )
 
+    def format_archive_overview(self, info: ArchiveInfo) -> str:
+        lines = [
+            f"Start: {_format_timestamp(info.start)}",
+            f"Duration: {_format_seconds(info.duration)}",
+        ]
+        return "\n".join(lines)
+
     def format_archive_details(self, info: ArchiveInfo) -> str:
         lines = [
-            f"Start: {info.start}",
-            f"Duration: {info.duration}",
-            f"Files: {info.file_count}",
-            f"Original size: {info.original_size}",
-            f"Compressed size: {info.compressed_size}",
-            f"Deduplicated size: {info.deduplicated_size}",
+            self.format_archive_overview(info),
+            f"Files: {_string_or_na(info.file_count)}",
+            f"Original size: {_format_bytes(info.original_size)}",
+            f"Compressed size: {_format_bytes(info.compressed_size)}",
+            f"Deduplicated size: {_format_bytes(info.deduplicated_size)}",
         ]
         return "\n".join(lines)
 
@@ -616,36 +2138,271 @@ class BorgService:
                 return ", ".join(path_candidates)
         return "N/A"
 
-    def extract_archive(
-        self, vm_data: VmBackupConfig, archive: str, *, cwd: Path
-    ) -> None:
-        self.runner.check(
-            ["borg", "extract", "-p", f"::{archive}"],
-            cwd=cwd,
+    @staticmethod
+    def _list_items_cmd(archive: str, *, checksums: bool) -> list[str]:
+        cmd = ["borg", "list", "--json-lines"]
+        if checksums:
+            # With --json-lines the format only selects extra keys; borg has to
+            # read every chunk of the archive to compute them.
+            cmd.extend(["--format", "{sha256}"])
+        cmd.append(f"::{archive}")
+        return cmd
+
+    def list_archive_items(
+        self, vm_data: VmBackupConfig, archive: str, *, checksums: bool = False
+    ) -> list[ArchiveItem]:
+        result = self.runner.check(
+            self._list_items_cmd(archive, checksums=checksums),
             env=self.environment(vm_data),
-            mutating=True,
+            capture_output=True,
+        )
+        return self._parse_items(archive, result.stdout)
+
+    async def list_archive_items_async(
+        self, vm_data: VmBackupConfig, archive: str, *, checksums: bool = False
+    ) -> list[ArchiveItem]:
+        result = await self.runner.check_async(
+            self._list_items_cmd(archive, checksums=checksums),
+            env=self.environment(vm_data),
+            capture_output=True,
         )
+        return self._parse_items(archive, result.stdout)
+
+    @staticmethod
+    def _parse_items(archive: str, stdout: str) -> list[ArchiveItem]:
+        items: list[ArchiveItem] = []
+        for line in stdout.splitlines():
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise CliError(
+                    f"failed to parse borg item listing for '{archive}': {exc}"
+                ) from exc
+            if not isinstance(raw, dict) or not isinstance(raw.get("path"), str):
+                continue
+            items.append(
+                ArchiveItem(
+                    path=raw["path"],
+                    type=str(raw.get("type") or ""),
+                    size=_int_or_none(raw.get("size")),
+                    mtime=str(raw.get("mtime") or ""),
+                    linktarget=str(raw.get("linktarget") or ""),
+                    sha256=raw["sha256"] if isinstance(raw.get("sha256"), str) else None,
+                )
+            )
+        return items
+
+    def extract_archive(
+        self,
+        vm_data: VmBackupConfig,
+        archive: str,
+        *,
+        cwd: Path,
+        monitor: "ExtractProgressMonitor | None" = None,
+        paths: Sequence[str] | None = None,
+    ) -> None:
+        cmd = ["borg", "extract"]
+        if monitor is not None:
+            cmd.extend(["--log-json", "--list"])
+        cmd.append("-p")
+
+        with contextlib.ExitStack() as stack:
+            if paths is not None:
+                # Too many paths for argv on large trees: select exact paths
+                # with a pattern file and exclude everything else.
+                patterns = stack.enter_context(
+                    tempfile.NamedTemporaryFile(
+                        "w", encoding="utf-8", prefix="microvm-restore-", suffix=".patterns"
+                    )
+                )
+                for path in paths:
+                    patterns.write(f"+ pf:{path}\n")
+                patterns.write("- fm:*\n")
+                patterns.flush()
+                cmd.extend(["--patterns-from", patterns.name])
+            cmd.append(f"::{archive}")
+
+            self.runner.check(
+                cmd,
+                cwd=cwd,
+                env=self.environment(vm_data, mutating=True),
+                mutating=True,
+                on_stderr_line=monitor.handle_line if monitor is not None else None,
+            )
+
+
+class ExtractProgressMonitor:
+    # Consumes `borg extract --log-json --list -p` stderr.  Borg reports
+    # extracted bytes as progress_percent events and every extracted item as
+    # a --list line, which is what files are counted from.
+    LOG_LEVELS = {
+        "DEBUG": logging.DEBUG,
+        "INFO": logging.INFO,
+        "WARNING": logging.WARNING,
+        "ERROR": logging.ERROR,
+        "CRITICAL": logging.CRITICAL,
+    }
+
+    def __init__(
+        self,
+        *,
+        archive: str,
+        metrics_path: Path | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.archive = archive
+        self.metrics_path = metrics_path
+        self.clock = clock
+        self.started = clock()
+        self.bytes_done = 0
+        self.bytes_total: int | None = None
+        self.files_done = 0
+        self._last_emit = float("-inf")
+        self._last_log = self.started
+        self._sink = None
+
+    def handle_line(self, line: str) -> None:
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            event = None
+        if not isinstance(event, dict):
+            if line.strip():
+                LOGGER.info("borg: %s", line)
+            return
+
+        kind = event.get("type")
+        if kind == "file_status" or (
+            kind == "log_message" and event.get("name") == "borg.output.list"
+        ):
+            self.files_done += 1
+            LOGGER.debug("borg: extracted %s", _string_or_na(event.get("path", event.get("message"))))
+            return
+        if kind == "log_message":
+            level = self.LOG_LEVELS.get(str(event.get("levelname")), logging.INFO)
+            LOGGER.log(level, "borg: %s", _string_or_na(event.get("message")))
+            return
+        if kind != "progress_percent" or event.get("finished"):
+            return
+
+        current = _int_or_none(event.get("current"))
+        total = _int_or_none(event.get("total"))
+        if current is not None:
+            self.bytes_done = current
+        if total is not None:
+            self.bytes_total = total
+
+        now = self.clock()
+        if now - self._last_emit >= EXTRACT_METRICS_INTERVAL:
+            self._last_emit = now
+            self._write(self.sample())
+        if now - self._last_log >= EXTRACT_PROGRESS_LOG_INTERVAL:
+            self._last_log = now
+            LOGGER.info("%s", self.describe(self.sample()))
+
+    def sample(self) -> dict[str, object]:
+        elapsed = max(self.clock() - self.started, 0.0)
+        bytes_per_sec = self.bytes_done / elapsed if elapsed > 0 else 0.0
+        files_per_sec = self.files_done / elapsed if elapsed > 0 else 0.0
+        eta: float | None = None
+        if self.bytes_total is not None and bytes_per_sec > 0:
+            eta = max(self.bytes_total - self.bytes_done, 0) / bytes_per_sec
+        return {
+            "event": "progress",
+            "archive": self.archive,
+            "elapsed_seconds": round(elapsed, 3),
+            "bytes": self.bytes_done,
+            "total_bytes": self.bytes_total,
+            "files": self.files_done,
+            "bytes_per_second": round(bytes_per_sec, 1),
+            "files_per_second": round(files_per_sec, 3),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
+
+    def finish(self, *, succeeded: bool) -> dict[str, object]:
+        summary = self.sample()
+        summary["event"] = "summary"
+        summary["succeeded"] = succeeded
+        summary["eta_seconds"] = None
+        summary["duration_seconds"] = summary.pop("elapsed_seconds")
+        self._write(summary)
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+        return summary
+
+    @staticmethod
+    def describe(sample: Mapping[str, object]) -> str:
+        done = _format_bytes(sample.get("bytes"))
+        rate = _format_bytes(sample.get("bytes_per_second"))
+        text = f"Extracted {done}"
+        total = sample.get("total_bytes")
+        if isinstance(total, int) and total > 0:
+            percent = 100.0 * float(sample.get("bytes") or 0) / total
+            text += f" of {_format_bytes(total)} ({percent:.1f}%)"
+        text += f", {rate}/s, {sample.get('files')} files"
+        eta = sample.get("eta_seconds")
+        if eta is not None:
+            text += f", ETA {_format_seconds(eta)}"
+        return text
+
+    def _write(self, record: Mapping[str, object]) -> None:
+        if self.metrics_path is None:
+            return
+        try:
+            if self._sink is None:
+                self._sink = self.metrics_path.open("a", encoding="utf-8")
+            self._sink.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._sink.flush()
+        except OSError as exc:
+            LOGGER.warning("failed to write restore metrics to %s: %s", self.metrics_path, exc)
+            self.metrics_path = None
 
 
 class InlinePreviewServer:
-    def __init__(self, *, vm_data: VmBackupConfig, borg: BorgService) -> None:
+    def __init__(
+        self,
+        *,
+        vm_data: VmBackupConfig,
+        borg: BorgService,
+        summaries: Mapping[str, ArchiveInfo] | None = None,
+        max_workers: int = MAX_FETCH_WORKERS,
+        bypass_lock: bool = False,
+    ) -> None:
         self.vm_data = vm_data
         self.borg = borg
+        self.max_workers = max(1, max_workers)
+        self.bypass_lock = bypass_lock
+        self._summaries = dict(summaries or {})
         self._records: dict[str, PreviewRecord] = {}
         self._inflight: dict[str, concurrent.futures.Future[PreviewRecord]] = {}
         self._demand_deadlines: dict[str, float] = {}
         self._demand_queue: deque[str] = deque()
-        self._prefetch_queue: deque[str] = deque()
+        self._prefetch_queue: dict[str, int] = {}
+        self._prefetch_seq = 0
         self._queued_demand: set[str] = set()
-        self._queued_prefetch: set[str] = set()
+        self._rows: list[str] = []
+        self._row_index: dict[str, int] = {}
+        self._cursor: int | None = None
         self._active_demand = 0
+        self._active_fetches = 0
+        self._concurrency_limit = min(FETCH_WORKERS, self.max_workers)
+        self._success_streak = 0
         self._lock = threading.Lock()
         self._condition = threading.Condition(self._lock)
         self._stop = threading.Event()
         self._server_socket: socket.socket | None = None
         self._server_thread: threading.Thread | None = None
         self._workers: list[threading.Thread] = []
-        self._client_pool = concurrent.futures.ThreadPoolExecutor(max_workers=16)
+        self._connections: set[socket.socket] = set()
+        self._subscribers: dict[
+            Callable[[Mapping[str, object]], None], set[str] | None
+        ] = {}
+        self._client_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(PREVIEW_CLIENT_THREADS, 2 * self.max_workers)
+        )
         token = random.randint(10_000, 999_999)
         self.socket_name = f"@microvm-image-backup-{os.getpid()}-{token}"
 
@@ -667,7 +2424,9 @@ class InlinePreviewServer:
 
         self._server_thread = threading.Thread(target=self._serve, daemon=True)
         self._server_thread.start()
-        for _ in range(FETCH_WORKERS):
+        # Every worker thread exists up front; _concurrency_limit decides how
+        # many of them may talk to borg at once.
+        for _ in range(self.max_workers):
             worker = threading.Thread(target=self._worker_loop, daemon=True)
             worker.start()
             self._workers.append(worker)
@@ -679,6 +2438,11 @@ class InlinePreviewServer:
                 self._server_socket.close()
             except OSError:
                 pass
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            with contextlib.suppress(OSError):
+                conn.shutdown(socket.SHUT_RDWR)
         with self._condition:
             self._condition.notify_all()
         if self._server_thread is not None:
@@ -694,6 +2458,32 @@ class InlinePreviewServer:
                 continue
             self._enqueue_prefetch(name)
 
+    def set_archive_order(self, archives: Sequence[str]) -> None:
+        with self._condition:
+            self._rows = list(archives)
+            self._row_index = {name: index for index, name in enumerate(self._rows)}
+
+    def focus_archive(self, archive: str) -> None:
+        with self._condition:
+            index = self._row_index.get(archive)
+            if index is None:
+                self._enqueue_prefetch_locked(archive)
+                return
+
+            self._cursor = index
+            stale = [
+                name
+                for name in self._prefetch_queue
+                if abs(self._row_index.get(name, index) - index) > PREFETCH_WINDOW
+            ]
+            for name in stale:
+                del self._prefetch_queue[name]
+                self._inflight.pop(name, None)
+
+            low = max(0, index - PREFETCH_WINDOW)
+            for name in self._rows[low:index + PREFETCH_WINDOW + 1]:
+                self._enqueue_prefetch_locked(name)
+
     def resolve_archive_info(
         self, archive: str, *, timeout_ms: int
     ) -> ArchiveInfo | None:
@@ -711,7 +2501,9 @@ class InlinePreviewServer:
         if wait_ms <= 0:
             return PreviewRecord(
                 status="loading",
-                text=f"Loading archive info for '{archive}'...",
+                text=self._pending_text(
+                    archive, f"Loading archive info for '{archive}'..."
+                ),
                 info=None,
             )
 
@@ -720,10 +2512,20 @@ class InlinePreviewServer:
         except concurrent.futures.TimeoutError:
             return PreviewRecord(
                 status="timeout",
-                text=f"Timed out after {wait_ms / 1000:.1f}s while loading '{archive}'.",
+                text=self._pending_text(
+                    archive,
+                    f"Timed out after {wait_ms / 1000:.1f}s while loading '{archive}'.",
+                ),
                 info=None,
             )
 
+    def _pending_text(self, archive: str, status_line: str) -> str:
+        summary = self._summaries.get(archive)
+        if summary is None:
+            return status_line
+        overview = self.borg.format_archive_overview(summary)
+        return f"{overview}\n\n{status_line}"
+
     def _serve(self) -> None:
         assert self._server_socket is not None
         while not self._stop.is_set():
@@ -733,50 +2535,122 @@ class InlinePreviewServer:
                 continue
             except OSError:
                 break
-            self._client_pool.submit(self._handle_connection, conn)
+            threading.Thread(
+                target=self._handle_connection, args=(conn,), daemon=True
+            ).start()
 
     def _handle_connection(self, conn: socket.socket) -> None:
-        with conn:
-            try:
-                request = self._read_request(conn)
-                response = self._dispatch(request)
-            except Exception as exc:
-                response = {
-                    "status": "error",
-                    "text": f"preview server error: {exc}",
-                }
-            payload = json.dumps(response).encode("utf-8") + b"\n"
+        # One connection carries many framed requests; blocking ones are
+        # answered from the pool so later requests are not held up behind them.
+        # Replies go through a bounded outbox drained by a writer thread, so a
+        # client that stops reading is dropped instead of stalling _publish.
+        outbox: queue.Queue[bytes | None] = queue.Queue(maxsize=PREVIEW_OUTBOX_FRAMES)
+
+        def drop() -> None:
+            with contextlib.suppress(OSError):
+                conn.shutdown(socket.SHUT_RDWR)
+
+        def send(message: Mapping[str, object]) -> None:
             try:
-                conn.sendall(payload)
-            except OSError:
-                return
+                outbox.put_nowait(_encode_frame(message))
+            except queue.Full:
+                drop()
+                raise OSError("preview client stopped reading") from None
+
+        def write() -> None:
+            while (payload := outbox.get()) is not None:
+                try:
+                    conn.sendall(payload)
+                except OSError:
+                    drop()
+                    return
 
-    @staticmethod
-    def _read_request(conn: socket.socket) -> dict[str, object]:
-        chunks: list[bytes] = []
-        while True:
-            part = conn.recv(4096)
-            if not part:
-                break
-            chunks.append(part)
-            if b"\n" in part:
-                break
-        if not chunks:
-            return {}
-        line = b"".join(chunks).split(b"\n", 1)[0]
-        if line == b"":
-            return {}
-        raw = json.loads(line.decode("utf-8"))
-        if isinstance(raw, dict):
-            return raw
-        return {}
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        with self._lock:
+            self._connections.add(conn)
+        try:
+            with conn:
+                try:
+                    while not self._stop.is_set():
+                        request = _read_frame(conn)
+                        if request is None:
+                            return
+                        if request.get("op") == "subscribe":
+                            self._subscribe(send, request)
+                        elif (_int_or_none(request.get("wait_ms")) or 0) > 0:
+                            self._client_pool.submit(self._answer, request, send)
+                        else:
+                            self._answer(request, send)
+                finally:
+                    try:
+                        outbox.put_nowait(None)
+                    except queue.Full:
+                        drop()
+                    writer.join(timeout=1.0)
+                    drop()
+        except (OSError, CliError) as exc:
+            LOGGER.debug("preview connection closed: %s", exc)
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+                self._subscribers.pop(send, None)
+
+    def _answer(
+        self,
+        request: Mapping[str, object],
+        send: Callable[[Mapping[str, object]], None],
+    ) -> None:
+        try:
+            response = self._dispatch(request)
+        except Exception as exc:
+            response = {
+                "status": "error",
+                "text": f"preview server error: {exc}",
+            }
+        if "id" in request:
+            response = {"id": request["id"], **response}
+        with contextlib.suppress(OSError):
+            send(response)
+
+    def _subscribe(
+        self,
+        send: Callable[[Mapping[str, object]], None],
+        request: Mapping[str, object],
+    ) -> None:
+        raw_archives = request.get("archives")
+        archives = None
+        if isinstance(raw_archives, list):
+            archives = {str(name) for name in raw_archives}
+        with self._lock:
+            self._subscribers[send] = archives
+        self._answer(request, send)
+
+    def _publish(self, archive: str, record: PreviewRecord) -> None:
+        with self._lock:
+            targets = [
+                send
+                for send, archives in self._subscribers.items()
+                if archives is None or archive in archives
+            ]
+        message = {
+            "event": "ready",
+            "archive": archive,
+            "status": record.status,
+            "text": record.text,
+        }
+        for send in targets:
+            with contextlib.suppress(OSError):
+                send(message)
 
     def _dispatch(self, request: Mapping[str, object]) -> dict[str, object]:
         op = request.get("op")
+        if op == "subscribe":
+            return {"status": "ok"}
         if op == "prefetch":
             archive = _string_or_na(request.get("archive")).strip()
             if archive != "":
-                self._enqueue_prefetch(archive)
+                self.focus_archive(archive)
             return {"status": "ok"}
 
         if op == "get_preview":
@@ -813,12 +2687,7 @@ class InlinePreviewServer:
                 self._demand_deadlines[archive] = max(
                     deadline, self._demand_deadlines.get(archive, deadline)
                 )
-                if archive in self._queued_prefetch:
-                    self._queued_prefetch.discard(archive)
-                    try:
-                        self._prefetch_queue.remove(archive)
-                    except ValueError:
-                        pass
+                if self._prefetch_queue.pop(archive, None) is not None:
                     if archive not in self._queued_demand:
                         self._demand_queue.append(archive)
                         self._queued_demand.add(archive)
@@ -837,33 +2706,48 @@ class InlinePreviewServer:
 
     def _enqueue_prefetch(self, archive: str) -> None:
         with self._condition:
-            if self._has_pending_demand_locked():
-                return
-            if archive in self._records:
-                return
-            if archive in self._inflight:
-                return
-            if archive in self._queued_prefetch:
-                return
+            self._enqueue_prefetch_locked(archive)
 
-            future: concurrent.futures.Future[PreviewRecord] = (
-                concurrent.futures.Future()
-            )
-            self._inflight[archive] = future
-            self._prefetch_queue.append(archive)
-            self._queued_prefetch.add(archive)
-            self._condition.notify()
+    def _enqueue_prefetch_locked(self, archive: str) -> None:
+        if archive in self._records:
+            return
+        if archive in self._inflight:
+            return
+
+        future: concurrent.futures.Future[PreviewRecord] = concurrent.futures.Future()
+        self._inflight[archive] = future
+        self._prefetch_queue[archive] = self._prefetch_seq
+        self._prefetch_seq += 1
+        self._condition.notify()
 
     def _has_pending_demand_locked(self) -> bool:
         return self._active_demand > 0 or bool(self._demand_queue)
 
+    def _has_runnable_work_locked(self) -> bool:
+        if self._demand_queue:
+            return True
+        # Prefetches stay queued while a demand fetch is pending so that they
+        # never compete with the preview the user is waiting for.
+        return bool(self._prefetch_queue) and not self._has_pending_demand_locked()
+
+    def _prefetch_priority_locked(self, archive: str) -> tuple[int, int]:
+        seq = self._prefetch_queue[archive]
+        index = self._row_index.get(archive)
+        if index is None:
+            return len(self._rows), seq
+        return abs(index - (self._cursor or 0)), seq
+
+    def _pop_prefetch_locked(self) -> str:
+        archive = min(self._prefetch_queue, key=self._prefetch_priority_locked)
+        del self._prefetch_queue[archive]
+        return archive
+
     def _worker_loop(self) -> None:
         while True:
             with self._condition:
-                while (
-                    not self._stop.is_set()
-                    and not self._demand_queue
-                    and not self._prefetch_queue
+                while not self._stop.is_set() and (
+                    not self._has_runnable_work_locked()
+                    or self._active_fetches >= self._concurrency_limit
                 ):
                     self._condition.wait()
 
@@ -877,10 +2761,10 @@ class InlinePreviewServer:
                     mode = "demand"
                     deadline = self._demand_deadlines.get(archive, time.monotonic())
                 else:
-                    archive = self._prefetch_queue.popleft()
-                    self._queued_prefetch.discard(archive)
+                    archive = self._pop_prefetch_locked()
                     mode = "prefetch"
                     deadline = 0.0
+                self._active_fetches += 1
 
             if mode == "demand":
                 record = self._fetch_demand_with_retry(archive, deadline=deadline)
@@ -888,6 +2772,7 @@ class InlinePreviewServer:
                 record = self._fetch_prefetch_once(archive)
 
             with self._condition:
+                self._active_fetches = max(0, self._active_fetches - 1)
                 if mode == "demand":
                     self._active_demand = max(0, self._active_demand - 1)
 
@@ -899,10 +2784,46 @@ class InlinePreviewServer:
 
             if future is not None and not future.done():
                 future.set_result(record)
+            self._publish(archive, record)
+
+    @property
+    def concurrency_limit(self) -> int:
+        with self._lock:
+            return self._concurrency_limit
+
+    def _record_outcome(self, *, lock_failure: bool) -> None:
+        # AIMD: borg repo locks serialize readers, so halve on contention and
+        # only grow again after a streak of clean fetches.
+        with self._condition:
+            if lock_failure:
+                self._success_streak = 0
+                limit = max(1, self._concurrency_limit // 2)
+                if limit != self._concurrency_limit:
+                    LOGGER.debug("preview fetch concurrency reduced to %d", limit)
+                self._concurrency_limit = limit
+                return
+
+            self._success_streak += 1
+            if (
+                self._success_streak >= ADAPTIVE_SCALE_UP_SUCCESSES
+                and self._concurrency_limit < self.max_workers
+            ):
+                self._success_streak = 0
+                self._concurrency_limit += 1
+                LOGGER.debug(
+                    "preview fetch concurrency raised to %d", self._concurrency_limit
+                )
+                self._condition.notify_all()
 
     def _fetch_once(self, archive: str) -> tuple[PreviewRecord, bool]:
         try:
-            info = self.borg.fetch_archive_info(self.vm_data, archive)
+            if self.bypass_lock:
+                info = self.borg.fetch_archive_info(
+                    self.vm_data, archive, bypass_lock=True
+                )
+            else:
+                info = self.borg.fetch_archive_info(self.vm_data, archive)
+            self._record_outcome(lock_failure=False)
             return (
                 PreviewRecord(
                     status="ready",
@@ -916,6 +2837,8 @@ class InlinePreviewServer:
                 self.borg, "is_lock_failure", BorgService.is_lock_failure
             )
             lock_failure = bool(classifier(exc))
+            if lock_failure:
+                self._record_outcome(lock_failure=True)
             return (
                 PreviewRecord(
                     status="error",
@@ -954,9 +2877,12 @@ class InlinePreviewServer:
 
 
 class InteractiveArchivePicker:
-    def __init__(self, manifest: Manifest, borg: BorgService) -> None:
+    def __init__(
+        self, manifest: Manifest, borg: BorgService, *, sort: str | None = None
+    ) -> None:
         self.manifest = manifest
         self.borg = borg
+        self.sort = sort
         self.program = str(Path(sys.argv[0]).resolve())
 
     @staticmethod
@@ -975,12 +2901,26 @@ class InteractiveArchivePicker:
 
     def pick_archive(self, vm: str, vm_data: VmBackupConfig) -> ArchiveSelection:
         self.ensure_fzf_available()
-        archives = self.borg.list_archive_names(vm_data)
-        if not archives:
+        summaries = self.borg.list_archive_metadata(
+            vm_data, bypass_lock=self.manifest.preview_bypass_lock
+        )
+        if not summaries:
             raise CliError(f"No archives found for VM: {vm}")
-
-        with InlinePreviewServer(vm_data=vm_data, borg=self.borg) as server:
-            server.prefetch_archives(archives)
+        if self.sort is not None:
+            summaries = sort_archive_infos(summaries, self.sort)
+        archives = [summary.archive for summary in summaries]
+
+        with InlinePreviewServer(
+            vm_data=vm_data,
+            borg=self.borg,
+            summaries={summary.archive: summary for summary in summaries},
+            max_workers=self.manifest.preview_workers,
+            bypass_lock=self.manifest.preview_bypass_lock,
+        ) as server:
+            # Start/duration come from the bulk listing; only warm the stats of
+            # the rows around the fzf cursor instead of one borg info per archive.
+            server.set_archive_order(archives)
+            server.focus_archive(archives[0])
             preview_cmd = f"{shlex.quote(self.program)} __preview --archive {{}}"
             selected = self._run_fzf(
                 archives,
@@ -1041,51 +2981,184 @@ class InteractiveArchivePicker:
         raise CliError(f"fzf failed (exit {result.returncode})")
 
 
-def _parse_preview_socket_name(raw_name: str) -> str:
-    if raw_name.startswith("@"):
-        return "\0" + raw_name[1:]
-    return raw_name
+def _encode_frame(message: Mapping[str, object]) -> bytes:
+    payload = json.dumps(dict(message)).encode("utf-8")
+    return len(payload).to_bytes(FRAME_HEADER, "big") + payload
 
 
-def _preview_rpc(
-    request: Mapping[str, object], *, timeout_seconds: float
-) -> dict[str, object]:
-    raw_name = os.environ.get(PREVIEW_SOCKET_ENV)
-    if raw_name is None or raw_name == "":
-        raise CliError(f"missing {PREVIEW_SOCKET_ENV} for preview client")
+def _recv_exact(conn: socket.socket, size: int) -> bytes | None:
+    chunks: list[bytes] = []
+    remaining = size
+    while remaining > 0:
+        part = conn.recv(remaining)
+        if not part:
+            if chunks:
+                raise CliError("connection closed mid-frame")
+            return None
+        chunks.append(part)
+        remaining -= len(part)
+    return b"".join(chunks)
 
-    socket_name = _parse_preview_socket_name(raw_name)
-    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
-        client.settimeout(timeout_seconds)
+
+def _read_frame(conn: socket.socket) -> dict[str, object] | None:
+    header = _recv_exact(conn, FRAME_HEADER)
+    if header is None:
+        return None
+    size = int.from_bytes(header, "big")
+    if size > MAX_FRAME:
+        raise CliError(f"frame too large: {size} bytes")
+    payload = _recv_exact(conn, size) if size else b""
+    if payload is None:
+        raise CliError("connection closed mid-frame")
+    try:
+        raw = json.loads(payload.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise CliError(f"invalid frame: {exc}") from exc
+    if not isinstance(raw, dict):
+        raise CliError("invalid frame type")
+    return raw
+
+
+def _parse_preview_socket_name(raw_name: str) -> str:
+    if raw_name.startswith("@"):
+        return "\0" + raw_name[1:]
+    return raw_name
+
+
+class PreviewConnection:
+    def __init__(
+        self,
+        sock: socket.socket,
+        *,
+        on_event: Callable[[dict[str, object]], None] | None = None,
+    ) -> None:
+        self._sock = sock
+        self._on_event = on_event
+        self._pending: dict[int, concurrent.futures.Future[dict[str, object]]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def open(
+        cls,
+        *,
+        timeout_seconds: float,
+        on_event: Callable[[dict[str, object]], None] | None = None,
+    ) -> "PreviewConnection":
+        raw_name = os.environ.get(PREVIEW_SOCKET_ENV)
+        if raw_name is None or raw_name == "":
+            raise CliError(f"missing {PREVIEW_SOCKET_ENV} for preview client")
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout_seconds)
         try:
-            client.connect(socket_name)
+            sock.connect(_parse_preview_socket_name(raw_name))
         except OSError as exc:
+            sock.close()
             raise CliError(f"failed to connect preview socket: {exc}") from exc
+        sock.settimeout(None)
+        return cls(sock, on_event=on_event)
 
-        payload = json.dumps(dict(request)).encode("utf-8") + b"\n"
-        client.sendall(payload)
-        client.shutdown(socket.SHUT_WR)
+    def __enter__(self) -> "PreviewConnection":
+        return self
 
-        chunks: list[bytes] = []
-        while True:
-            part = client.recv(4096)
-            if not part:
-                break
-            chunks.append(part)
-            if b"\n" in part:
-                break
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+        return False
 
-    if not chunks:
-        raise CliError("preview server returned no response")
+    def request(
+        self, request: Mapping[str, object]
+    ) -> concurrent.futures.Future[dict[str, object]]:
+        future: concurrent.futures.Future[dict[str, object]] = concurrent.futures.Future()
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = future
+            try:
+                self._sock.sendall(_encode_frame({**request, "id": request_id}))
+            except OSError as exc:
+                del self._pending[request_id]
+                future.set_exception(
+                    CliError(f"failed to send preview request: {exc}")
+                )
+        return future
 
-    line = b"".join(chunks).split(b"\n", 1)[0]
+    def _read_loop(self) -> None:
+        error = CliError("preview server closed the connection")
+        try:
+            while True:
+                message = _read_frame(self._sock)
+                if message is None:
+                    break
+                if "event" in message:
+                    if self._on_event is not None:
+                        self._on_event(message)
+                    continue
+                with self._lock:
+                    future = self._pending.pop(_int_or_none(message.get("id")), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except (OSError, CliError) as exc:
+            error = CliError(f"preview connection failed: {exc}")
+
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    def close(self) -> None:
+        with contextlib.suppress(OSError):
+            self._sock.shutdown(socket.SHUT_RDWR)
+        self._sock.close()
+        self._reader.join(timeout=1.0)
+
+
+def _await_response(
+    future: concurrent.futures.Future[dict[str, object]], *, timeout_seconds: float
+) -> dict[str, object]:
     try:
-        raw = json.loads(line.decode("utf-8"))
-    except json.JSONDecodeError as exc:
-        raise CliError(f"invalid preview response: {exc}") from exc
-    if not isinstance(raw, dict):
-        raise CliError("invalid preview response type")
-    return raw
+        return future.result(timeout=timeout_seconds)
+    except concurrent.futures.TimeoutError as exc:
+        raise CliError("timed out waiting for preview response") from exc
+
+
+def _preview_rpc(
+    request: Mapping[str, object], *, timeout_seconds: float
+) -> dict[str, object]:
+    with PreviewConnection.open(timeout_seconds=timeout_seconds) as connection:
+        return _await_response(
+            connection.request(request), timeout_seconds=timeout_seconds
+        )
+
+
+def _preview_result(
+    archive: str,
+    future: concurrent.futures.Future[dict[str, object]],
+    *,
+    wait_ms: int,
+) -> tuple[str, str]:
+    try:
+        response = _await_response(future, timeout_seconds=(wait_ms / 1000.0) + 2.0)
+        status = _string_or_na(response.get("status"))
+        text = _string_or_na(response.get("text"))
+    except CliError as exc:
+        return "error", f"Preview client error: {exc}"
+
+    if text == "N/A":
+        if status == "loading":
+            text = f"Loading archive info for '{archive}'..."
+        elif status == "timeout":
+            text = (
+                f"Timed out while loading archive '{archive}' after "
+                f"{wait_ms / 1000:.1f}s."
+            )
+        elif status == "error":
+            text = f"Failed to load preview for archive '{archive}'."
+    return status, text
 
 
 def run_preview_client(args: argparse.Namespace) -> int:
@@ -1095,32 +3168,28 @@ def run_preview_client(args: argparse.Namespace) -> int:
         return 1
 
     style_enabled = supports_ansi(sys.stdout)
-    print(f"Loading archive info for {archive}...", flush=True)
-
     try:
-        response = _preview_rpc(
-            {
-                "op": "get_preview",
-                "archive": archive,
-                "wait_ms": PREVIEW_WAIT_MS,
-            },
-            timeout_seconds=(PREVIEW_WAIT_MS / 1000.0) + 2.0,
-        )
-        status = _string_or_na(response.get("status"))
-        text = _string_or_na(response.get("text"))
+        connection = PreviewConnection.open(timeout_seconds=2.0)
     except CliError as exc:
-        status = "error"
-        text = f"Preview client error: {exc}"
-
-    if status == "loading":
-        text = f"Loading archive info for '{archive}'..."
-    elif status == "timeout":
-        text = (
-            f"Timed out while loading archive '{archive}' after "
-            f"{PREVIEW_WAIT_MS / 1000:.1f}s."
-        )
-    elif status == "error" and text == "N/A":
-        text = f"Failed to load preview for archive '{archive}'."
+        status, text = "error", f"Preview client error: {exc}"
+    else:
+        with connection:
+            # Pipeline everything in one round trip: fzf runs the preview for
+            # every row the cursor lands on, so re-center prefetching first,
+            # then ask for whatever the server already knows (e.g. the bulk
+            # listing fields) and for the full record.
+            connection.request({"op": "prefetch", "archive": archive})
+            quick = connection.request(
+                {"op": "get_preview", "archive": archive, "wait_ms": 0}
+            )
+            full = connection.request(
+                {"op": "get_preview", "archive": archive, "wait_ms": PREVIEW_WAIT_MS}
+            )
+
+            status, text = _preview_result(archive, quick, wait_ms=0)
+            if status == "loading":
+                print(stylize_key_value_block(text, enabled=style_enabled), flush=True)
+                status, text = _preview_result(archive, full, wait_ms=PREVIEW_WAIT_MS)
 
     if status == "ready":
         text = stylize_key_value_block(text, enabled=style_enabled)
@@ -1133,118 +3202,1260 @@ def run_preview_client(args: argparse.Namespace) -> int:
     return 0
 
 
+def _normalize_item_path(raw: str) -> str:
+    path = os.path.normpath(raw.lstrip("/"))
+    return "" if path == "." else path
+
+
+def _mtime_matches(st_mtime_ns: int, raw: str) -> bool:
+    try:
+        parsed = datetime.fromisoformat(raw)
+    except ValueError:
+        return False
+    # Naive borg timestamps are local time, which .timestamp() assumes too.
+    return round(parsed.timestamp() * 1_000_000) == st_mtime_ns // 1000
+
+
+def _item_matches(path: Path, item: ArchiveItem) -> bool:
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return False
+    if item.type == "d":
+        return stat.S_ISDIR(st.st_mode)
+    if item.type == "l":
+        return stat.S_ISLNK(st.st_mode) and os.readlink(path) == item.linktarget
+    if item.type == "-":
+        return (
+            stat.S_ISREG(st.st_mode)
+            and st.st_size == item.size
+            and _mtime_matches(st.st_mtime_ns, item.mtime)
+        )
+    return False
+
+
+def plan_delta_restore(
+    root: Path, items: Sequence[ArchiveItem]
+) -> tuple[list[str], list[Path]]:
+    # Same quick check rsync uses: a regular file with identical size and
+    # mtime is assumed unchanged.  Returns the archive paths to extract and
+    # the local paths that have to go first (unknown to the archive, or of
+    # a type borg cannot overwrite in place).
+    expected: dict[str, ArchiveItem] = {}
+    for item in items:
+        path = _normalize_item_path(item.path)
+        if path != "":
+            expected[path] = item
+
+    changed: list[str] = []
+    remove: list[Path] = []
+    for path, item in expected.items():
+        local = root / path
+        if _item_matches(local, item):
+            continue
+        changed.append(item.path)
+        if local.is_dir() and not local.is_symlink() and item.type != "d":
+            remove.append(local)
+        elif item.type == "d" and os.path.lexists(local) and not local.is_dir():
+            remove.append(local)
+
+    removed = set(remove)
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        for name in list(dirnames):
+            rel = os.path.normpath(os.path.join(rel_dir, name))
+            if rel not in expected:
+                dirnames.remove(name)
+                if Path(dirpath, name) not in removed:
+                    remove.append(Path(dirpath, name))
+            elif Path(dirpath, name) in removed:
+                dirnames.remove(name)
+        for name in filenames:
+            rel = os.path.normpath(os.path.join(rel_dir, name))
+            if rel not in expected and Path(dirpath, name) not in removed:
+                remove.append(Path(dirpath, name))
+    return changed, remove
+
+
+def _hash_file(path: Path) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    buffer = bytearray(VERIFY_READ_SIZE)
+    view = memoryview(buffer)
+    total = 0
+    with open(path, "rb", buffering=0) as handle:
+        with contextlib.suppress(AttributeError, OSError):
+            os.posix_fadvise(handle.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            count = handle.readinto(view)
+            if not count:
+                break
+            # hashlib drops the GIL for large buffers, so pool threads hash
+            # on separate cores.
+            digest.update(view[:count])
+            total += count
+    return digest.hexdigest(), total
+
+
+def _verify_item(root: Path, item: ArchiveItem, checksums: bool) -> tuple[str | None, int]:
+    path = _normalize_item_path(item.path)
+    local = root / path
+    if item.type == "-":
+        try:
+            st = os.lstat(local)
+        except FileNotFoundError:
+            return f"{path}: missing from stage", 0
+        if not stat.S_ISREG(st.st_mode):
+            return f"{path}: not a regular file", 0
+        if item.size is not None and st.st_size != item.size:
+            return f"{path}: size {st.st_size} != {item.size}", 0
+        if not checksums:
+            return None, 0
+        if item.sha256 is None:
+            return f"{path}: archive listing has no sha256 digest", 0
+        try:
+            digest, read = _hash_file(local)
+        except OSError as exc:
+            return f"{path}: unreadable: {exc}", 0
+        if digest != item.sha256:
+            return f"{path}: sha256 differs", read
+        return None, read
+    if not _item_matches(local, item):
+        return f"{path}: missing or wrong type", 0
+    return None, 0
+
+
+def verify_stage(
+    root: Path,
+    items: Sequence[ArchiveItem],
+    *,
+    checksums: bool,
+    workers: int | None = None,
+) -> StageVerification:
+    # Only types the stage can be compared on; devices and fifos never show
+    # up in VM image archives.
+    checked = [
+        item
+        for item in items
+        if item.type in {"-", "d", "l"} and _normalize_item_path(item.path) != ""
+    ]
+    # Largest files first so one huge image does not start last and set the
+    # wall time on its own.
+    checked.sort(key=lambda item: item.size or 0, reverse=True)
+    mismatches: list[str] = []
+    hashed = 0
+    started = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        thread_name_prefix="verify",
+    ) as pool:
+        futures = [pool.submit(_verify_item, root, item, checksums) for item in checked]
+        for future in futures:
+            problem, read = future.result()
+            hashed += read
+            if problem is not None:
+                mismatches.append(problem)
+    return StageVerification(
+        items=len(checked),
+        hashed_bytes=hashed,
+        seconds=time.monotonic() - started,
+        mismatches=tuple(mismatches),
+    )
+
+
+def read_stage_marker(paths: VmPaths) -> dict[str, object]:
+    try:
+        raw = json.loads(paths.stage_marker.read_text(encoding="utf-8"))
+    except FileNotFoundError as exc:
+        raise CliError(f"no pre-staged restore found at {paths.stage}") from exc
+    except (OSError, ValueError) as exc:
+        raise CliError(
+            f"cannot read stage marker {paths.stage_marker}: {exc}"
+        ) from exc
+    if not isinstance(raw, dict) or not isinstance(raw.get("archive"), str):
+        raise CliError(f"malformed stage marker: {paths.stage_marker}")
+    return raw
+
+
 class RestoreTransaction:
     def __init__(
-        self, ctx: AppContext, vm: str, archive: str, vm_data: VmBackupConfig
+        self,
+        ctx: AppContext,
+        vm: str,
+        archive: str,
+        vm_data: VmBackupConfig,
+        *,
+        metrics_path: Path | None = None,
+        stage_only: bool = False,
+        use_staged: bool = False,
+        delta: bool = False,
+        defer_cleanup: bool = False,
+        verify: str | None = None,
     ) -> None:
+        if stage_only and use_staged:
+            raise CliError("stage-only and swap-staged restores are exclusive")
+        if delta and use_staged:
+            raise CliError("delta and swap-staged restores are exclusive")
         self.ctx = ctx
         self.vm = vm
         self.archive = archive
         self.vm_data = vm_data
+        self.metrics_path = metrics_path
+        self.stage_only = stage_only
+        self.use_staged = use_staged
+        self.delta = delta
+        self.defer_cleanup = defer_cleanup
+        self.verify = verify
+        self.items: list[ArchiveItem] | None = None
+        self.checksum_listing: BackgroundCommand[list[ArchiveItem]] | None = None
         self.paths = vm_paths(ctx.manifest.volume_path, vm)
         self.service = self.ctx.systemd.vm_service_unit(vm)
         self.was_active = False
         self.target_moved_to_old = False
         self.restore_finished = False
+        self.staged = False
+        self.timings: dict[str, float] = {}
+        self.downtime: float | None = None
+
+    @contextlib.contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.monotonic() - started
 
     def __enter__(self) -> "RestoreTransaction":
+        with self._phase("prepare"):
+            self._prepare()
+        return self
+
+    def _prepare(self) -> None:
         LOGGER.info("Preparing restore workspace for VM '%s'.", self.vm)
+        self.ctx.btrfs.reset()
+        self.ctx.btrfs.inspect([self.paths.target, self.paths.stage, self.paths.old])
         if not self.ctx.btrfs.is_subvolume(self.paths.target):
             raise CliError(
                 f"Target VM path is not a btrfs subvolume: {self.paths.target}"
             )
 
+        if self.use_staged:
+            marker = read_stage_marker(self.paths)
+            if marker["archive"] != self.archive:
+                raise CliError(
+                    f"staged archive is '{marker['archive']}', not '{self.archive}'"
+                )
+            if not self.ctx.btrfs.is_subvolume(self.paths.stage):
+                raise CliError(
+                    f"pre-staged restore is not a btrfs subvolume: {self.paths.stage}"
+                )
+            self.ctx.btrfs.delete_subvolume_strict_if_exists(
+                self.paths.old, "restore old subvolume"
+            )
+            LOGGER.info("Using pre-staged archive '%s' at %s.", self.archive, self.paths.stage)
+            return
+
+        self._remove_stage_marker()
         self.ctx.btrfs.delete_subvolume_strict_if_exists(
             self.paths.stage, "restore stage subvolume"
         )
         self.ctx.btrfs.delete_subvolume_strict_if_exists(
             self.paths.old, "restore old subvolume"
         )
-        self.ctx.btrfs.create_subvolume(self.paths.stage)
+        if self.delta:
+            self.ctx.btrfs.snapshot_subvolume(self.paths.target, self.paths.stage)
+        else:
+            self.ctx.btrfs.create_subvolume(self.paths.stage)
         LOGGER.info("Restore workspace ready at %s.", self.paths.stage)
-        return self
 
     def run(self) -> None:
         LOGGER.info("Starting restore of VM '%s' from archive '%s'.", self.vm, self.archive)
-        LOGGER.info("Extracting archive into %s.", self.paths.stage)
-        self.ctx.borg.extract_archive(self.vm_data, self.archive, cwd=self.paths.stage)
-        if self.ctx.systemd.is_active(self.service):
-            self.was_active = True
-            LOGGER.info("Stopping VM service: %s.", self.service)
-            self.ctx.systemd.stop(self.service)
-        else:
-            LOGGER.info("VM service already stopped: %s.", self.service)
+        if not self.use_staged:
+            if self.verify == "sha256" and not self.ctx.runner.dry_run:
+                self._start_checksum_listing()
+            LOGGER.info("Extracting archive into %s.", self.paths.stage)
+            with self._phase("extract"):
+                if self.delta:
+                    self._extract_delta()
+                else:
+                    self._extract()
+
+        # Checked while the VM is still running, so a bad stage never costs
+        # downtime.
+        if self.verify is not None:
+            with self._phase("verify"):
+                self._verify_stage()
+
+        if self.stage_only:
+            self._write_stage_marker()
+            self.staged = True
+            LOGGER.info(
+                "Archive staged at %s; run `restore --swap-staged %s` to switch it into place.",
+                self.paths.stage,
+                self.vm,
+            )
+            return
+
+        # Everything from here on runs with the VM down (if it was running),
+        # so keep it to the service stop, two renames and the service start.
+        down_since = time.monotonic()
+        with self._phase("stop"):
+            if self.ctx.systemd.is_active(self.service):
+                self.was_active = True
+                LOGGER.info("Stopping VM service: %s.", self.service)
+                self.ctx.systemd.stop(self.service)
+            else:
+                LOGGER.info("VM service already stopped: %s.", self.service)
 
+        with self._phase("swap"):
+            self._swap()
+
+        if self.was_active:
+            with self._phase("start"):
+                LOGGER.info("Starting VM service: %s.", self.service)
+                self.ctx.systemd.start(self.service)
+            self.downtime = time.monotonic() - down_since
+
+        self._remove_stage_marker()
+        self.restore_finished = True
+        LOGGER.info("Restore completed for VM '%s'.", self.vm)
+
+    def _swap(self) -> None:
         if self.ctx.runner.dry_run:
             LOGGER.info("[dry-run] mv %s -> %s", self.paths.target, self.paths.old)
             LOGGER.info("[dry-run] mv %s -> %s", self.paths.stage, self.paths.target)
-        else:
-            LOGGER.info("Switching subvolumes into place.")
+            return
+
+        LOGGER.info("Switching subvolumes into place.")
+        try:
+            self.paths.target.rename(self.paths.old)
+            self.target_moved_to_old = True
+            self.paths.stage.rename(self.paths.target)
+        except OSError as exc:
+            raise CliError(f"failed to move subvolumes during restore: {exc}") from exc
+        finally:
+            self.ctx.btrfs.forget(self.paths.target, self.paths.stage, self.paths.old)
+
+    def _start_checksum_listing(self) -> None:
+        # borg has to read the whole archive again to produce digests; doing
+        # that while extract writes the stage hides most of the second read.
+        # __exit__ cancels it, so a failed restore stops the read right away.
+        self.checksum_listing = BackgroundCommand(
+            self.ctx.borg.list_archive_items_async(
+                self.vm_data, self.archive, checksums=True
+            ),
+            name="verify-list",
+        )
+
+    def _stop_checksum_listing(self) -> None:
+        if self.checksum_listing is not None:
+            self.checksum_listing.cancel()
+            self.checksum_listing = None
+
+    def _verify_stage(self) -> None:
+        checksums = self.verify == "sha256"
+        if self.ctx.runner.dry_run:
+            LOGGER.info(
+                "[dry-run] verify %s against '%s' (%s)",
+                self.paths.stage,
+                self.archive,
+                self.verify,
+            )
+            return
+        items = self.items
+        if self.checksum_listing is not None:
+            items = self.checksum_listing.result()
+            self.checksum_listing = None
+        elif items is None or checksums:
+            items = self.ctx.borg.list_archive_items(
+                self.vm_data, self.archive, checksums=checksums
+            )
+        LOGGER.info("Verifying %s against archive '%s'.", self.paths.stage, self.archive)
+        result = verify_stage(self.paths.stage, items, checksums=checksums)
+        summary = f"Verified {result.items} items"
+        if result.hashed_bytes:
+            rate = result.hashed_bytes / result.seconds if result.seconds > 0 else None
+            summary += f", hashed {_format_bytes(result.hashed_bytes)} at {_format_rate(rate)}"
+        LOGGER.info("%s in %s.", summary, _format_seconds(result.seconds))
+        if result.mismatches:
+            for problem in result.mismatches[:VERIFY_REPORT_LIMIT]:
+                LOGGER.error("stage mismatch: %s", problem)
+            raise CliError(
+                f"stage verification failed: {len(result.mismatches)} of "
+                f"{result.items} items differ from archive '{self.archive}'"
+            )
+
+    def _extract_delta(self) -> None:
+        items = self.ctx.borg.list_archive_items(self.vm_data, self.archive)
+        self.items = items
+        # In dry-run the stage snapshot was never taken; it would have been
+        # identical to the live target, so plan against that instead.
+        base = self.paths.target if self.ctx.runner.dry_run else self.paths.stage
+        changed, remove = plan_delta_restore(base, items)
+        LOGGER.info(
+            "Delta restore: %d of %d archive items differ, %d local paths to remove.",
+            len(changed),
+            len(items),
+            len(remove),
+        )
+
+        for path in remove:
+            if self.ctx.runner.dry_run:
+                LOGGER.info("[dry-run] rm -r %s", path)
+                continue
             try:
-                self.paths.target.rename(self.paths.old)
-                self.target_moved_to_old = True
-                self.paths.stage.rename(self.paths.target)
+                if path.is_dir() and not path.is_symlink():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
             except OSError as exc:
-                raise CliError(
-                    f"failed to move subvolumes during restore: {exc}"
-                ) from exc
+                raise CliError(f"failed to remove {path} from stage: {exc}") from exc
+
+        if changed:
+            self._extract(paths=changed)
+
+    def _extract(self, paths: Sequence[str] | None = None) -> None:
+        monitor = ExtractProgressMonitor(
+            archive=self.archive,
+            metrics_path=None if self.ctx.runner.dry_run else self.metrics_path,
+        )
+        succeeded = False
+        try:
+            self.ctx.borg.extract_archive(
+                self.vm_data,
+                self.archive,
+                cwd=self.paths.stage,
+                monitor=monitor,
+                paths=paths,
+            )
+            succeeded = True
+        finally:
+            summary = monitor.finish(succeeded=succeeded)
+        if not self.ctx.runner.dry_run:
+            LOGGER.info(
+                "%s in %s.",
+                monitor.describe(summary),
+                _format_seconds(summary["duration_seconds"]),
+            )
+
+    def _write_stage_marker(self) -> None:
+        marker = {
+            "archive": self.archive,
+            "repo": self.vm_data.repo,
+            "staged_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+        }
+        if self.ctx.runner.dry_run:
+            LOGGER.info("[dry-run] write stage marker %s", self.paths.stage_marker)
+            return
+        try:
+            self.paths.stage_marker.write_text(json.dumps(marker) + "\n", encoding="utf-8")
+        except OSError as exc:
+            raise CliError(
+                f"failed to write stage marker {self.paths.stage_marker}: {exc}"
+            ) from exc
+
+    def _remove_stage_marker(self) -> None:
+        if self.ctx.runner.dry_run:
+            return
+        try:
+            self.paths.stage_marker.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            LOGGER.warning("failed to remove stage marker %s: %s", self.paths.stage_marker, exc)
+
+    def _report_timings(self) -> None:
+        if not self.timings:
+            return
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()]
+        if self.downtime is not None:
+            parts.append(f"downtime {self.downtime:.2f}s")
+        LOGGER.info("Restore phases for VM '%s': %s.", self.vm, ", ".join(parts))
+
+        if self.metrics_path is None or self.ctx.runner.dry_run:
+            return
+        record = {
+            "event": "phases",
+            "vm": self.vm,
+            "archive": self.archive,
+            "phases": {name: round(value, 3) for name, value in self.timings.items()},
+            "downtime_seconds": round(self.downtime, 3) if self.downtime is not None else None,
+        }
+        try:
+            with self.metrics_path.open("a", encoding="utf-8") as sink:
+                sink.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except OSError as exc:
+            LOGGER.warning("failed to write restore metrics to %s: %s", self.metrics_path, exc)
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._stop_checksum_listing()
+        if exc_type is not None:
+            LOGGER.error("Restore failed for VM '%s'; attempting rollback.", self.vm)
+            self._rollback_best_effort()
+
+        # A pre-staged subvolume outlives a failed swap so it can be retried;
+        # after a successful swap it no longer exists at the stage path.
+        if not self.staged and not self.use_staged:
+            self.ctx.btrfs.cleanup_subvolume_best_effort(
+                self.paths.stage, "restore stage subvolume"
+            )
+            self._remove_stage_marker()
+        if self.restore_finished and self.defer_cleanup:
+            queued = self.ctx.btrfs.queue_deletion(
+                self.paths.old,
+                deletion_queue_dir(self.ctx.manifest.volume_path),
+                "previous VM subvolume",
+            )
+            if queued is not None:
+                LOGGER.info(
+                    "Previous VM subvolume queued for deletion at %s; run `cleanup` to reclaim space.",
+                    queued,
+                )
+        elif self.restore_finished:
+            self.ctx.btrfs.cleanup_subvolume_best_effort(
+                self.paths.old, "previous VM subvolume"
+            )
+        self._report_timings()
+        return False
+
+    def _rollback_best_effort(self) -> None:
+        if self.target_moved_to_old:
+            if self.use_staged and self.paths.target.exists():
+                # Hand the staged data back so `--swap-staged` can be retried;
+                # its marker is still in place.
+                self._unswap_staged()
+            elif self.paths.target.exists() and self.ctx.btrfs.is_subvolume(
+                self.paths.target
+            ):
+                result = self.ctx.runner.run(
+                    ["btrfs", "subvolume", "delete", str(self.paths.target)],
+                    mutating=True,
+                )
+                if result.returncode != 0:
+                    LOGGER.warning(
+                        "failed to delete partially restored target: %s",
+                        self.paths.target,
+                    )
+
+            if self.paths.old.exists():
+                if self.ctx.runner.dry_run:
+                    LOGGER.info(
+                        "[dry-run] mv %s -> %s", self.paths.old, self.paths.target
+                    )
+                else:
+                    self.ctx.btrfs.forget(self.paths.old, self.paths.target)
+                    try:
+                        self.paths.old.rename(self.paths.target)
+                        LOGGER.info("Rollback completed for VM '%s'.", self.vm)
+                    except OSError:
+                        LOGGER.warning(
+                            "rollback move failed (%s -> %s)",
+                            self.paths.old,
+                            self.paths.target,
+                        )
+            else:
+                LOGGER.warning("rollback source missing: %s", self.paths.old)
 
         if self.was_active:
-            LOGGER.info("Starting VM service: %s.", self.service)
-            self.ctx.systemd.start(self.service)
+            self.ctx.systemd.start_best_effort(self.service)
+
+    def _unswap_staged(self) -> None:
+        if self.ctx.runner.dry_run:
+            LOGGER.info("[dry-run] mv %s -> %s", self.paths.target, self.paths.stage)
+            return
+        self.ctx.btrfs.forget(self.paths.target, self.paths.stage)
+        try:
+            self.paths.target.rename(self.paths.stage)
+        except OSError:
+            LOGGER.warning(
+                "failed to return staged restore (%s -> %s)",
+                self.paths.target,
+                self.paths.stage,
+            )
+
+
+class BackupRun:
+    def __init__(
+        self,
+        ctx: AppContext,
+        vm: str,
+        vm_data: VmBackupConfig,
+        *,
+        metrics_path: Path | None = None,
+        qga_timeout: float = qga_client.DEFAULT_TIMEOUT,
+    ) -> None:
+        self.ctx = ctx
+        self.vm = vm
+        self.vm_data = vm_data
+        self.metrics_path = metrics_path
+        self.qga_timeout = qga_timeout
+        self.source = vm_paths(ctx.manifest.volume_path, vm).target
+        self.snapshot = backup_snapshot_path(ctx.manifest.snapshot_root, vm)
+        self.prefix = vm_data.archive_prefix or vm
+        self.archive: str | None = None
+        self.stats: dict[str, object] = {}
+        self.timings: dict[str, float] = {}
+        self.snapshot_taken = False
+        self.snapshot_time: datetime | None = None
+        self.prepared = False
+        self.closed = False
+        self.file_counts = {"hit": 0, "miss": 0}
+        self.file_bytes = {"hit": 0, "miss": 0}
+
+    @contextlib.contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.monotonic() - started
+
+    def __enter__(self) -> "BackupRun":
+        # Group backups enter every run before the shared snapshot and again
+        # around each archive; only the first entry prepares.
+        if not self.prepared:
+            with self._phase("prepare"):
+                self._prepare()
+            self.prepared = True
+        return self
+
+    def _prepare(self) -> None:
+        unit = self.ctx.systemd.vm_backup_unit(self.vm)
+        if self.ctx.systemd.is_active(unit):
+            # The job's hooks snapshot into the same path and its borg create
+            # would race ours for the repository lock.
+            raise CliError(f"{unit} is running; refusing to back up VM '{self.vm}' concurrently")
+        self.ctx.btrfs.reset()
+        self.ctx.btrfs.inspect([self.source, self.snapshot])
+        if not self.ctx.btrfs.is_subvolume(self.source):
+            raise CliError(f"VM path is not a btrfs subvolume: {self.source}")
+        if self.ctx.runner.dry_run:
+            LOGGER.info("[dry-run] mkdir -p %s", self.snapshot.parent)
+        else:
+            self.snapshot.parent.mkdir(parents=True, exist_ok=True)
+        self.ctx.btrfs.delete_subvolume_strict_if_exists(
+            self.snapshot, "stale backup snapshot"
+        )
+
+    def run(self) -> None:
+        LOGGER.info("Starting backup of VM '%s'.", self.vm)
+        if not self.snapshot_taken:
+            with self._phase("snapshot"):
+                self._snapshot()
+
+        # Named after the snapshot, not the create: a group archives its VMs
+        # one after another, but they all hold the same point in time.
+        taken_at = self.snapshot_time or datetime.now()
+        self.archive = f"{self.prefix}-{taken_at.strftime(BACKUP_ARCHIVE_TIME_FORMAT)}"
+        LOGGER.info("Creating archive '%s' from %s.", self.archive, self.snapshot)
+        with self._phase("create"):
+            # The /./ marker makes borg store paths relative to the snapshot,
+            # exactly like the NixOS borgbackup job does.
+            self.stats = self.ctx.borg.create_archive(
+                self.vm_data,
+                self.archive,
+                [f"{self.snapshot}/./."],
+                compression=self.vm_data.compression,
+                files_cache=self.vm_data.files_cache,
+                on_file_status=self._count_file_status,
+            )
+        self._log_created()
+        self._log_files_cache()
+
+        if self.vm_data.prune_keep:
+            with self._phase("prune"):
+                self.ctx.borg.prune_archives(
+                    self.vm_data, glob=f"{self.prefix}-*", keep=self.vm_data.prune_keep
+                )
+            # Since borg 1.2 prune only marks segments; compact frees the space.
+            with self._phase("compact"):
+                self.ctx.borg.compact_archives(self.vm_data)
+
+    def _snapshot(self) -> None:
+        def take() -> None:
+            self.snapshot_time = datetime.now()
+            self.ctx.btrfs.snapshot_subvolume(self.source, self.snapshot, readonly=True)
+
+        socket_path = self.vm_data.qga_socket
+        if socket_path is None or self.ctx.runner.dry_run:
+            if socket_path is not None:
+                LOGGER.info("[dry-run] freeze guest via %s", socket_path)
+            take()
+            return
+        if not socket_path.exists():
+            # No agent socket means the VM is not running; its disk is
+            # already quiescent.
+            LOGGER.info("QGA socket %s not present; snapshotting without freeze.", socket_path)
+            take()
+            return
+        try:
+            qga_client.freeze_call(
+                socket_path,
+                self.qga_timeout,
+                take,
+                report=lambda message: LOGGER.info("VM '%s': %s", self.vm, message),
+            )
+        except qga_client.QgaError as exc:
+            raise CliError(f"guest freeze failed for VM '{self.vm}': {exc}") from exc
+        self.snapshot_taken = True
+
+    def _count_file_status(self, status: str, path: str) -> None:
+        if status == "U":
+            outcome = "hit"
+        elif status in {"A", "M"}:
+            outcome = "miss"
+        else:
+            return
+        self.file_counts[outcome] += 1
+        try:
+            size = os.lstat(self.snapshot / path).st_size
+        except OSError:
+            return
+        self.file_bytes[outcome] += size
+
+    def files_cache_report(self) -> dict[str, object]:
+        files = self.file_counts["hit"] + self.file_counts["miss"]
+        total = self.file_bytes["hit"] + self.file_bytes["miss"]
+        return {
+            "hit_files": self.file_counts["hit"],
+            "files": files,
+            "hit_bytes": self.file_bytes["hit"],
+            "bytes": total,
+            "hit_rate": self.file_bytes["hit"] / total if total else None,
+        }
+
+    def _log_files_cache(self) -> None:
+        report = self.files_cache_report()
+        if not report["files"]:
+            return
+        rate = report["hit_rate"]
+        LOGGER.info(
+            "Files cache for VM '%s': %d of %d files unchanged, %s of %s not re-read (%s).",
+            self.vm,
+            report["hit_files"],
+            report["files"],
+            _format_bytes(report["hit_bytes"]),
+            _format_bytes(report["bytes"]),
+            f"{rate:.1%}" if isinstance(rate, float) else "N/A",
+        )
+
+    def _log_created(self) -> None:
+        raw_stats = self.stats.get("stats")
+        stats = raw_stats if isinstance(raw_stats, dict) else {}
+        if not stats:
+            return
+        LOGGER.info(
+            "Archive '%s': %s original, %s deduplicated, %s files.",
+            self.archive,
+            _format_bytes(stats.get("original_size")),
+            _format_bytes(stats.get("deduplicated_size")),
+            _string_or_na(stats.get("nfiles")),
+        )
+
+    def _cleanup(self) -> None:
+        self.ctx.btrfs.cleanup_subvolume_best_effort(self.snapshot, "backup snapshot")
+        if self.ctx.runner.dry_run:
+            return
+        with contextlib.suppress(OSError):
+            # Only succeeds once the directory is empty.
+            self.snapshot.parent.rmdir()
+
+    def _refresh_index(self) -> None:
+        index = self.ctx.borg.index
+        if index is None or self.ctx.runner.dry_run:
+            return
+        raw_stats = self.stats.get("stats")
+        stats = raw_stats if isinstance(raw_stats, dict) else {}
+        try:
+            if self.archive is not None:
+                index.record_created(
+                    self.vm_data.repo,
+                    self.archive,
+                    deduplicated_size=_int_or_none(stats.get("deduplicated_size")),
+                )
+            refresh_archive_index(self.ctx.borg, index, self.vm, self.vm_data)
+        except CliError as exc:
+            LOGGER.warning("failed to index VM '%s' after backup: %s", self.vm, exc)
+
+    def _report_timings(self) -> None:
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()]
+        LOGGER.info("Backup phases for VM '%s': %s.", self.vm, ", ".join(parts))
+
+        if self.metrics_path is None or self.ctx.runner.dry_run:
+            return
+        record = {
+            "event": "backup-phases",
+            "vm": self.vm,
+            "archive": self.archive,
+            "phases": {name: round(value, 3) for name, value in self.timings.items()},
+            "files_cache": self.files_cache_report(),
+        }
+        try:
+            with self.metrics_path.open("a", encoding="utf-8") as sink:
+                sink.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except OSError as exc:
+            LOGGER.warning("failed to write backup metrics to %s: %s", self.metrics_path, exc)
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self.closed:
+            return False
+        self.closed = True
+        if exc_type is not None:
+            LOGGER.error("Backup failed for VM '%s'; removing snapshot.", self.vm)
+        with self._phase("cleanup"):
+            self._cleanup()
+        if exc_type is None:
+            self._refresh_index()
+        self._report_timings()
+        return False
+
+
+class BatchScheduler(Generic[JobT]):
+    # A central dispatcher instead of per-job semaphores: jobs blocked on a
+    # busy repo host never hold a disk slot that another job could use.
+    # Eligible jobs start in the order given.
+    def __init__(
+        self,
+        *,
+        per_host: int,
+        per_disk: int,
+        run_job: Callable[[JobT], None],
+    ) -> None:
+        self.per_host = per_host
+        self.per_disk = per_disk
+        self.run_job = run_job
+
+    def run(self, jobs: Sequence[JobT]) -> dict[str, BaseException | None]:
+        pending = list(jobs)
+        active_hosts: dict[str, int] = {}
+        active_disks: dict[str, int] = {}
+        results: dict[str, BaseException | None] = {}
+        if not pending:
+            return results
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            running: dict[concurrent.futures.Future[None], JobT] = {}
+            while pending or running:
+                for job in list(pending):
+                    if active_hosts.get(job.repo_host, 0) >= self.per_host:
+                        continue
+                    if active_disks.get(job.disk, 0) >= self.per_disk:
+                        continue
+                    pending.remove(job)
+                    active_hosts[job.repo_host] = active_hosts.get(job.repo_host, 0) + 1
+                    active_disks[job.disk] = active_disks.get(job.disk, 0) + 1
+                    running[pool.submit(self.run_job, job)] = job
+
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    job = running.pop(future)
+                    active_hosts[job.repo_host] -= 1
+                    active_disks[job.disk] -= 1
+                    results[job.vm] = future.exception()
+        return results
+
+
+def _repo_host(repo: str) -> str:
+    target = _ssh_destination(repo)
+    if target is None:
+        return "local"
+    destination, port = target
+    host = destination.rsplit("@", 1)[-1]
+    return f"{host}:{port}" if port is not None else host
+
+
+def _disk_key(path: Path) -> str:
+    # Subvolumes report their own st_dev, so key on the directory that holds
+    # them rather than on the VM subvolume itself.
+    try:
+        return f"dev:{path.parent.stat().st_dev}"
+    except OSError:
+        return str(path.parent)
+
+
+class DaemonClient:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    @classmethod
+    def connect(cls, path: Path) -> "DaemonClient | None":
+        client = cls(path)
+        try:
+            client.call({"op": "ping"})
+        except (OSError, CliError) as exc:
+            LOGGER.debug("daemon at %s unavailable: %s", path, exc)
+            return None
+        return client
+
+    def call(
+        self,
+        request: Mapping[str, object],
+        *,
+        on_event: Callable[[dict[str, object]], None] | None = None,
+    ) -> dict[str, object]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(self.path))
+            sock.sendall(_encode_frame(request))
+            while (message := _read_frame(sock)) is not None:
+                if "event" in message:
+                    if on_event is not None:
+                        on_event(message)
+                    continue
+                if message.get("status") != "ok":
+                    raise CliError(str(message.get("error", "daemon request failed")))
+                return message
+        raise CliError("daemon closed the connection without a response")
+
+    @staticmethod
+    def _decode_info(raw: object) -> ArchiveInfo:
+        info = archive_info_from_json(raw)
+        if info is None:
+            raise CliError("daemon returned malformed archive info")
+        return info
+
+    def list_archives(
+        self, vm: str, *, refresh: bool = False, bypass_lock: bool = False
+    ) -> list[ArchiveInfo]:
+        response = self.call(
+            {"op": "list", "vm": vm, "refresh": refresh, "bypass_lock": bypass_lock}
+        )
+        raw_archives = response.get("archives")
+        if not isinstance(raw_archives, list):
+            raise CliError("daemon returned malformed archive list")
+        return [self._decode_info(raw) for raw in raw_archives]
+
+    def archive_info(
+        self, vm: str, archive: str, *, bypass_lock: bool = False
+    ) -> ArchiveInfo:
+        response = self.call(
+            {"op": "info", "vm": vm, "archive": archive, "bypass_lock": bypass_lock}
+        )
+        return self._decode_info(response.get("info"))
+
+    def staged_archive(self, vm: str) -> str:
+        response = self.call({"op": "staged", "vm": vm})
+        return _read_string_field(response.get("archive"), field_path="response.archive")
+
+    def restore(
+        self,
+        vm: str,
+        archive: str,
+        *,
+        metrics_path: Path | None,
+        **mode: object,
+    ) -> None:
+        def relay(event: dict[str, object]) -> None:
+            level = logging.getLevelName(str(event.get("level", "INFO")))
+            LOGGER.log(
+                level if isinstance(level, int) else logging.INFO,
+                "%s",
+                event.get("message", ""),
+            )
+
+        self.call(
+            {
+                "op": "restore",
+                "vm": vm,
+                "archive": archive,
+                "metrics_file": str(metrics_path.absolute()) if metrics_path else None,
+                "mode": mode,
+            },
+            on_event=relay,
+        )
+
+
+class DaemonBorgService(BorgService):
+    # Archive metadata comes from the daemon's warm listings and caches, so the
+    # picker, previews and formatting run unchanged on top of it.
+    def __init__(self, runner: CommandRunner, daemon: DaemonClient) -> None:
+        super().__init__(runner)
+        self.daemon = daemon
+
+    @staticmethod
+    def _vm(vm_data: VmBackupConfig) -> str:
+        if vm_data.name == "":
+            raise CliError(f"VM for repository is not in the manifest: {vm_data.repo}")
+        return vm_data.name
+
+    def list_archive_metadata(
+        self,
+        vm_data: VmBackupConfig,
+        *,
+        bypass_lock: bool = False,
+        refresh: bool = False,
+    ) -> list[ArchiveInfo]:
+        return self.daemon.list_archives(
+            self._vm(vm_data), refresh=refresh, bypass_lock=bypass_lock
+        )
+
+    def fetch_archive_info(
+        self, vm_data: VmBackupConfig, archive: str, *, bypass_lock: bool = False
+    ) -> ArchiveInfo:
+        return self.daemon.archive_info(
+            self._vm(vm_data), archive, bypass_lock=bypass_lock
+        )
+
+
+class _ForwardingLogHandler(logging.Handler):
+    def __init__(self, send: Callable[[dict[str, object]], None]) -> None:
+        super().__init__(level=logging.INFO)
+        self.send = send
+        self.thread_id = threading.get_ident()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.thread != self.thread_id:
+            return
+        try:
+            self.send(
+                {"event": "log", "level": record.levelname, "message": record.getMessage()}
+            )
+        except OSError:
+            # The client went away; the restore itself carries on.
+            pass
+
+
+class BackupDaemon:
+    def __init__(
+        self,
+        ctx: AppContext,
+        listener: socket.socket,
+        *,
+        manifest_path: Path | None = None,
+        idle_timeout: float = DAEMON_IDLE_TIMEOUT,
+        listing_ttl: float = DAEMON_LISTING_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ctx = ctx
+        self.listener = listener
+        self.manifest_path = manifest_path
+        self._manifest_version = self._stat_manifest()
+        self.idle_timeout = idle_timeout
+        self.listing_ttl = listing_ttl
+        self._clock = clock
+        self._listings: dict[str, tuple[float, list[ArchiveInfo]]] = {}
+        self._restoring: set[str] = set()
+        self._active = 0
+        self._last_activity = clock()
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=DAEMON_CLIENT_THREADS
+        )
+
+    def serve_forever(self) -> None:
+        self.listener.settimeout(0.5)
+        try:
+            while True:
+                try:
+                    conn, _ = self.listener.accept()
+                except socket.timeout:
+                    if self._idle_expired():
+                        LOGGER.info("Idle for %.0fs; exiting.", self.idle_timeout)
+                        return
+                    continue
+                conn.settimeout(None)
+                with self._lock:
+                    self._active += 1
+                self._pool.submit(self._handle_connection, conn)
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def _idle_expired(self) -> bool:
+        if self.idle_timeout <= 0:
+            return False
+        with self._lock:
+            return (
+                self._active == 0
+                and self._clock() - self._last_activity >= self.idle_timeout
+            )
+
+    def _handle_connection(self, conn: socket.socket) -> None:
+        def send(message: Mapping[str, object]) -> None:
+            conn.sendall(_encode_frame(message))
+
+        try:
+            with conn:
+                try:
+                    response = self._dispatch(_read_frame(conn) or {}, send)
+                except CliError as exc:
+                    response = {"status": "error", "error": str(exc)}
+                except Exception as exc:
+                    LOGGER.exception("daemon request failed")
+                    response = {"status": "error", "error": f"daemon error: {exc}"}
+                with contextlib.suppress(OSError):
+                    send(response)
+        finally:
+            self.ctx.borg.flush_cache()
+            with self._lock:
+                self._active -= 1
+                self._last_activity = self._clock()
+
+    def _stat_manifest(self) -> tuple[int, int, int] | None:
+        if self.manifest_path is None:
+            return None
+        try:
+            st = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        # Store paths all carry the same mtime, so a NixOS switch only shows
+        # up as the /etc symlink resolving to a different inode.
+        return st.st_dev, st.st_ino, st.st_mtime_ns
+
+    def _refresh_manifest(self) -> None:
+        version = self._stat_manifest()
+        with self._lock:
+            if version is None or version == self._manifest_version:
+                return
+            try:
+                manifest = load_manifest(str(self.manifest_path))
+            except CliError as exc:
+                LOGGER.warning("Keeping the loaded manifest: %s", exc)
+                return
+            LOGGER.info("Reloaded manifest from %s.", self.manifest_path)
+            self.ctx = dataclasses.replace(self.ctx, manifest=manifest)
+            self._manifest_version = version
+            self._listings.clear()
 
-        self.restore_finished = True
-        LOGGER.info("Restore completed for VM '%s'.", self.vm)
+    def _dispatch(
+        self,
+        request: dict[str, object],
+        send: Callable[[Mapping[str, object]], None],
+    ) -> dict[str, object]:
+        op = request.get("op")
+        if op == "ping":
+            return {"status": "ok", "pid": os.getpid()}
+
+        self._refresh_manifest()
+        self.ctx.btrfs.reset()
+        vm = _read_string_field(request.get("vm"), field_path="request.vm")
+        vm_data = require_vm(self.ctx.manifest, vm)
+        if op == "list":
+            infos = self._listing(
+                vm,
+                vm_data,
+                refresh=request.get("refresh") is True,
+                bypass_lock=request.get("bypass_lock") is True,
+            )
+            return {"status": "ok", "archives": [archive_info_to_json(i) for i in infos]}
+        if op == "info":
+            archive = _read_string_field(
+                request.get("archive"), field_path="request.archive"
+            )
+            info = self.ctx.borg.fetch_archive_info(
+                vm_data, archive, bypass_lock=request.get("bypass_lock") is True
+            )
+            return {"status": "ok", "info": archive_info_to_json(info)}
+        if op == "staged":
+            return {"status": "ok", "archive": _staged_archive(self.ctx, vm, None)}
+        if op == "restore":
+            self._restore(vm, vm_data, request, send)
+            return {"status": "ok"}
+        raise CliError(f"unknown daemon op: {op!r}")
 
-    def __exit__(self, exc_type, exc, tb) -> bool:
-        if exc_type is not None:
-            LOGGER.error("Restore failed for VM '%s'; attempting rollback.", self.vm)
-            self._rollback_best_effort()
+    def _listing(
+        self, vm: str, vm_data: VmBackupConfig, *, refresh: bool, bypass_lock: bool
+    ) -> list[ArchiveInfo]:
+        now = self._clock()
+        with self._lock:
+            cached = self._listings.get(vm)
+        if cached is not None and not refresh and now - cached[0] < self.listing_ttl:
+            return cached[1]
+        infos = self.ctx.borg.list_archive_metadata(vm_data, bypass_lock=bypass_lock)
+        with self._lock:
+            self._listings[vm] = (now, infos)
+        return infos
 
-        self.ctx.btrfs.cleanup_subvolume_best_effort(
-            self.paths.stage, "restore stage subvolume"
-        )
-        if self.restore_finished:
-            self.ctx.btrfs.cleanup_subvolume_best_effort(
-                self.paths.old, "previous VM subvolume"
+    def _restore(
+        self,
+        vm: str,
+        vm_data: VmBackupConfig,
+        request: dict[str, object],
+        send: Callable[[Mapping[str, object]], None],
+    ) -> None:
+        archive = _read_string_field(request.get("archive"), field_path="request.archive")
+        raw_mode = request.get("mode", {})
+        if not isinstance(raw_mode, dict) or any(
+            not (key in RESTORE_MODE_FLAGS and isinstance(value, bool))
+            and not (key == "verify" and value in (None, *STAGE_VERIFY_MODES))
+            for key, value in raw_mode.items()
+        ):
+            raise CliError("request.mode must map restore flags to booleans")
+        metrics_path = None
+        if request.get("metrics_file") is not None:
+            metrics_path = _read_absolute_path_field(
+                request["metrics_file"], field_path="request.metrics_file"
             )
-        return False
 
-    def _rollback_best_effort(self) -> None:
-        if self.target_moved_to_old:
-            if self.paths.target.exists() and self.ctx.btrfs.is_subvolume(
-                self.paths.target
-            ):
-                result = self.ctx.runner.run(
-                    ["btrfs", "subvolume", "delete", str(self.paths.target)],
-                    mutating=True,
-                )
-                if result.returncode != 0:
-                    LOGGER.warning(
-                        "failed to delete partially restored target: %s",
-                        self.paths.target,
-                    )
+        with self._lock:
+            if vm in self._restoring:
+                raise CliError(f"a restore of VM '{vm}' is already running")
+            self._restoring.add(vm)
+        handler = _ForwardingLogHandler(send)
+        LOGGER.addHandler(handler)
+        try:
+            with RestoreTransaction(
+                self.ctx, vm, archive, vm_data, metrics_path=metrics_path, **raw_mode
+            ) as tx:
+                tx.run()
+        finally:
+            LOGGER.removeHandler(handler)
+            with self._lock:
+                self._restoring.discard(vm)
+
+
+def _daemon_listener(path: Path) -> socket.socket:
+    # Under systemd socket activation the listening socket is inherited as fd 3.
+    if os.environ.get("LISTEN_PID") == str(os.getpid()) and int(
+        os.environ.get("LISTEN_FDS", "0")
+    ) >= 1:
+        return socket.socket(fileno=SD_LISTEN_FDS_START)
+
+    path.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
+    with contextlib.suppress(FileNotFoundError):
+        path.unlink()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        sock.bind(str(path))
+    finally:
+        os.umask(old_umask)
+    sock.listen(32)
+    return sock
 
-            if self.paths.old.exists():
-                if self.ctx.runner.dry_run:
-                    LOGGER.info(
-                        "[dry-run] mv %s -> %s", self.paths.old, self.paths.target
-                    )
-                else:
-                    try:
-                        self.paths.old.rename(self.paths.target)
-                        LOGGER.info("Rollback completed for VM '%s'.", self.vm)
-                    except OSError:
-                        LOGGER.warning(
-                            "rollback move failed (%s -> %s)",
-                            self.paths.old,
-                            self.paths.target,
-                        )
-            else:
-                LOGGER.warning("rollback source missing: %s", self.paths.old)
 
-        if self.was_active:
-            self.ctx.systemd.start_best_effort(self.service)
+def _daemon_socket_path() -> Path:
+    return Path(os.environ.get(DAEMON_SOCKET_ENV, DEFAULT_DAEMON_SOCKET))
+
+
+def _connect_daemon(args: argparse.Namespace) -> DaemonClient | None:
+    if args.command not in DAEMON_CLIENT_COMMANDS or args.dry_run or args.no_daemon:
+        return None
+    # The daemon serves its own manifest; an explicit override means the
+    # caller wants a different one.
+    if args.manifest is not None:
+        return None
+    path = _daemon_socket_path()
+    if not path.exists():
+        return None
+    return DaemonClient.connect(path)
+
+
+def _run_restore(
+    ctx: AppContext,
+    vm: str,
+    archive: str,
+    vm_data: VmBackupConfig,
+    *,
+    metrics_path: Path | None,
+    **mode: object,
+) -> None:
+    if ctx.daemon is not None:
+        ctx.daemon.restore(vm, archive, metrics_path=metrics_path, **mode)
+        return
+    with RestoreTransaction(
+        ctx, vm, archive, vm_data, metrics_path=metrics_path, **mode
+    ) as tx:
+        tx.run()
 
 
 def ask_restore_confirmation(
@@ -1264,14 +4475,222 @@ def ask_restore_confirmation(
     return answer in {"y", "yes"}
 
 
+def snapshot_backup_group(
+    ctx: AppContext, runs: Sequence[BackupRun], *, qga_timeout: float = qga_client.DEFAULT_TIMEOUT
+) -> None:
+    sockets: list[Path] = []
+    for run in runs:
+        socket_path = run.vm_data.qga_socket
+        if socket_path is None:
+            continue
+        if not ctx.runner.dry_run and not socket_path.exists():
+            LOGGER.info(
+                "QGA socket %s not present; VM '%s' is snapshotted without freeze.",
+                socket_path,
+                run.vm,
+            )
+            continue
+        sockets.append(socket_path)
+
+    def take_all() -> None:
+        taken_at = datetime.now()
+        for run in runs:
+            run.snapshot_time = taken_at
+        ctx.btrfs.snapshot_subvolumes(
+            [(run.source, run.snapshot) for run in runs], readonly=True
+        )
+
+    started = time.monotonic()
+    if ctx.runner.dry_run or not sockets:
+        if sockets:
+            LOGGER.info("[dry-run] group freeze guests via %s", ", ".join(map(str, sockets)))
+        take_all()
+    else:
+        try:
+            qga_client.group_freeze_call(sockets, qga_timeout, take_all, report=LOGGER.info)
+        except qga_client.QgaError as exc:
+            raise CliError(f"group freeze failed: {exc}") from exc
+    elapsed = time.monotonic() - started
+    for run in runs:
+        run.timings["snapshot"] = elapsed
+        run.snapshot_taken = True
+
+
+def _run_backup_group(ctx: AppContext, args: argparse.Namespace) -> None:
+    vms = list(dict.fromkeys(args.group))
+    targets = [(vm, require_vm(ctx.manifest, vm)) for vm in vms]
+
+    # The stack covers the scheduler too: each run closes itself as its
+    # archive finishes, and the stack only cleans up runs that never got
+    # that far (a failed group snapshot, Ctrl-C while waiting).
+    with contextlib.ExitStack() as stack:
+        runs = {
+            vm: stack.enter_context(
+                BackupRun(ctx, vm, vm_data, metrics_path=args.metrics_file)
+            )
+            for vm, vm_data in targets
+        }
+        snapshot_backup_group(ctx, list(runs.values()))
+        jobs = [
+            BackupJob(
+                vm=vm,
+                vm_data=vm_data,
+                repo_host=_repo_host(vm_data.repo),
+                disk=_disk_key(runs[vm].source),
+                expected_seconds=None,
+            )
+            for vm, vm_data in targets
+        ]
+        _schedule_backups(ctx, args, jobs, lambda job: runs[job.vm], kind="group")
+
+
+def _expected_backup_seconds(index: ArchiveIndex | None, vm: str) -> float | None:
+    if index is None:
+        return None
+    durations = sorted(
+        item.info.duration
+        for item in index.search(vms=[vm], limit=BACKUP_HISTORY_SAMPLES)
+        if item.info.duration is not None
+    )
+    if not durations:
+        return None
+    return durations[len(durations) // 2]
+
+
+def order_backup_jobs(jobs: Sequence[BackupJob]) -> list[BackupJob]:
+    # Longest expected first so the big images start while there is still
+    # capacity left for the short ones to fill in around them.  VMs without
+    # history are assumed long rather than risk starting them last.
+    return sorted(
+        jobs,
+        key=lambda job: (
+            job.expected_seconds is not None,
+            -(job.expected_seconds or 0.0),
+            job.vm,
+        ),
+    )
+
+
+def _build_backup_jobs(ctx: AppContext) -> list[BackupJob]:
+    index = ctx.borg.index
+    jobs = [
+        BackupJob(
+            vm=vm,
+            vm_data=vm_data,
+            repo_host=_repo_host(vm_data.repo),
+            disk=_disk_key(vm_paths(ctx.manifest.volume_path, vm).target),
+            expected_seconds=_expected_backup_seconds(index, vm),
+        )
+        for vm, vm_data in sorted(ctx.manifest.vms.items())
+    ]
+    if not jobs:
+        raise CliError("No backup-enabled VMs configured.")
+    return order_backup_jobs(jobs)
+
+
+def _run_backup_batch(ctx: AppContext, args: argparse.Namespace) -> None:
+    jobs = _build_backup_jobs(ctx)
+    LOGGER.info(
+        "Backup order: %s.",
+        ", ".join(
+            f"{job.vm} (~{_format_seconds(job.expected_seconds)})"
+            if job.expected_seconds is not None
+            else f"{job.vm} (no history)"
+            for job in jobs
+        ),
+    )
+
+    _schedule_backups(
+        ctx,
+        args,
+        jobs,
+        lambda job: BackupRun(ctx, job.vm, job.vm_data, metrics_path=args.metrics_file),
+        kind="batch",
+    )
+
+
+def _schedule_backups(
+    ctx: AppContext,
+    args: argparse.Namespace,
+    jobs: Sequence[BackupJob],
+    open_run: Callable[[BackupJob], BackupRun],
+    *,
+    kind: str,
+) -> None:
+    durations: dict[str, float] = {}
+
+    def run_job(job: BackupJob) -> None:
+        started = time.monotonic()
+        try:
+            with open_run(job) as run:
+                run.run()
+        finally:
+            durations[job.vm] = time.monotonic() - started
+
+    started = time.monotonic()
+    scheduler = BatchScheduler(
+        per_host=args.per_host, per_disk=args.per_disk, run_job=run_job
+    )
+    results = scheduler.run(jobs)
+    makespan = time.monotonic() - started
+
+    failed = []
+    for job in jobs:
+        error = results.get(job.vm)
+        if error is None:
+            LOGGER.info(
+                "Backed up VM '%s' in %s.", job.vm, _format_seconds(durations.get(job.vm))
+            )
+        else:
+            LOGGER.error("Backup of VM '%s' failed: %s", job.vm, error)
+            failed.append(job.vm)
+    serial = sum(durations.values())
+    LOGGER.info(
+        "Backed up %d VM(s): makespan %s, serial total %s, longest VM %s.",
+        len(jobs),
+        _format_seconds(makespan),
+        _format_seconds(serial),
+        _format_seconds(max(durations.values(), default=0.0)),
+    )
+    if args.metrics_file is not None and not ctx.runner.dry_run:
+        record = {
+            "event": f"backup-{kind}",
+            "makespan_seconds": round(makespan, 3),
+            "vms": {vm: round(seconds, 3) for vm, seconds in durations.items()},
+            "failed": failed,
+        }
+        try:
+            with args.metrics_file.open("a", encoding="utf-8") as sink:
+                sink.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except OSError as exc:
+            LOGGER.warning("failed to write backup metrics to %s: %s", args.metrics_file, exc)
+    if failed:
+        raise CliError(f"{kind} backup failed for: {', '.join(failed)}")
+
+
 def handle_backup(ctx: AppContext, args: argparse.Namespace) -> None:
+    if args.all or args.group:
+        if args.vm is not None:
+            raise CliError("--all and --group cannot be combined with a VM name")
+        if args.all and args.group:
+            raise CliError("--all and --group are exclusive")
+        if args.group:
+            _run_backup_group(ctx, args)
+        else:
+            _run_backup_batch(ctx, args)
+        return
+
     if ctx.runner.dry_run and args.vm is None:
         raise CliError(
             "interactive mode is disabled in dry-run; provide VM explicitly for backup"
         )
 
-    vm, _ = _resolve_vm_for_interactive(ctx, args.vm)
-    ctx.systemd.restart_backup_job(vm)
+    vm, vm_data = _resolve_vm_for_interactive(ctx, args.vm)
+    if not args.run:
+        ctx.systemd.restart_backup_job(vm)
+        return
+    with BackupRun(ctx, vm, vm_data, metrics_path=args.metrics_file) as run:
+        run.run()
 
 
 def _resolve_vm_for_interactive(
@@ -1285,7 +4704,25 @@ def _resolve_vm_for_interactive(
     return vm, require_vm(ctx.manifest, vm)
 
 
+def _print_archive_json(ctx: AppContext, args: argparse.Namespace) -> None:
+    vms = [args.vm] if args.vm is not None else sorted(ctx.manifest.vms)
+    rows: list[dict[str, object]] = []
+    for vm in vms:
+        vm_data = require_vm(ctx.manifest, vm)
+        infos = ctx.borg.list_archive_metadata(
+            vm_data, bypass_lock=ctx.manifest.preview_bypass_lock
+        )
+        if args.sort is not None:
+            infos = sort_archive_infos(infos, args.sort)
+        rows.extend({"vm": vm, **archive_info_to_json(info)} for info in infos)
+    print(json.dumps(rows, indent=2))
+
+
 def handle_list(ctx: AppContext, args: argparse.Namespace) -> None:
+    if args.json:
+        _print_archive_json(ctx, args)
+        return
+
     if ctx.runner.dry_run:
         if args.vm is None:
             raise CliError(
@@ -1298,7 +4735,7 @@ def handle_list(ctx: AppContext, args: argparse.Namespace) -> None:
         return
 
     vm, vm_data = _resolve_vm_for_interactive(ctx, args.vm)
-    picker = InteractiveArchivePicker(ctx.manifest, ctx.borg)
+    picker = InteractiveArchivePicker(ctx.manifest, ctx.borg, sort=args.sort)
     selection = picker.pick_archive(vm, vm_data)
     info = selection.info or ctx.borg.fetch_archive_info(vm_data, selection.archive)
     target = vm_paths(ctx.manifest.volume_path, vm).target
@@ -1307,14 +4744,30 @@ def handle_list(ctx: AppContext, args: argparse.Namespace) -> None:
 
 
 def handle_restore(ctx: AppContext, args: argparse.Namespace) -> None:
+    if args.stage_only and args.swap_staged:
+        raise CliError("--stage-only and --swap-staged cannot be combined")
+    if args.delta and args.swap_staged:
+        raise CliError("--delta and --swap-staged cannot be combined")
+    mode = {
+        "stage_only": args.stage_only,
+        "use_staged": args.swap_staged,
+        "delta": args.delta,
+        "defer_cleanup": args.defer_cleanup,
+        "verify": args.verify,
+    }
+
     if ctx.runner.dry_run:
-        if args.vm is None or args.archive is None:
+        if args.vm is None or (args.archive is None and not args.swap_staged):
             raise CliError(
                 "interactive mode is disabled in dry-run; provide both VM and archive"
             )
         vm_data = require_vm(ctx.manifest, args.vm)
-        with RestoreTransaction(ctx, args.vm, args.archive, vm_data) as tx:
-            tx.run()
+        archive = args.archive
+        if args.swap_staged:
+            archive = _staged_archive(ctx, args.vm, args.archive)
+        _run_restore(
+            ctx, args.vm, archive, vm_data, metrics_path=args.metrics_file, **mode
+        )
         return
 
     vm: str
@@ -1329,10 +4782,12 @@ def handle_restore(ctx: AppContext, args: argparse.Namespace) -> None:
         vm = picker.pick_vm()
         vm_data = require_vm(ctx.manifest, vm)
 
-    if args.archive is not None:
+    if args.swap_staged:
+        archive = _staged_archive(ctx, vm, args.archive)
+    elif args.archive is not None:
         archive = args.archive
     else:
-        picker = InteractiveArchivePicker(ctx.manifest, ctx.borg)
+        picker = InteractiveArchivePicker(ctx.manifest, ctx.borg, sort=args.sort)
         selection = picker.pick_archive(vm, vm_data)
         archive = selection.archive
         info = selection.info
@@ -1345,8 +4800,344 @@ def handle_restore(ctx: AppContext, args: argparse.Namespace) -> None:
         if not confirmed:
             raise CliError("restore cancelled by user")
 
-    with RestoreTransaction(ctx, vm, archive, vm_data) as tx:
-        tx.run()
+    _run_restore(ctx, vm, archive, vm_data, metrics_path=args.metrics_file, **mode)
+
+
+def _staged_archive(ctx: AppContext, vm: str, requested: str | None) -> str:
+    if ctx.daemon is not None:
+        archive = ctx.daemon.staged_archive(vm)
+    else:
+        marker = read_stage_marker(vm_paths(ctx.manifest.volume_path, vm))
+        archive = str(marker["archive"])
+    if requested is not None and requested != archive:
+        raise CliError(f"VM '{vm}' has archive '{archive}' staged, not '{requested}'")
+    return archive
+
+
+def _build_restore_jobs(
+    ctx: AppContext, args: argparse.Namespace
+) -> list[RestoreJob]:
+    requested: list[tuple[str, str | None]] = []
+    if args.all:
+        requested.extend((vm, None) for vm in sorted(ctx.manifest.vms))
+    for target in args.targets:
+        vm, sep, archive = target.partition("=")
+        requested.append((vm, archive if sep and archive else None))
+    if not requested:
+        raise CliError("restore-batch needs VM targets or --all")
+
+    jobs: list[RestoreJob] = []
+    seen: set[str] = set()
+    for vm, archive in requested:
+        if vm in seen:
+            raise CliError(f"VM listed more than once: {vm}")
+        seen.add(vm)
+        vm_data = require_vm(ctx.manifest, vm)
+        if archive is None:
+            archive = ctx.borg.latest_archive(vm_data)
+        jobs.append(
+            RestoreJob(
+                vm=vm,
+                archive=archive,
+                vm_data=vm_data,
+                repo_host=_repo_host(vm_data.repo),
+                disk=_disk_key(vm_paths(ctx.manifest.volume_path, vm).target),
+            )
+        )
+    return jobs
+
+
+def handle_restore_batch(ctx: AppContext, args: argparse.Namespace) -> None:
+    jobs = _build_restore_jobs(ctx, args)
+
+    print("Restore plan:")
+    for job in jobs:
+        print(f"  {job.vm}: {job.archive}")
+    if not args.yes and not ctx.runner.dry_run:
+        answer = input(f"Proceed with restoring {len(jobs)} VM(s)? [y/N]: ")
+        if answer.strip().lower() not in {"y", "yes"}:
+            raise CliError("restore cancelled by user")
+    if args.metrics_dir is not None:
+        args.metrics_dir.mkdir(parents=True, exist_ok=True)
+
+    def run_job(job: RestoreJob) -> None:
+        metrics_path = None
+        if args.metrics_dir is not None:
+            metrics_path = args.metrics_dir / f"{job.vm}.jsonl"
+        with RestoreTransaction(
+            ctx,
+            job.vm,
+            job.archive,
+            job.vm_data,
+            metrics_path=metrics_path,
+            defer_cleanup=args.defer_cleanup,
+            verify=args.verify,
+        ) as tx:
+            tx.run()
+
+    scheduler = BatchScheduler(
+        per_host=args.per_host, per_disk=args.per_disk, run_job=run_job
+    )
+    results = scheduler.run(jobs)
+
+    failed = []
+    for job in jobs:
+        error = results.get(job.vm)
+        if error is None:
+            LOGGER.info("Restored VM '%s' from '%s'.", job.vm, job.archive)
+        else:
+            LOGGER.error("Restore of VM '%s' failed: %s", job.vm, error)
+            failed.append(job.vm)
+    if failed:
+        raise CliError(f"batch restore failed for: {', '.join(failed)}")
+
+
+def _positive_int_arg(raw: str) -> int:
+    try:
+        value = int(raw)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid positive integer: {raw!r}") from exc
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+    return value
+
+
+def handle_cleanup(ctx: AppContext, args: argparse.Namespace) -> None:
+    volume_path = ctx.manifest.volume_path
+    queued = ctx.btrfs.queued_deletions(deletion_queue_dir(volume_path))
+
+    if args.status:
+        backlog = ctx.btrfs.cleaner_backlog(volume_path)
+        print(f"Queued for deletion: {len(queued)}")
+        for path in queued:
+            print(f"  {path}")
+        print(f"Awaiting btrfs cleaner: {len(backlog)}")
+        for subvolume_id in backlog:
+            print(f"  ID {subvolume_id}")
+        return
+
+    status = ctx.btrfs.inspect(queued)
+    deletable = [path for path in queued if status[path]]
+    for path in queued:
+        if not status[path]:
+            LOGGER.warning("Skipping queued path that is not a btrfs subvolume: %s", path)
+    if deletable:
+        LOGGER.info("Deleting %d queued subvolume(s).", len(deletable))
+        ctx.btrfs.delete_subvolumes(deletable)
+    else:
+        LOGGER.info("No subvolumes queued for deletion.")
+
+    if args.wait and not ctx.runner.dry_run:
+        backlog = ctx.btrfs.cleaner_backlog(volume_path)
+        if backlog:
+            LOGGER.info("Waiting for the btrfs cleaner to reclaim %d subvolume(s).", len(backlog))
+            ctx.btrfs.wait_for_cleaner(volume_path, backlog)
+        LOGGER.info("btrfs cleaner is idle.")
+
+
+def _index_archive(
+    borg: BorgService, vm: str, archive_id: str, entry: Mapping[str, object]
+) -> IndexedArchive:
+    return IndexedArchive(
+        vm=vm,
+        archive_id=archive_id,
+        info=borg._archive_info_from_entry(entry, str(entry.get("name"))),
+    )
+
+
+def refresh_archive_index(
+    borg: BorgService, index: ArchiveIndex, vm: str, vm_data: VmBackupConfig
+) -> tuple[int, int]:
+    entries = borg.list_archive_entries(vm_data)
+    known = index.known_ids(vm_data.repo)
+    archive_ids: dict[str, str] = {}
+    updates: list[IndexedArchive] = []
+    for entry in entries:
+        name = str(entry["name"])
+        archive_id = _string_or_na(entry.get("id"))
+        archive_ids[name] = archive_id
+        if known.get(name) == archive_id:
+            continue
+        # Only archives new to the index pay for a `borg info` round trip.
+        details = borg.fetch_archive_entry(vm_data, name)
+        updates.append(_index_archive(borg, vm, archive_id, {**entry, **details}))
+    removed = index.replace(
+        vm=vm, repo=vm_data.repo, archive_ids=archive_ids, updates=updates
+    )
+    return len(updates), removed
+
+
+def _archive_index(ctx: AppContext) -> ArchiveIndex:
+    if ctx.borg.index is not None:
+        return ctx.borg.index
+    return ArchiveIndex(Path(DEFAULT_CACHE_DIR) / ARCHIVE_INDEX_FILE)
+
+
+def _refresh_index(ctx: AppContext, index: ArchiveIndex, vms: Sequence[str]) -> list[str]:
+    targets = [(vm, require_vm(ctx.manifest, vm)) for vm in vms]
+    failed: list[str] = []
+    # One borg repository per VM, so repositories refresh independently.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=INDEX_WORKERS) as pool:
+        futures = {
+            pool.submit(refresh_archive_index, ctx.borg, index, vm, vm_data): vm
+            for vm, vm_data in targets
+        }
+        for future in concurrent.futures.as_completed(futures):
+            vm = futures[future]
+            try:
+                added, removed = future.result()
+            except CliError as exc:
+                LOGGER.error("Failed to index VM '%s': %s", vm, exc)
+                failed.append(vm)
+                continue
+            LOGGER.info(
+                "Indexed VM '%s': %d new or changed, %d removed.", vm, added, removed
+            )
+    return sorted(failed)
+
+
+def handle_index(ctx: AppContext, args: argparse.Namespace) -> None:
+    failed = _refresh_index(ctx, _archive_index(ctx), args.vms or sorted(ctx.manifest.vms))
+    if failed:
+        raise CliError(f"indexing failed for: {', '.join(failed)}")
+
+
+def _backup_stats(item: IndexedArchive) -> dict[str, object]:
+    info = item.info
+    throughput = None
+    if info.duration and info.original_size is not None:
+        throughput = info.original_size / info.duration
+    # Only `backup --run` records what create added; archives from the NixOS
+    # job report no new data or ratio rather than a figure that drifts.
+    new_data = item.created_deduplicated_size
+    ratio = None
+    if info.original_size is not None and new_data:
+        ratio = info.original_size / new_data
+    return {
+        "vm": item.vm,
+        "archive": info.archive,
+        "start": info.start.isoformat() if info.start is not None else None,
+        "duration_seconds": info.duration,
+        "original_size": info.original_size,
+        "new_data_size": new_data,
+        "unique_size_now": info.deduplicated_size,
+        "bytes_per_second": throughput,
+        "dedup_ratio": ratio,
+    }
+
+
+def _mean(values: Sequence[object]) -> float | None:
+    numbers = [float(v) for v in values if isinstance(v, (int, float))]
+    return sum(numbers) / len(numbers) if numbers else None
+
+
+def handle_stats(ctx: AppContext, args: argparse.Namespace) -> None:
+    vms = args.vms or sorted(ctx.manifest.vms)
+    for vm in vms:
+        require_vm(ctx.manifest, vm)
+    index = _archive_index(ctx)
+    if not args.no_refresh:
+        for vm in _refresh_index(ctx, index, vms):
+            LOGGER.warning("Reporting possibly stale statistics for VM '%s'.", vm)
+
+    history: dict[str, list[dict[str, object]]] = {vm: [] for vm in vms}
+    for item in index.search(vms=vms):
+        if len(history[item.vm]) < args.last:
+            history[item.vm].append(_backup_stats(item))
+    for rows in history.values():
+        rows.reverse()
+
+    if args.json:
+        json.dump(history, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+
+    style_enabled = supports_ansi(sys.stdout)
+    for vm, rows in history.items():
+        durations = [row["duration_seconds"] for row in rows]
+        longest = max((d for d in durations if isinstance(d, float)), default=None)
+        mean_rate = _mean([row["bytes_per_second"] for row in rows])
+        mean_ratio = _mean([row["dedup_ratio"] for row in rows])
+        summary = [
+            f"VM: {vm}",
+            f"Archives: {len(rows)}",
+            f"Mean duration: {_format_seconds(_mean(durations))}",
+            f"Longest duration: {_format_seconds(longest)}",
+            f"Mean throughput: {_format_rate(mean_rate)}",
+            f"Mean dedup ratio: {_format_ratio(mean_ratio)}",
+        ]
+        if args.window is not None and longest is not None:
+            over = sum(1 for d in durations if isinstance(d, float) and d > args.window)
+            summary.append(f"Over {_format_seconds(args.window)} window: {over}")
+        print(stylize_key_value_block("\n".join(summary), enabled=style_enabled))
+        for row in rows:
+            print(
+                f"  {row['start']}  {_format_seconds(row['duration_seconds']):>10}"
+                f"  {_format_bytes(row['original_size']):>12}"
+                f"  new {_format_bytes(row['new_data_size']):>12}"
+                f"  unique now {_format_bytes(row['unique_size_now']):>12}"
+                f"  {_format_rate(row['bytes_per_second']):>14}"
+                f"  {_format_ratio(row['dedup_ratio']):>8}"
+            )
+        print()
+
+
+def _timestamp_arg(raw: str) -> str:
+    try:
+        return _local_timestamp(datetime.fromisoformat(raw))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid ISO timestamp: {raw}") from exc
+
+
+def _size_arg(raw: str) -> int:
+    units = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40, "P": 1 << 50}
+    value = raw.strip().upper().removesuffix("B").removesuffix("I")
+    number, unit = value, ""
+    if value and value[-1] in units:
+        number, unit = value[:-1], value[-1]
+    try:
+        size = float(number)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid size: {raw}") from exc
+    if size < 0:
+        raise argparse.ArgumentTypeError(f"size must not be negative: {raw}")
+    return int(size * units[unit])
+
+
+def handle_search(ctx: AppContext, args: argparse.Namespace) -> None:
+    for vm in args.vm:
+        require_vm(ctx.manifest, vm)
+    index = _archive_index(ctx)
+    results = index.search(
+        vms=args.vm,
+        after=args.after,
+        before=args.before,
+        min_size=args.min_size,
+        max_size=args.max_size,
+        latest=args.latest,
+    )
+    if not results:
+        LOGGER.info("No indexed archives match; run `index` to refresh the index.")
+        return
+    for item in results:
+        info = item.info
+        print(
+            f"{item.vm}\t{info.archive}\t{_format_timestamp(info.start)}"
+            f"\t{_format_seconds(info.duration)}\t{_format_bytes(info.original_size)}"
+            f"\t{_format_bytes(info.deduplicated_size)}"
+        )
+
+
+def handle_daemon(ctx: AppContext, args: argparse.Namespace) -> None:
+    listener = _daemon_listener(args.socket)
+    LOGGER.info("Serving requests on %s.", args.socket)
+    with listener:
+        BackupDaemon(
+            ctx,
+            listener,
+            manifest_path=_manifest_path(args.manifest),
+            idle_timeout=args.idle_timeout,
+        ).serve_forever()
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -1361,14 +5152,80 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Print mutating actions without executing them",
     )
+    parser.add_argument(
+        "--trace-file",
+        type=Path,
+        help="Append per-command wall time, CPU time and max RSS as JSON lines to this file",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help=f"Do not hand list/restore to a running daemon (socket: ${DAEMON_SOCKET_ENV} or {DEFAULT_DAEMON_SOCKET})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Bypass the persistent archive info cache and index in {DEFAULT_CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--preview-workers",
+        type=_positive_int_arg,
+        help=f"Upper bound for concurrent archive preview fetches (default: manifest.previewWorkers or {MAX_FETCH_WORKERS})",
+    )
+    parser.add_argument(
+        "--preview-bypass-lock",
+        action="store_true",
+        help="Read archive metadata for the picker without taking the borg repository lock",
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     backup_parser = subparsers.add_parser("backup")
+    backup_parser.add_argument(
+        "--run",
+        action="store_true",
+        help="Snapshot, create and prune in this process instead of restarting the borgbackup unit; the manifest's filesCache mode is passed to borg, whose files cache only skips whole unchanged images, so only stopped or idle VMs benefit",
+    )
+    backup_parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Append per-phase backup timings as JSON lines (with --run or --all)",
+    )
+    backup_parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Back up every VM in the manifest in this process, longest expected first",
+    )
+    backup_parser.add_argument(
+        "--group",
+        nargs="+",
+        metavar="VM",
+        help="Snapshot these VMs under one shared guest freeze, then archive each in this process",
+    )
+    backup_parser.add_argument(
+        "--per-host",
+        type=_positive_int_arg,
+        default=1,
+        help="Concurrent backups per borg repository host with --all (default: 1)",
+    )
+    backup_parser.add_argument(
+        "--per-disk",
+        type=_positive_int_arg,
+        default=2,
+        help="Concurrent backups per local filesystem with --all (default: 2)",
+    )
     backup_parser.add_argument("vm", nargs="?")
     backup_parser.set_defaults(handler=handle_backup)
 
     list_parser = subparsers.add_parser("list")
+    list_parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print archive metadata as JSON instead of opening the picker",
+    )
+    list_parser.add_argument(
+        "--sort", choices=ARCHIVE_SORT_KEYS, help="Order archives by this field, descending (newest, longest, largest or last name first)"
+    )
     list_parser.add_argument("vm", nargs="?")
     list_parser.set_defaults(handler=handle_list)
 
@@ -1376,10 +5233,170 @@ def build_parser() -> argparse.ArgumentParser:
     restore_parser.add_argument(
         "--yes", action="store_true", help="Skip restore confirmation"
     )
+    restore_parser.add_argument(
+        "--stage-only",
+        action="store_true",
+        help="Extract into the stage subvolume and stop before touching the VM",
+    )
+    restore_parser.add_argument(
+        "--swap-staged",
+        action="store_true",
+        help="Swap a previously staged archive into place",
+    )
+    restore_parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Snapshot the current VM subvolume and extract only files that differ from the archive",
+    )
+    restore_parser.add_argument(
+        "--defer-cleanup",
+        action="store_true",
+        help="Queue the previous VM subvolume for deletion by `cleanup` instead of deleting it before exiting",
+    )
+    restore_parser.add_argument(
+        "--verify",
+        choices=STAGE_VERIFY_MODES,
+        help="Check the extracted stage against the archive's item sizes (or sha256 digests) before stopping the VM; sha256 makes borg re-read the whole archive, overlapped with extraction",
+    )
+    restore_parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Append extraction throughput samples and a final summary as JSON lines",
+    )
+    restore_parser.add_argument(
+        "--sort", choices=ARCHIVE_SORT_KEYS, help="Order archives in the picker by this field, descending"
+    )
     restore_parser.add_argument("vm", nargs="?")
     restore_parser.add_argument("archive", nargs="?")
     restore_parser.set_defaults(handler=handle_restore)
 
+    batch_parser = subparsers.add_parser("restore-batch")
+    batch_parser.add_argument(
+        "--yes", action="store_true", help="Skip restore confirmation"
+    )
+    batch_parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Restore the latest archive of every VM in the manifest",
+    )
+    batch_parser.add_argument(
+        "--per-host",
+        type=_positive_int_arg,
+        default=1,
+        help="Concurrent extractions per borg repository host (default: 1)",
+    )
+    batch_parser.add_argument(
+        "--per-disk",
+        type=_positive_int_arg,
+        default=2,
+        help="Concurrent extractions per local filesystem (default: 2)",
+    )
+    batch_parser.add_argument(
+        "--defer-cleanup",
+        action="store_true",
+        help="Queue the previous VM subvolume for deletion by `cleanup` instead of deleting it before exiting",
+    )
+    batch_parser.add_argument(
+        "--verify",
+        choices=STAGE_VERIFY_MODES,
+        help="Check the extracted stage against the archive's item sizes (or sha256 digests) before stopping the VM; sha256 makes borg re-read the whole archive, overlapped with extraction",
+    )
+    batch_parser.add_argument(
+        "--metrics-dir",
+        type=Path,
+        help="Write per-VM extraction metrics to <dir>/<vm>.jsonl",
+    )
+    batch_parser.add_argument(
+        "targets",
+        nargs="*",
+        metavar="VM[=ARCHIVE]",
+        help="VMs to restore; without an archive the latest one is used",
+    )
+    batch_parser.set_defaults(handler=handle_restore_batch)
+
+    cleanup_parser = subparsers.add_parser("cleanup")
+    cleanup_parser.add_argument(
+        "--status",
+        action="store_true",
+        help="Show queued deletions and subvolumes still awaiting the btrfs cleaner",
+    )
+    cleanup_parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="Wait for the btrfs cleaner to finish reclaiming deleted subvolumes",
+    )
+    cleanup_parser.set_defaults(handler=handle_cleanup)
+
+    index_parser = subparsers.add_parser("index")
+    index_parser.add_argument(
+        "vms",
+        nargs="*",
+        metavar="VM",
+        help="VMs to refresh in the archive index (default: all)",
+    )
+    index_parser.set_defaults(handler=handle_index)
+
+    search_parser = subparsers.add_parser("search")
+    search_parser.add_argument(
+        "--vm", action="append", default=[], help="Only search this VM (repeatable)"
+    )
+    search_parser.add_argument(
+        "--after", type=_timestamp_arg, help="Archives started at or after this ISO time"
+    )
+    search_parser.add_argument(
+        "--before", type=_timestamp_arg, help="Archives started before this ISO time"
+    )
+    search_parser.add_argument(
+        "--min-size", type=_size_arg, help="Minimum original size, e.g. 20G"
+    )
+    search_parser.add_argument(
+        "--max-size", type=_size_arg, help="Maximum original size, e.g. 500MiB"
+    )
+    search_parser.add_argument(
+        "--latest",
+        action="store_true",
+        help="Only report the newest matching archive per VM",
+    )
+    search_parser.set_defaults(handler=handle_search)
+
+    stats_parser = subparsers.add_parser("stats")
+    stats_parser.add_argument(
+        "--last",
+        type=_positive_int_arg,
+        default=10,
+        help="Number of most recent archives to report per VM (default: 10)",
+    )
+    stats_parser.add_argument(
+        "--window",
+        type=_positive_int_arg,
+        help="Backup window in seconds; count archives whose backup ran longer",
+    )
+    stats_parser.add_argument(
+        "--no-refresh",
+        action="store_true",
+        help="Report from the archive index without refreshing it first",
+    )
+    stats_parser.add_argument(
+        "--json", action="store_true", help="Emit the per-archive numbers as JSON"
+    )
+    stats_parser.add_argument("vms", nargs="*", metavar="VM")
+    stats_parser.set_defaults(handler=handle_stats)
+
+    daemon_parser = subparsers.add_parser("daemon")
+    daemon_parser.add_argument(
+        "--socket",
+        type=Path,
+        default=_daemon_socket_path(),
+        help="Control socket to bind when not socket-activated by systemd",
+    )
+    daemon_parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=DAEMON_IDLE_TIMEOUT,
+        help=f"Exit after this many idle seconds; 0 keeps running (default: {DAEMON_IDLE_TIMEOUT:.0f})",
+    )
+    daemon_parser.set_defaults(handler=handle_daemon)
+
     return parser
 
 
@@ -1400,22 +5417,44 @@ def main(argv: Sequence[str] | None = None) -> int:
     configure_logging(args.verbose)
 
     try:
-        ensure_root_for_privileged_command(args.command, dry_run=args.dry_run)
+        daemon = _connect_daemon(args)
+        if daemon is None:
+            ensure_root_for_privileged_command(args.command, dry_run=args.dry_run)
         manifest = load_manifest(args.manifest)
-        runner = CommandRunner(dry_run=args.dry_run)
-        ctx = AppContext(
-            manifest=manifest,
-            runner=runner,
-            btrfs=BtrfsManager(runner),
-            borg=BorgService(runner),
-            systemd=SystemdManager(runner),
-        )
+        if args.preview_workers is not None:
+            manifest = dataclasses.replace(
+                manifest, preview_workers=args.preview_workers
+            )
+        if args.preview_bypass_lock:
+            manifest = dataclasses.replace(manifest, preview_bypass_lock=True)
+        runner = CommandRunner(dry_run=args.dry_run, trace_path=args.trace_file)
+        cache = None if args.no_cache else ArchiveInfoCache(Path(DEFAULT_CACHE_DIR))
+        index = None
+        if not args.no_cache:
+            index = ArchiveIndex(Path(DEFAULT_CACHE_DIR) / ARCHIVE_INDEX_FILE)
+        with SshMultiplexer() as ssh:
+            borg: BorgService
+            if daemon is not None:
+                borg = DaemonBorgService(runner, daemon)
+            else:
+                borg = BorgService(runner, cache=cache, ssh=ssh, index=index)
+            ctx = AppContext(
+                manifest=manifest,
+                runner=runner,
+                btrfs=BtrfsManager(runner),
+                borg=borg,
+                systemd=SystemdManager(runner),
+                daemon=daemon,
+            )
 
-        handler = getattr(args, "handler", None)
-        if handler is None:
-            parser.error("unknown command")
-        typed_handler: Callable[[AppContext, argparse.Namespace], None] = handler
-        typed_handler(ctx, args)
+            handler = getattr(args, "handler", None)
+            if handler is None:
+                parser.error("unknown command")
+            typed_handler: Callable[[AppContext, argparse.Namespace], None] = handler
+            try:
+                typed_handler(ctx, args)
+            finally:
+                borg.flush_cache()
     except PickerCancelled:
         return 130
     except CliError as exc:
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
+import concurrent.futures
 import json
 import secrets
 import socket
@@ -8,11 +9,14 @@ import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import NoReturn, Sequence
+from typing import Callable, NoReturn, Sequence, TypeVar
 
 
 DEFAULT_TIMEOUT = 10.0
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 class QgaError(Exception):
     pass
@@ -124,17 +128,21 @@ def emergency_thaw(socket_path: Path, timeout: float) -> int:
         return require_count("guest-fsfreeze-thaw", result)
 
 
-def freeze_exec(
+def report_status(message: str) -> None:
+    print(message, flush=True)
+
+
+def freeze_call(
     socket_path: Path,
     timeout: float,
-    command: Sequence[str],
-) -> int:
-    if not command:
-        raise QgaError("freeze-exec requires a command after --")
-
+    action: Callable[[], T],
+    *,
+    report: Callable[[str], None] = report_status,
+) -> T:
     freeze_attempted = False
     thawed = False
-    command_result: subprocess.CompletedProcess[bytes] | None = None
+    completed = False
+    action_result: T | None = None
     primary_error: BaseException | None = None
 
     try:
@@ -154,10 +162,11 @@ def freeze_exec(
             )
             if frozen_count < 1:
                 raise QgaError("guest-fsfreeze-freeze did not freeze any filesystems")
-            print(f"QGA: froze {frozen_count} guest filesystem(s)", flush=True)
+            report(f"QGA: froze {frozen_count} guest filesystem(s)")
 
             try:
-                command_result = subprocess.run(command, check=False)
+                action_result = action()
+                completed = True
             except BaseException as exc:
                 primary_error = exc
             finally:
@@ -174,10 +183,7 @@ def freeze_exec(
                             f"guest remained in {final_status!r} state after thaw"
                         )
                     thawed = True
-                    print(
-                        f"QGA: thawed {thawed_count} guest filesystem(s)",
-                        flush=True,
-                    )
+                    report(f"QGA: thawed {thawed_count} guest filesystem(s)")
                 except BaseException as exc:
                     if primary_error is None:
                         primary_error = exc
@@ -189,10 +195,7 @@ def freeze_exec(
         try:
             thawed_count = emergency_thaw(socket_path, timeout)
             thawed = True
-            print(
-                f"QGA: emergency thaw released {thawed_count} guest filesystem(s)",
-                flush=True,
-            )
+            report(f"QGA: emergency thaw released {thawed_count} guest filesystem(s)")
         except BaseException as thaw_error:
             if primary_error is None:
                 primary_error = thaw_error
@@ -203,9 +206,161 @@ def freeze_exec(
 
     if primary_error is not None:
         raise primary_error
-    if command_result is None:
+    if not completed:
+        raise QgaError("snapshot command did not run")
+    return action_result  # type: ignore[return-value]
+
+
+def _map_guests(
+    pool: concurrent.futures.Executor,
+    socket_paths: Sequence[Path],
+    call: Callable[[Path], R],
+) -> tuple[dict[Path, R], dict[Path, BaseException]]:
+    futures = {path: pool.submit(call, path) for path in socket_paths}
+    results: dict[Path, R] = {}
+    errors: dict[Path, BaseException] = {}
+    for path, future in futures.items():
+        try:
+            results[path] = future.result()
+        except BaseException as exc:
+            errors[path] = exc
+    return results, errors
+
+
+def _describe_errors(errors: dict[Path, BaseException]) -> str:
+    return "; ".join(f"{path}: {exc}" for path, exc in errors.items())
+
+
+def _open_thawed_guest(socket_path: Path, timeout: float) -> QgaClient:
+    client = QgaClient(socket_path, timeout)
+    try:
+        client.synchronize()
+        client.execute("guest-ping")
+        status = require_status(client.execute("guest-fsfreeze-status"))
+        if status != "thawed":
+            raise QgaError(
+                f"refusing to take ownership of guest already in {status!r} state"
+            )
+    except BaseException:
+        client.__exit__()
+        raise
+    return client
+
+
+def _freeze_guest(client: QgaClient) -> int:
+    frozen_count = require_count(
+        "guest-fsfreeze-freeze", client.execute("guest-fsfreeze-freeze")
+    )
+    if frozen_count < 1:
+        raise QgaError("guest-fsfreeze-freeze did not freeze any filesystems")
+    return frozen_count
+
+
+def _thaw_guest(client: QgaClient) -> int:
+    thawed_count = require_count(
+        "guest-fsfreeze-thaw", client.execute("guest-fsfreeze-thaw")
+    )
+    final_status = require_status(client.execute("guest-fsfreeze-status"))
+    if final_status != "thawed":
+        raise QgaError(f"guest remained in {final_status!r} state after thaw")
+    return thawed_count
+
+
+def group_freeze_call(
+    socket_paths: Sequence[Path],
+    timeout: float,
+    action: Callable[[], T],
+    *,
+    report: Callable[[str], None] = report_status,
+) -> T:
+    # One freeze window for several guests: every guest is checked before
+    # any is frozen, freezes and thaws are issued to all guests at once, and
+    # each guest still gets its own emergency thaw.
+    paths = list(dict.fromkeys(socket_paths))
+    if not paths:
+        raise QgaError("group freeze requires at least one QGA socket")
+
+    clients: dict[Path, QgaClient] = {}
+    thawed: set[Path] = set()
+    freeze_attempted = False
+    completed = False
+    action_result: T | None = None
+    primary_error: BaseException | None = None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        try:
+            clients, errors = _map_guests(
+                pool, paths, lambda path: _open_thawed_guest(path, timeout)
+            )
+            if errors:
+                raise QgaError(f"cannot prepare guests: {_describe_errors(errors)}")
+
+            freeze_attempted = True
+            window_start = time.monotonic()
+            counts, errors = _map_guests(
+                pool, paths, lambda path: _freeze_guest(clients[path])
+            )
+            if errors:
+                primary_error = QgaError(f"group freeze failed: {_describe_errors(errors)}")
+            else:
+                report(
+                    f"QGA: froze {sum(counts.values())} filesystem(s) across {len(paths)} guest(s)"
+                )
+                try:
+                    action_result = action()
+                    completed = True
+                except BaseException as exc:
+                    primary_error = exc
+
+            counts, errors = _map_guests(
+                pool, paths, lambda path: _thaw_guest(clients[path])
+            )
+            thawed.update(counts)
+            if errors and primary_error is None:
+                primary_error = QgaError(f"group thaw failed: {_describe_errors(errors)}")
+            report(
+                f"QGA: thawed {sum(counts.values())} filesystem(s) across {len(counts)} guest(s)"
+                f" after a {time.monotonic() - window_start:.3f}s freeze window"
+            )
+        except BaseException as exc:
+            if primary_error is None:
+                primary_error = exc
+        finally:
+            for client in clients.values():
+                client.__exit__()
+
+        if freeze_attempted:
+            stuck = [path for path in paths if path not in thawed]
+            counts, errors = _map_guests(
+                pool, stuck, lambda path: emergency_thaw(path, timeout)
+            )
+            for path, count in counts.items():
+                report(f"QGA: emergency thaw released {count} filesystem(s) on {path}")
+            if errors:
+                thaw_error = QgaError(f"emergency thaw failed: {_describe_errors(errors)}")
+                if primary_error is None:
+                    primary_error = thaw_error
+                else:
+                    primary_error = QgaError(f"{primary_error}; {thaw_error}")
+
+    if primary_error is not None:
+        raise primary_error
+    if not completed:
         raise QgaError("snapshot command did not run")
-    return command_result.returncode
+    return action_result  # type: ignore[return-value]
+
+
+def freeze_exec(
+    socket_path: Path,
+    timeout: float,
+    command: Sequence[str],
+) -> int:
+    if not command:
+        raise QgaError("freeze-exec requires a command after --")
+    result = freeze_call(
+        socket_path, timeout, lambda: subprocess.run(command, check=False)
+    )
+    return result.returncode
 
 
 def inspect_agent(socket_path: Path, timeout: float, command: str) -> object:
@@ -232,6 +387,12 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
     freeze_parser = subparsers.add_parser("freeze-exec")
     freeze_parser.add_argument("socket", type=Path)
     freeze_parser.add_argument("command", nargs=argparse.REMAINDER)
+
+    group_parser = subparsers.add_parser("group-freeze-exec")
+    group_parser.add_argument(
+        "--socket", dest="sockets", type=Path, action="append", required=True
+    )
+    group_parser.add_argument("command", nargs=argparse.REMAINDER)
     return parser.parse_args(argv)
 
 
@@ -252,6 +413,19 @@ def main(argv: Sequence[str] | None = None) -> int:
                 command = command[1:]
             return freeze_exec(args.socket, args.timeout, command)
 
+        if args.action == "group-freeze-exec":
+            command = args.command
+            if command and command[0] == "--":
+                command = command[1:]
+            if not command:
+                raise QgaError("group-freeze-exec requires a command after --")
+            result = group_freeze_call(
+                args.sockets,
+                args.timeout,
+                lambda: subprocess.run(command, check=False),
+            )
+            return result.returncode
+
         if args.action == "thaw":
             thawed_count = emergency_thaw(args.socket, args.timeout)
             print(f"QGA: thawed {thawed_count} guest filesystem(s)")
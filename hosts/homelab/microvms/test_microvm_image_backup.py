@@ -1,14 +1,19 @@
 import concurrent.futures
 import importlib.util
 import io
+import itertools
+import json
 import logging
 import os
+import socket
 import subprocess
 import sys
+import tempfile
 import threading
 import time
 import unittest
 from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest import mock
 
@@ -48,17 +53,17 @@ def make_context(*, dry_run: bool, borg: object | None = None) -> mib.AppContext
 def make_info(archive: str) -> mib.ArchiveInfo:
     return mib.ArchiveInfo(
         archive=archive,
-        start="2026-02-20T00:00:00",
-        end="2026-02-20T00:01:00",
-        duration="60s",
+        start=datetime(2026, 2, 20, 0, 0, 0),
+        end=datetime(2026, 2, 20, 0, 1, 0),
+        duration=60.0,
         hostname="test-host",
         username="root",
         source_path="/srv/microvms/vm1",
         command_line="borg create ...",
-        file_count="10",
-        original_size="1.00 MiB",
-        compressed_size="512.00 KiB",
-        deduplicated_size="256.00 KiB",
+        file_count=10,
+        original_size=1 << 20,
+        compressed_size=512 << 10,
+        deduplicated_size=256 << 10,
     )
 
 
@@ -85,9 +90,17 @@ class BorgServiceTests(unittest.TestCase):
     def test_list_archive_names_sorted_descending(self) -> None:
         runner = mock.Mock()
         runner.check.return_value = subprocess.CompletedProcess(
-            args=["borg", "list", "--short"],
+            args=["borg", "list", "--json"],
             returncode=0,
-            stdout="vm-2026-01-01\nvm-2026-01-03\nvm-2026-01-02\n",
+            stdout=json.dumps(
+                {
+                    "archives": [
+                        {"name": "vm-2026-01-01", "id": "id1"},
+                        {"name": "vm-2026-01-03", "id": "id3"},
+                        {"name": "vm-2026-01-02", "id": "id2"},
+                    ]
+                }
+            ),
             stderr="",
         )
 
@@ -115,6 +128,791 @@ class BorgServiceTests(unittest.TestCase):
         self.assertIn("Archive: vm-2026-01-03", summary)
         self.assertIn("Restore target: /srv/microvms/vm1", summary)
         self.assertNotIn("Selected Archive", summary)
+        self.assertIn("Duration: 1m 0s", summary)
+        self.assertIn("Original size: 1.00 MiB", summary)
+
+    def test_list_archive_metadata_uses_single_bulk_call(self) -> None:
+        runner = mock.Mock()
+        runner.check.return_value = subprocess.CompletedProcess(
+            args=["borg", "list", "--json"],
+            returncode=0,
+            stdout=json.dumps(
+                {
+                    "archives": [
+                        {
+                            "name": "vm-2026-01-01",
+                            "id": "id1",
+                            "start": "2026-01-01T00:00:00.000000",
+                            "end": "2026-01-01T00:02:05.000000",
+                            "hostname": "homelab",
+                            "username": "root",
+                            "command_line": ["borg", "create", "/snap/./."],
+                        }
+                    ]
+                }
+            ),
+            stderr="",
+        )
+
+        borg = mib.BorgService(runner)
+        infos = borg.list_archive_metadata(make_manifest().vms["vm1"])
+
+        runner.check.assert_called_once()
+        cmd = runner.check.call_args.args[0]
+        self.assertEqual(cmd[:3], ["borg", "list", "--json"])
+        self.assertIn("--format", cmd)
+        self.assertEqual(len(infos), 1)
+        self.assertEqual(infos[0].duration, 125.0)
+        self.assertEqual(infos[0].hostname, "homelab")
+        self.assertEqual(infos[0].source_path, "/snap/./.")
+
+    def test_decoded_infos_are_slotted_and_share_repeated_strings(self) -> None:
+        raw = json.loads(json.dumps(mib.archive_info_to_json(make_info("a1"))))
+        first = mib.archive_info_from_json(raw)
+        second = mib.archive_info_from_json(json.loads(json.dumps(raw)))
+
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIs(first.hostname, second.hostname)
+        self.assertIs(first.source_path, second.source_path)
+        self.assertEqual(first, make_info("a1"))
+
+    def test_list_json_emits_numeric_fields_sorted_by_size(self) -> None:
+        small = make_info("a1")
+        large = mib.dataclasses.replace(make_info("a2"), original_size=4 << 20)
+        unknown = mib.dataclasses.replace(make_info("a3"), original_size=None)
+        borg = mock.Mock()
+        borg.list_archive_metadata.return_value = [unknown, small, large]
+        args = mib.build_parser().parse_args(["list", "--json", "--sort", "size"])
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            mib.handle_list(make_context(dry_run=False, borg=borg), args)
+
+        rows = json.loads(out.getvalue())
+        self.assertEqual([row["archive"] for row in rows], ["a2", "a1", "a3"])
+        self.assertEqual(rows[0]["vm"], "vm1")
+        self.assertEqual(rows[0]["original_size"], 4 << 20)
+        self.assertEqual(rows[1]["duration"], 60.0)
+        self.assertEqual(rows[1]["start"], "2026-02-20T00:00:00")
+
+    def test_every_sort_key_is_descending(self) -> None:
+        infos = [make_info("a1"), make_info("a3"), make_info("a2")]
+
+        self.assertEqual(
+            [info.archive for info in mib.sort_archive_infos(infos, "name")],
+            ["a3", "a2", "a1"],
+        )
+
+    def test_latest_archive_handles_aware_and_missing_starts(self) -> None:
+        naive = mib.dataclasses.replace(make_info("a1"), start=datetime(2026, 1, 1))
+        aware = mib.dataclasses.replace(
+            make_info("a2"), start=datetime(2026, 1, 2, tzinfo=timezone.utc)
+        )
+        undated = mib.dataclasses.replace(make_info("a9"), start=None)
+        borg = mib.BorgService(mock.Mock())
+        vm_data = make_manifest().vms["vm1"]
+
+        with mock.patch.object(borg, "list_archive_metadata", return_value=[undated, naive, aware]):
+            self.assertEqual(borg.latest_archive(vm_data), "a2")
+        with mock.patch.object(borg, "list_archive_metadata", return_value=[undated]):
+            self.assertEqual(borg.latest_archive(vm_data), "a9")
+
+    def test_fetch_archive_info_uses_persistent_cache(self) -> None:
+        vm_data = make_manifest().vms["vm1"]
+        listing = subprocess.CompletedProcess(
+            args=["borg", "list", "--json"],
+            returncode=0,
+            stdout=json.dumps({"archives": [{"name": "a1", "id": "id-a1"}]}),
+            stderr="",
+        )
+        info_result = subprocess.CompletedProcess(
+            args=["borg", "info", "--json", "::a1"],
+            returncode=0,
+            stdout=json.dumps(
+                {
+                    "archives": [
+                        {
+                            "name": "a1",
+                            "id": "id-a1",
+                            "duration": 61,
+                            "stats": {"nfiles": 3, "original_size": 2048},
+                        }
+                    ]
+                }
+            ),
+            stderr="",
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            runner = mock.Mock()
+            runner.check.side_effect = [listing, info_result]
+            borg = mib.BorgService(runner, cache=mib.ArchiveInfoCache(Path(tmp)))
+            borg.list_archive_names(vm_data)
+            first = borg.fetch_archive_info(vm_data, "a1")
+            borg.flush_cache()
+
+            runner = mock.Mock()
+            runner.check.side_effect = [listing]
+            borg = mib.BorgService(runner, cache=mib.ArchiveInfoCache(Path(tmp)))
+            borg.list_archive_names(vm_data)
+            second = borg.fetch_archive_info(vm_data, "a1")
+
+        self.assertEqual(first, second)
+        self.assertEqual(second.duration, 61.0)
+        self.assertEqual(second.original_size, 2048)
+        self.assertEqual(runner.check.call_count, 1)
+
+    def test_bypass_lock_falls_back_to_locked_query(self) -> None:
+        runner = mock.Mock()
+        runner.check.side_effect = [
+            mib.CliError("command failed (exit 2): borg info --bypass-lock"),
+            subprocess.CompletedProcess(
+                args=["borg", "info", "--json", "::a1"],
+                returncode=0,
+                stdout=json.dumps({"archives": [{"name": "a1"}]}),
+                stderr="",
+            ),
+        ]
+        borg = mib.BorgService(runner)
+
+        info = borg.fetch_archive_info(
+            make_manifest().vms["vm1"], "a1", bypass_lock=True
+        )
+
+        self.assertEqual(info.archive, "a1")
+        commands = [call.args[0] for call in runner.check.call_args_list]
+        self.assertEqual(commands[0], ["borg", "info", "--bypass-lock", "--json", "::a1"])
+        self.assertEqual(commands[1], ["borg", "info", "--json", "::a1"])
+
+    def test_environment_reuses_ssh_control_path(self) -> None:
+        ssh = mock.Mock()
+        ssh.control_path.return_value = Path("/tmp/mux/abc")
+        borg = mib.BorgService(mock.Mock(), ssh=ssh)
+
+        env = borg.environment(make_manifest().vms["vm1"])
+
+        self.assertIn("-o ControlMaster=no", env["BORG_RSH"])
+        self.assertIn("-o ControlPath=/tmp/mux/abc", env["BORG_RSH"])
+        self.assertIn("-i /var/keys/key", env["BORG_RSH"])
+
+
+class SshMultiplexerTests(unittest.TestCase):
+    def test_ssh_destination_parsing(self) -> None:
+        self.assertEqual(
+            mib._ssh_destination("ssh://borg@backup.example:2222/./repo"),
+            ("borg@backup.example", "2222"),
+        )
+        self.assertEqual(
+            mib._ssh_destination("borg@backup.example:repo"),
+            ("borg@backup.example", None),
+        )
+        self.assertIsNone(mib._ssh_destination("/srv/borg/repo"))
+
+    def test_master_started_once_per_host_and_stopped_on_close(self) -> None:
+        vm_data = mib.VmBackupConfig(
+            repo="ssh://borg@backup.example/./repo",
+            pass_file=Path("/var/keys/pass"),
+            ssh_key_path=Path("/var/keys/key"),
+        )
+        completed = subprocess.CompletedProcess(args=[], returncode=0)
+
+        with mock.patch.object(mib.subprocess, "run", return_value=completed) as run:
+            with mib.SshMultiplexer() as mux:
+                first = mux.control_path(vm_data)
+                second = mux.control_path(vm_data)
+                self.assertIsNotNone(first)
+                self.assertEqual(first, second)
+                self.assertEqual(run.call_count, 2)
+                self.assertIn("-M", run.call_args_list[0].args[0])
+                self.assertIn("ControlPersist=600", run.call_args_list[0].args[0])
+                self.assertIn("ServerAliveInterval=15", run.call_args_list[0].args[0])
+                self.assertEqual(run.call_args.args[0][-3:], ["-O", "check", "borg@backup.example"])
+
+        self.assertEqual(run.call_count, 3)
+        self.assertEqual(run.call_args.args[0][-3:], ["-O", "exit", "borg@backup.example"])
+
+    def test_master_that_fails_its_check_is_restarted(self) -> None:
+        def run(cmd: list[str], **kwargs: object) -> subprocess.CompletedProcess[str]:
+            return subprocess.CompletedProcess(args=cmd, returncode=255 if "check" in cmd else 0)
+
+        with mock.patch.object(mib.subprocess, "run", side_effect=run) as run_mock:
+            with mib.SshMultiplexer() as mux:
+                first = mux.control_path(make_manifest().vms["vm1"])
+                second = mux.control_path(make_manifest().vms["vm1"])
+
+        self.assertEqual(first, second)
+        operations = [
+            "-M" if "-M" in call.args[0] else call.args[0][-2]
+            for call in run_mock.call_args_list
+        ]
+        self.assertEqual(operations, ["-M", "check", "exit", "-M", "exit"])
+
+    def test_failed_master_falls_back_to_direct_connection(self) -> None:
+        failed = subprocess.CompletedProcess(args=[], returncode=255)
+
+        with mock.patch.object(mib.subprocess, "run", return_value=failed) as run:
+            with mib.SshMultiplexer() as mux:
+                self.assertIsNone(mux.control_path(make_manifest().vms["vm1"]))
+
+        run.assert_called_once()
+
+    def test_slow_host_does_not_block_other_hosts(self) -> None:
+        release = threading.Event()
+
+        def run(cmd: list[str], **kwargs: object) -> subprocess.CompletedProcess[str]:
+            if "slow.example" in cmd:
+                release.wait(5)
+            return subprocess.CompletedProcess(args=cmd, returncode=0)
+
+        def config(host: str) -> mib.VmBackupConfig:
+            return mib.VmBackupConfig(
+                repo=f"ssh://borg@{host}/./repo",
+                pass_file=Path("/var/keys/pass"),
+                ssh_key_path=Path("/var/keys/key"),
+            )
+
+        with mock.patch.object(mib.subprocess, "run", side_effect=run):
+            with mib.SshMultiplexer() as mux:
+                slow = threading.Thread(target=mux.control_path, args=(config("slow.example"),))
+                slow.start()
+                started = time.monotonic()
+                self.assertIsNotNone(mux.control_path(config("fast.example")))
+                elapsed = time.monotonic() - started
+                release.set()
+                slow.join()
+
+        self.assertLess(elapsed, 1.0)
+
+    def test_dry_run_mutating_commands_start_no_master(self) -> None:
+        ssh = mock.Mock()
+        borg = mib.BorgService(mib.CommandRunner(dry_run=True), ssh=ssh)
+
+        env = borg.environment(make_manifest().vms["vm1"], mutating=True)
+        borg.environment(make_manifest().vms["vm1"])
+
+        self.assertNotIn("ControlPath", env["BORG_RSH"])
+        ssh.control_path.assert_called_once()
+
+
+class ArchiveIndexTests(unittest.TestCase):
+    @staticmethod
+    def _entry(name: str, start: str, size: int) -> dict[str, object]:
+        return {
+            "name": name,
+            "id": f"id-{name}",
+            "start": start,
+            "end": start,
+            "duration": 90,
+            "stats": {"nfiles": 3, "original_size": size, "deduplicated_size": size // 4},
+        }
+
+    def test_refresh_is_incremental_and_search_filters(self) -> None:
+        vm_data = make_manifest().vms["vm1"]
+        a1 = self._entry("vm1-a1", "2026-01-01T00:00:00.000000", 1 << 30)
+        a2 = self._entry("vm1-a2", "2026-01-02T00:00:00.000000", 4 << 30)
+        borg = mock.Mock()
+        borg._archive_info_from_entry.side_effect = (
+            mib.BorgService(mock.Mock())._archive_info_from_entry
+        )
+        borg.fetch_archive_entry.side_effect = lambda vm_data, name: {
+            "vm1-a1": a1, "vm1-a2": a2
+        }[name]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index = mib.ArchiveIndex(Path(tmp) / "index.sqlite3")
+            borg.list_archive_entries.return_value = [a1]
+            self.assertEqual(mib.refresh_archive_index(borg, index, "vm1", vm_data), (1, 0))
+            borg.list_archive_entries.return_value = [a2, a1]
+            self.assertEqual(mib.refresh_archive_index(borg, index, "vm1", vm_data), (1, 0))
+            borg.list_archive_entries.return_value = [a2]
+            self.assertEqual(mib.refresh_archive_index(borg, index, "vm1", vm_data), (0, 1))
+            borg.list_archive_entries.return_value = [a1, a2]
+            mib.refresh_archive_index(borg, index, "vm1", vm_data)
+
+            latest_before = index.search(
+                before="2026-01-02T00:00:00.000000", latest=True
+            )
+            large = index.search(min_size=2 << 30)
+            everything = index.search(vms=["vm1"])
+            newest = index.search(vms=["vm1"], limit=1)
+
+        self.assertEqual(
+            [call.args[1] for call in borg.fetch_archive_entry.call_args_list],
+            ["vm1-a1", "vm1-a2", "vm1-a1"],
+        )
+        self.assertEqual([i.info.archive for i in latest_before], ["vm1-a1"])
+        self.assertEqual([i.info.archive for i in large], ["vm1-a2"])
+        self.assertEqual([i.info.archive for i in everything], ["vm1-a2", "vm1-a1"])
+        self.assertEqual([i.info.archive for i in newest], ["vm1-a2"])
+        self.assertEqual(large[0].info.original_size, 4 << 30)
+        self.assertEqual(large[0].info.duration, 90.0)
+        self.assertEqual(large[0].info.start, datetime(2026, 1, 2))
+
+    def test_fresh_index_skips_remote_listing_and_info(self) -> None:
+        vm_data = make_manifest().vms["vm1"]
+        entry = self._entry("vm1-a1", "2026-01-01T00:00:00.000000", 2048)
+        runner = mock.Mock()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            now = [1000.0]
+            index = mib.ArchiveIndex(Path(tmp) / "index.sqlite3", clock=lambda: now[0])
+            borg = mib.BorgService(runner, index=index)
+            index.replace(
+                vm="vm1",
+                repo=vm_data.repo,
+                archive_ids={"vm1-a1": "id-vm1-a1"},
+                updates=[mib._index_archive(borg, "vm1", "id-vm1-a1", entry)],
+            )
+
+            infos = borg.list_archive_metadata(vm_data)
+            info = borg.fetch_archive_info(vm_data, "vm1-a1")
+            now[0] += mib.ARCHIVE_INDEX_MAX_AGE + 1
+            stale = index.fresh_listing(vm_data.repo, max_age=mib.ARCHIVE_INDEX_MAX_AGE)
+
+        runner.check.assert_not_called()
+        self.assertEqual([i.archive for i in infos], ["vm1-a1"])
+        self.assertEqual(info.original_size, 2048)
+        self.assertIsNone(stale)
+
+    def test_stats_reports_numeric_history_from_index(self) -> None:
+        vm_data = make_manifest().vms["vm1"]
+        borg = mib.BorgService(mock.Mock())
+        updates = [
+            mib._index_archive(
+                borg,
+                "vm1",
+                f"id-{name}",
+                {
+                    "name": name,
+                    "start": start,
+                    "duration": 100,
+                    "stats": {"original_size": 1000, "deduplicated_size": dedup},
+                },
+            )
+            for name, start, dedup in [
+                ("a1", "2026-01-01T00:00:00.000000", 500),
+                ("a2", "2026-01-02T00:00:00.000000", 100),
+                ("a3", "2026-01-03T00:00:00.000000", 50),
+            ]
+        ]
+        args = mib.build_parser().parse_args(
+            ["stats", "--no-refresh", "--json", "--last", "2"]
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index = mib.ArchiveIndex(Path(tmp) / "index.sqlite3")
+            index.replace(
+                vm="vm1",
+                repo=vm_data.repo,
+                archive_ids={item.info.archive: item.archive_id for item in updates},
+                updates=updates,
+            )
+            # Creation stats exist only for archives made by `backup --run`.
+            index.record_created(vm_data.repo, "a2", deduplicated_size=100)
+            ctx = make_context(dry_run=False, borg=mib.BorgService(mock.Mock(), index=index))
+            out = io.StringIO()
+            with redirect_stdout(out):
+                mib.handle_stats(ctx, args)
+
+        history = json.loads(out.getvalue())["vm1"]
+        self.assertEqual([row["archive"] for row in history], ["a2", "a3"])
+        self.assertEqual(history[0]["bytes_per_second"], 10.0)
+        self.assertEqual([row["dedup_ratio"] for row in history], [10.0, None])
+        self.assertEqual([row["new_data_size"] for row in history], [100, None])
+        self.assertEqual([row["unique_size_now"] for row in history], [100, 50])
+
+    def test_timezone_aware_bounds_compare_as_local_time(self) -> None:
+        local = datetime(2026, 1, 2, 12, 0)
+        aware = local.astimezone(timezone(timedelta(hours=5, minutes=30)))
+
+        self.assertEqual(mib._timestamp_arg(aware.isoformat()), "2026-01-02T12:00:00.000000")
+        self.assertEqual(
+            mib.ArchiveIndex._sort_key(local.astimezone(timezone.utc)),
+            "2026-01-02T12:00:00.000000",
+        )
+
+    def test_prune_invalidates_fresh_listing(self) -> None:
+        vm_data = make_manifest().vms["vm1"]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index = mib.ArchiveIndex(Path(tmp) / "index.sqlite3")
+            index.replace(vm="vm1", repo=vm_data.repo, archive_ids={}, updates=[])
+            runner = mock.Mock(dry_run=False)
+            runner.check.side_effect = mib.CliError("borg prune failed")
+            borg = mib.BorgService(runner, index=index)
+
+            self.assertIsNotNone(index.fresh_listing(vm_data.repo, max_age=60.0))
+            with self.assertRaises(mib.CliError):
+                borg.prune_archives(vm_data, glob="vm1-*", keep=(("daily", "7"),))
+            self.assertIsNone(index.fresh_listing(vm_data.repo, max_age=60.0))
+
+    def test_size_argument_accepts_binary_suffixes(self) -> None:
+        self.assertEqual(mib._size_arg("20G"), 20 << 30)
+        self.assertEqual(mib._size_arg("500MiB"), 500 << 20)
+        self.assertEqual(mib._size_arg("1024"), 1024)
+
+
+class ArchiveInfoCacheTests(unittest.TestCase):
+    def test_entry_requires_matching_archive_id(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = mib.ArchiveInfoCache(Path(tmp))
+            writer.put("repo", "a1", "id1", make_info("a1"))
+            writer.flush()
+            cache = mib.ArchiveInfoCache(Path(tmp))
+
+            self.assertEqual(cache.get("repo", "a1", "id1"), make_info("a1"))
+            self.assertIsNone(cache.get("repo", "a1", "other-id"))
+            self.assertIsNone(cache.get("other-repo", "a1", "id1"))
+
+    def test_retain_evicts_pruned_archives(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = mib.ArchiveInfoCache(Path(tmp))
+            cache.put("repo", "a1", "id1", make_info("a1"))
+            cache.put("repo", "a2", "id2", make_info("a2"))
+            cache.retain("repo", {"a2": "id2"})
+
+            reloaded = mib.ArchiveInfoCache(Path(tmp))
+            self.assertIsNone(reloaded.get("repo", "a1", "id1"))
+            self.assertEqual(reloaded.get("repo", "a2", "id2"), make_info("a2"))
+
+    def test_puts_are_written_once_on_flush(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = mib.ArchiveInfoCache(Path(tmp))
+            with mock.patch.object(
+                cache, "_save_locked", wraps=cache._save_locked
+            ) as save:
+                for idx in range(5):
+                    cache.put("repo", f"a{idx}", f"id{idx}", make_info(f"a{idx}"))
+                self.assertEqual(save.call_count, 0)
+                cache.flush()
+                cache.flush()
+
+            reloaded = mib.ArchiveInfoCache(Path(tmp))
+            self.assertEqual(save.call_count, 1)
+            self.assertEqual(reloaded.get("repo", "a4", "id4"), make_info("a4"))
+
+    def test_entries_expire_because_dedup_size_drifts(self) -> None:
+        now = [1000.0]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = mib.ArchiveInfoCache(Path(tmp), max_age=60.0, clock=lambda: now[0])
+            cache.put("repo", "a1", "id1", make_info("a1"))
+
+            self.assertEqual(cache.get("repo", "a1", "id1"), make_info("a1"))
+            now[0] += 61.0
+            self.assertIsNone(cache.get("repo", "a1", "id1"))
+
+
+class ExtractProgressMonitorTests(unittest.TestCase):
+    def test_progress_events_become_throughput_metrics(self) -> None:
+        now = [100.0]
+        with tempfile.TemporaryDirectory() as tmp:
+            metrics_path = Path(tmp) / "metrics.jsonl"
+            monitor = mib.ExtractProgressMonitor(
+                archive="a1", metrics_path=metrics_path, clock=lambda: now[0]
+            )
+
+            now[0] = 102.0
+            monitor.handle_line(
+                json.dumps(
+                    {
+                        "type": "progress_percent",
+                        "msgid": "extract",
+                        "finished": False,
+                        "current": 2048,
+                        "total": 8192,
+                        "info": ["images/disk.img"],
+                    }
+                )
+            )
+            monitor.handle_line("not json from ssh")
+            for path in ("images", "images/disk.img", "images/small.img"):
+                monitor.handle_line(
+                    json.dumps(
+                        {
+                            "type": "log_message",
+                            "name": "borg.output.list",
+                            "levelname": "INFO",
+                            "message": path,
+                        }
+                    )
+                )
+            now[0] = 104.0
+            monitor.handle_line(
+                json.dumps(
+                    {
+                        "type": "progress_percent",
+                        "finished": False,
+                        "current": 4096,
+                        "total": 8192,
+                        "info": ["images/other.img"],
+                    }
+                )
+            )
+            summary = monitor.finish(succeeded=True)
+            lines = [
+                json.loads(line)
+                for line in metrics_path.read_text(encoding="utf-8").splitlines()
+            ]
+
+        self.assertEqual(lines[0]["event"], "progress")
+        self.assertEqual(lines[0]["bytes_per_second"], 1024.0)
+        self.assertEqual(lines[0]["eta_seconds"], 6.0)
+        self.assertEqual(lines[-1], summary)
+        self.assertEqual(summary["event"], "summary")
+        self.assertEqual(summary["files"], 3)
+        self.assertEqual(summary["duration_seconds"], 4.0)
+        self.assertTrue(summary["succeeded"])
+
+
+class CommandRunnerTests(unittest.TestCase):
+    def test_stderr_lines_are_streamed_to_callback(self) -> None:
+        runner = mib.CommandRunner(dry_run=False)
+        lines: list[str] = []
+
+        result = runner.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; sys.stderr.write('one\\ntwo\\n'); sys.exit(3)",
+            ],
+            on_stderr_line=lines.append,
+        )
+
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(lines, ["one", "two"])
+
+    def test_timeout_terminates_command(self) -> None:
+        runner = mib.CommandRunner(dry_run=False)
+        started = time.monotonic()
+
+        with self.assertRaisesRegex(mib.CliError, "timed out"):
+            runner.run(
+                [sys.executable, "-c", "import time; time.sleep(30)"], timeout=0.2
+            )
+
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_check_many_runs_concurrently_and_keeps_order(self) -> None:
+        runner = mib.CommandRunner(dry_run=False)
+        cmds = [
+            [sys.executable, "-c", f"import time; time.sleep(0.5); print({idx})"]
+            for idx in range(4)
+        ]
+        started = time.monotonic()
+
+        results = runner.check_many(cmds, limit=4, capture_output=True)
+
+        self.assertLess(time.monotonic() - started, 1.8)
+        self.assertEqual([r.stdout.strip() for r in results], ["0", "1", "2", "3"])
+
+    def test_trace_file_records_usage_per_command(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_path = Path(tmp) / "trace.jsonl"
+            runner = mib.CommandRunner(dry_run=False, trace_path=trace_path)
+
+            runner.run(
+                [sys.executable, "-c", "b = bytearray(64 << 20); b[::4096] = b'x' * len(b[::4096])"]
+            )
+            with self.assertRaises(mib.CliError):
+                runner.run(
+                    [sys.executable, "-c", "import time; time.sleep(30)"], timeout=0.2
+                )
+
+            records = [
+                json.loads(line)
+                for line in trace_path.read_text(encoding="utf-8").splitlines()
+            ]
+
+        self.assertEqual([r["outcome"] for r in records], ["exited", "timeout"])
+        self.assertEqual(records[0]["returncode"], 0)
+        self.assertEqual(records[0]["session"], runner.session)
+        self.assertGreater(records[0]["max_rss_kib"], 64 << 10)
+        self.assertGreaterEqual(records[0]["user_seconds"], 0)
+        self.assertGreaterEqual(records[1]["wall_seconds"], 0.2)
+
+    def test_background_command_cancel_terminates_the_child(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_path = Path(tmp) / "trace.jsonl"
+            runner = mib.CommandRunner(dry_run=False, trace_path=trace_path)
+            started = time.monotonic()
+
+            command = mib.BackgroundCommand(
+                runner.check_async([sys.executable, "-c", "import time; time.sleep(30)"]),
+                name="test",
+            )
+            time.sleep(0.2)
+            command.cancel()
+            records = [
+                json.loads(line)
+                for line in trace_path.read_text(encoding="utf-8").splitlines()
+            ]
+
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual([r["outcome"] for r in records], ["cancelled"])
+        with self.assertRaises(mib.asyncio.CancelledError):
+            command.result()
+
+    def test_check_many_skips_mutating_commands_in_dry_run(self) -> None:
+        runner = mib.CommandRunner(dry_run=True)
+
+        results = runner.check_many(
+            [["false"], ["false"]], capture_output=True, mutating=True
+        )
+
+        self.assertEqual([r.returncode for r in results], [0, 0])
+
+
+class BtrfsManagerTests(unittest.TestCase):
+    @staticmethod
+    def _lstat(entries: dict[str, tuple[int, int]]):
+        def fake_lstat(path):
+            if str(path) not in entries:
+                raise FileNotFoundError(path)
+            ino, dev = entries[str(path)]
+            return os.stat_result((0o40755, ino, dev, 1, 0, 0, 0, 0, 0, 0))
+
+        return fake_lstat
+
+    def test_inspect_resolves_batch_with_one_fs_probe(self) -> None:
+        runner = mock.Mock()
+        runner.dry_run = False
+        runner.run.return_value = subprocess.CompletedProcess(
+            [], 0, stdout="btrfs\next2/ext3\n"
+        )
+        manager = mib.BtrfsManager(runner)
+        entries = {"/v/a": (256, 10), "/v/b": (256, 10), "/v/c": (257, 10), "/x/d": (256, 20)}
+
+        with mock.patch.object(mib.os, "lstat", side_effect=self._lstat(entries)):
+            status = manager.inspect(
+                [Path("/v/a"), Path("/v/b"), Path("/v/c"), Path("/x/d"), Path("/v/missing")]
+            )
+            self.assertTrue(manager.is_subvolume(Path("/v/a")))
+
+        self.assertEqual(
+            status,
+            {
+                Path("/v/a"): True,
+                Path("/v/b"): True,
+                Path("/v/c"): False,
+                Path("/x/d"): False,
+                Path("/v/missing"): False,
+            },
+        )
+        runner.run.assert_called_once_with(
+            ["stat", "--file-system", "--format=%T", Path("/v/a"), Path("/x/d")],
+            capture_output=True,
+        )
+
+    def test_delete_updates_cached_status(self) -> None:
+        runner = mock.Mock()
+        runner.dry_run = False
+        runner.run.return_value = subprocess.CompletedProcess([], 0, stdout="btrfs\n")
+        manager = mib.BtrfsManager(runner)
+        entries = {"/v/a": (256, 10)}
+        runner.check.side_effect = lambda *args, **kwargs: entries.clear()
+
+        with mock.patch.object(
+            mib.os, "lstat", side_effect=self._lstat(entries)
+        ), mock.patch.object(mib.Path, "exists", return_value=True):
+            manager.delete_subvolume_strict_if_exists(Path("/v/a"), "stage")
+            self.assertFalse(manager.is_subvolume(Path("/v/a")))
+
+        runner.check.assert_called_once_with(
+            ["btrfs", "subvolume", "delete", "/v/a"], mutating=True
+        )
+
+    def test_missing_paths_and_reset_are_not_cached(self) -> None:
+        runner = mock.Mock()
+        runner.dry_run = False
+        runner.run.return_value = subprocess.CompletedProcess([], 0, stdout="btrfs\n")
+        manager = mib.BtrfsManager(runner)
+        entries: dict[str, tuple[int, int]] = {}
+
+        with mock.patch.object(mib.os, "lstat", side_effect=self._lstat(entries)):
+            self.assertFalse(manager.is_subvolume(Path("/v/a")))
+            entries["/v/a"] = (256, 10)
+            self.assertTrue(manager.is_subvolume(Path("/v/a")))
+            del entries["/v/a"]
+            self.assertTrue(manager.is_subvolume(Path("/v/a")))
+            manager.reset()
+            self.assertFalse(manager.is_subvolume(Path("/v/a")))
+
+        runner.run.assert_called_once()
+
+    def test_queue_deletion_moves_subvolume_into_queue(self) -> None:
+        runner = mock.Mock()
+        runner.dry_run = False
+        manager = mib.BtrfsManager(runner)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            old = mib.vm_paths(volume_path, "vm1").old
+            old.mkdir()
+            queue_dir = mib.deletion_queue_dir(volume_path)
+            with mock.patch.object(manager, "is_subvolume", return_value=True):
+                queued = manager.queue_deletion(old, queue_dir, "previous VM subvolume")
+
+            self.assertFalse(old.exists())
+            self.assertEqual(manager.queued_deletions(queue_dir), [queued])
+            self.assertTrue(queued.name.startswith("vm1.restore-old."))
+        runner.check.assert_not_called()
+
+    def test_cleanup_deletes_queue_in_one_call_and_waits(self) -> None:
+        runner = mock.Mock()
+        runner.dry_run = False
+        runner.check.side_effect = [
+            subprocess.CompletedProcess([], 0),
+            subprocess.CompletedProcess(
+                [], 0, stdout="ID 261 gen 20 top level 0 path DELETED\n"
+            ),
+            subprocess.CompletedProcess([], 0),
+        ]
+        manager = mib.BtrfsManager(runner)
+        args = mib.build_parser().parse_args(["cleanup", "--wait"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            queue_dir = mib.deletion_queue_dir(volume_path)
+            queue_dir.mkdir()
+            (queue_dir / "vm1.restore-old.1").mkdir()
+            (queue_dir / "vm2.restore-old.1").mkdir()
+            ctx = mib.AppContext(
+                manifest=mib.Manifest(volume_path=volume_path, vms={}),
+                runner=runner,
+                btrfs=manager,
+                borg=mock.Mock(),
+                systemd=mock.Mock(),
+            )
+            with (
+                mock.patch.object(
+                    manager,
+                    "inspect",
+                    side_effect=lambda paths: {path: True for path in paths},
+                ),
+                self.assertLogs(mib.LOGGER, level="INFO"),
+            ):
+                mib.handle_cleanup(ctx, args)
+
+        self.assertEqual(
+            runner.check.call_args_list,
+            [
+                mock.call(
+                    [
+                        "btrfs",
+                        "subvolume",
+                        "delete",
+                        str(queue_dir / "vm1.restore-old.1"),
+                        str(queue_dir / "vm2.restore-old.1"),
+                    ],
+                    mutating=True,
+                ),
+                mock.call(
+                    ["btrfs", "subvolume", "list", "-d", str(volume_path)],
+                    capture_output=True,
+                ),
+                mock.call(["btrfs", "subvolume", "sync", str(volume_path), "261"]),
+            ],
+        )
 
 
 class SystemdManagerTests(unittest.TestCase):
@@ -245,6 +1043,71 @@ class ParserTests(unittest.TestCase):
         self.assertEqual(vm_and_archive.archive, "a1")
         self.assertTrue(vm_and_archive.yes)
 
+    def test_preview_workers_must_be_positive(self) -> None:
+        parser = mib.build_parser()
+
+        args = parser.parse_args(["--preview-workers", "3", "list"])
+        self.assertEqual(args.preview_workers, 3)
+
+        with (
+            mock.patch("sys.stderr", new_callable=io.StringIO),
+            self.assertRaises(SystemExit),
+        ):
+            parser.parse_args(["--preview-workers", "0", "list"])
+
+
+class ManifestTests(unittest.TestCase):
+    def test_preview_workers_read_from_manifest(self) -> None:
+        raw = {
+            "volumePath": "/srv/microvms",
+            "previewWorkers": 3,
+            "vms": {
+                "vm1": {
+                    "repo": "ssh://example/repo",
+                    "passFile": "/var/keys/pass",
+                    "sshKeyPath": "/var/keys/key",
+                }
+            },
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "manifest.json"
+            path.write_text(json.dumps(raw), encoding="utf-8")
+            manifest = mib.load_manifest(str(path))
+
+            self.assertEqual(manifest.preview_workers, 3)
+
+            raw["previewWorkers"] = 0
+            path.write_text(json.dumps(raw), encoding="utf-8")
+            with self.assertRaises(mib.CliError):
+                mib.load_manifest(str(path))
+
+    def test_backup_settings_read_from_manifest(self) -> None:
+        raw = {
+            "volumePath": "/srv/microvms",
+            "snapshotRoot": "/srv/.snapshots/borg",
+            "vms": {
+                "vm1": {
+                    "repo": "ssh://example/repo",
+                    "passFile": "/var/keys/pass",
+                    "sshKeyPath": "/var/keys/key",
+                    "archivePrefix": "app",
+                    "compression": "auto,zstd",
+                    "pruneKeep": {"within": "24H", "daily": 7},
+                    "qgaSocket": "/var/lib/microvms/vm1/qga.sock",
+                }
+            },
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "manifest.json"
+            path.write_text(json.dumps(raw), encoding="utf-8")
+            manifest = mib.load_manifest(str(path))
+
+        vm_data = manifest.vms["vm1"]
+        self.assertEqual(manifest.snapshot_root, Path("/srv/.snapshots/borg"))
+        self.assertEqual(vm_data.archive_prefix, "app")
+        self.assertEqual(vm_data.prune_keep, (("daily", "7"), ("within", "24H")))
+        self.assertEqual(vm_data.qga_socket, Path("/var/lib/microvms/vm1/qga.sock"))
+
 
 class FlowTests(unittest.TestCase):
     def test_backup_with_explicit_vm_restarts_job(self) -> None:
@@ -392,6 +1255,865 @@ class FlowTests(unittest.TestCase):
         self.assertEqual(rc, 130)
 
 
+class RestoreTransactionTests(unittest.TestCase):
+    @staticmethod
+    def _context(volume_path: Path) -> mib.AppContext:
+        manifest = mib.Manifest(volume_path=volume_path, vms=make_manifest().vms)
+        systemd = mock.Mock()
+        systemd.vm_service_unit.side_effect = mib.SystemdManager.vm_service_unit
+        return mib.AppContext(
+            manifest=manifest,
+            runner=mib.CommandRunner(dry_run=False),
+            btrfs=mock.Mock(),
+            borg=mock.Mock(),
+            systemd=systemd,
+        )
+
+    def test_stage_only_then_swap_staged(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            paths = mib.vm_paths(volume_path, "vm1")
+            paths.target.mkdir()
+            vm_data = make_manifest().vms["vm1"]
+
+            ctx = self._context(volume_path)
+            with (
+                mib.RestoreTransaction(ctx, "vm1", "a1", vm_data, stage_only=True) as tx,
+                self.assertLogs(mib.LOGGER, level="INFO"),
+            ):
+                tx.run()
+
+            ctx.borg.extract_archive.assert_called_once()
+            ctx.systemd.stop.assert_not_called()
+            self.assertEqual(mib.read_stage_marker(paths)["archive"], "a1")
+            self.assertNotIn(
+                mock.call(paths.stage, "restore stage subvolume"),
+                ctx.btrfs.cleanup_subvolume_best_effort.call_args_list,
+            )
+            self.assertEqual(set(tx.timings), {"prepare", "extract"})
+
+            paths.stage.mkdir()
+            (paths.stage / "disk.img").write_text("restored", encoding="utf-8")
+            ctx = self._context(volume_path)
+            with (
+                mib.RestoreTransaction(ctx, "vm1", "a1", vm_data, use_staged=True) as tx,
+                self.assertLogs(mib.LOGGER, level="INFO"),
+            ):
+                tx.run()
+
+            ctx.borg.extract_archive.assert_not_called()
+            ctx.systemd.stop.assert_called_once_with("microvm@vm1.service")
+            ctx.systemd.start.assert_called_once_with("microvm@vm1.service")
+            self.assertEqual(
+                (paths.target / "disk.img").read_text(encoding="utf-8"), "restored"
+            )
+            self.assertFalse(paths.stage_marker.exists())
+            self.assertEqual(set(tx.timings), {"prepare", "stop", "swap", "start"})
+            self.assertIsNotNone(tx.downtime)
+
+    def test_dry_run_extract_writes_no_metrics(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            metrics_path = volume_path / "metrics.jsonl"
+            ctx = mib.dataclasses.replace(
+                self._context(volume_path), runner=mib.CommandRunner(dry_run=True)
+            )
+            tx = mib.RestoreTransaction(
+                ctx, "vm1", "a1", make_manifest().vms["vm1"], metrics_path=metrics_path
+            )
+
+            tx._extract()
+
+            ctx.borg.extract_archive.assert_called_once()
+            self.assertFalse(metrics_path.exists())
+
+    def test_verify_aborts_before_stopping_vm_on_checksum_mismatch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            paths = mib.vm_paths(volume_path, "vm1")
+            paths.target.mkdir()
+            paths.stage.mkdir()
+            (paths.stage / "good.img").write_bytes(b"good")
+            (paths.stage / "bad.img").write_bytes(b"flip")
+            paths.stage_marker.write_text(json.dumps({"archive": "a1"}), encoding="utf-8")
+            ctx = self._context(volume_path)
+            ctx.borg.list_archive_items.return_value = [
+                mib.ArchiveItem(
+                    path=name,
+                    type="-",
+                    size=4,
+                    mtime="",
+                    linktarget="",
+                    sha256=mib.hashlib.sha256(b"good").hexdigest(),
+                )
+                for name in ("good.img", "bad.img")
+            ]
+
+            with self.assertLogs(mib.LOGGER, level="INFO") as logs:
+                with self.assertRaisesRegex(mib.CliError, "1 of 2 items differ"):
+                    with mib.RestoreTransaction(
+                        ctx, "vm1", "a1", make_manifest().vms["vm1"],
+                        use_staged=True, verify="sha256",
+                    ) as tx:
+                        tx.run()
+
+        ctx.borg.list_archive_items.assert_called_once_with(
+            mock.ANY, "a1", checksums=True
+        )
+        ctx.systemd.stop.assert_not_called()
+        self.assertIn("verify", tx.timings)
+        self.assertTrue(any("bad.img: sha256 differs" in line for line in logs.output))
+        self.assertTrue(any("hashed 8 B" in line for line in logs.output))
+
+    def test_checksum_listing_overlaps_extraction(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            paths = mib.vm_paths(volume_path, "vm1")
+            paths.target.mkdir()
+            ctx = self._context(volume_path)
+            listing_started = threading.Event()
+
+            async def list_items(vm_data: object, archive: str, **kwargs: object) -> list[mib.ArchiveItem]:
+                listing_started.set()
+                return [
+                    mib.ArchiveItem(
+                        path="disk.img",
+                        type="-",
+                        size=4,
+                        mtime="",
+                        linktarget="",
+                        sha256=mib.hashlib.sha256(b"disk").hexdigest(),
+                    )
+                ]
+
+            def extract(vm_data: object, archive: str, **kwargs: object) -> None:
+                # Extraction only finishes once the listing is already running.
+                self.assertTrue(listing_started.wait(timeout=3.0))
+                paths.stage.mkdir(exist_ok=True)
+                (paths.stage / "disk.img").write_bytes(b"disk")
+
+            ctx.borg.list_archive_items_async = mock.Mock(side_effect=list_items)
+            ctx.borg.extract_archive.side_effect = extract
+
+            with (
+                mib.RestoreTransaction(
+                    ctx, "vm1", "a1", make_manifest().vms["vm1"],
+                    stage_only=True, verify="sha256",
+                ) as tx,
+                self.assertLogs(mib.LOGGER, level="INFO"),
+            ):
+                tx.run()
+
+        ctx.borg.list_archive_items_async.assert_called_once_with(
+            mock.ANY, "a1", checksums=True
+        )
+        self.assertTrue(tx.staged)
+
+    def test_sha256_verification_fails_when_digest_is_missing(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "disk.img").write_bytes(b"disk")
+            item = mib.ArchiveItem(
+                path="disk.img", type="-", size=4, mtime="", linktarget=""
+            )
+
+            sizes = mib.verify_stage(root, [item], checksums=False)
+            digests = mib.verify_stage(root, [item], checksums=True)
+
+        self.assertEqual(sizes.mismatches, ())
+        self.assertEqual(
+            digests.mismatches, ("disk.img: archive listing has no sha256 digest",)
+        )
+
+    def test_failed_extraction_cancels_checksum_listing(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            mib.vm_paths(volume_path, "vm1").target.mkdir()
+            ctx = self._context(volume_path)
+            listing_started = threading.Event()
+            cancelled = threading.Event()
+
+            async def list_items(vm_data: object, archive: str, **kwargs: object) -> list[mib.ArchiveItem]:
+                listing_started.set()
+                try:
+                    await mib.asyncio.sleep(30)
+                except mib.asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+                return []
+
+            def extract(vm_data: object, archive: str, **kwargs: object) -> None:
+                self.assertTrue(listing_started.wait(timeout=3.0))
+                raise mib.CliError("borg extract failed")
+
+            ctx.borg.list_archive_items_async = mock.Mock(side_effect=list_items)
+            ctx.borg.extract_archive.side_effect = extract
+
+            with self.assertLogs(mib.LOGGER, level="INFO"):
+                with self.assertRaisesRegex(mib.CliError, "extract failed"):
+                    with mib.RestoreTransaction(
+                        ctx, "vm1", "a1", make_manifest().vms["vm1"],
+                        stage_only=True, verify="sha256",
+                    ) as tx:
+                        tx.run()
+
+        self.assertTrue(cancelled.is_set())
+        self.assertIsNone(tx.checksum_listing)
+
+    def test_failed_start_after_swap_staged_keeps_stage_for_retry(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            paths = mib.vm_paths(volume_path, "vm1")
+            paths.target.mkdir()
+            (paths.target / "disk.img").write_text("live", encoding="utf-8")
+            paths.stage.mkdir()
+            (paths.stage / "disk.img").write_text("restored", encoding="utf-8")
+            paths.stage_marker.write_text(json.dumps({"archive": "a1"}), encoding="utf-8")
+            ctx = self._context(volume_path)
+            ctx.systemd.is_active.return_value = True
+            ctx.systemd.start.side_effect = mib.CliError("start failed")
+
+            with self.assertLogs(mib.LOGGER, level="INFO"):
+                with self.assertRaises(mib.CliError):
+                    with mib.RestoreTransaction(
+                        ctx, "vm1", "a1", make_manifest().vms["vm1"], use_staged=True
+                    ) as tx:
+                        tx.run()
+
+            self.assertEqual((paths.target / "disk.img").read_text(encoding="utf-8"), "live")
+            self.assertEqual((paths.stage / "disk.img").read_text(encoding="utf-8"), "restored")
+            self.assertEqual(mib.read_stage_marker(paths)["archive"], "a1")
+
+    def test_swap_staged_rejects_other_archive(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            volume_path = Path(tmp)
+            paths = mib.vm_paths(volume_path, "vm1")
+            paths.stage_marker.write_text(json.dumps({"archive": "a1"}), encoding="utf-8")
+            ctx = self._context(volume_path)
+
+            with self.assertRaises(mib.CliError):
+                mib._staged_archive(ctx, "vm1", "a2")
+            self.assertEqual(mib._staged_archive(ctx, "vm1", None), "a1")
+
+
+class BackupRunTests(unittest.TestCase):
+    @staticmethod
+    def _context(root: Path) -> mib.AppContext:
+        vm_data = mib.dataclasses.replace(
+            make_manifest().vms["vm1"],
+            compression="auto,zstd",
+            prune_keep=(("daily", "7"),),
+            qga_socket=root / "qga.sock",
+            files_cache="mtime,size",
+        )
+        manifest = mib.Manifest(
+            volume_path=root / "volumes",
+            vms={"vm1": vm_data},
+            snapshot_root=root / "snapshots",
+        )
+        borg = mock.Mock()
+        borg.index = None
+        borg.create_archive.return_value = {"stats": {"original_size": 4096}}
+        systemd = mock.Mock()
+        systemd.vm_backup_unit = mib.SystemdManager.vm_backup_unit
+        systemd.is_active.return_value = False
+        return mib.AppContext(
+            manifest=manifest,
+            runner=mib.CommandRunner(dry_run=False),
+            btrfs=mock.Mock(),
+            borg=borg,
+            systemd=systemd,
+        )
+
+    def test_run_snapshots_under_freeze_then_creates_prunes_and_cleans_up(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "qga.sock").touch()
+            ctx = self._context(root)
+            vm_data = ctx.manifest.vms["vm1"]
+            snapshot = root / "snapshots" / "vm1" / "current"
+            freeze = mock.Mock(side_effect=lambda path, timeout, action, report: action())
+
+            with (
+                mock.patch.object(mib.qga_client, "freeze_call", freeze),
+                self.assertLogs(mib.LOGGER, level="INFO"),
+                mib.BackupRun(ctx, "vm1", vm_data) as run,
+            ):
+                run.run()
+            parent_left = snapshot.parent.exists()
+
+        self.assertEqual(freeze.call_args.args[0], root / "qga.sock")
+        ctx.btrfs.snapshot_subvolume.assert_called_once_with(
+            root / "volumes" / "vm1", snapshot, readonly=True
+        )
+        archive = ctx.borg.create_archive.call_args.args[1]
+        self.assertTrue(archive.startswith("vm1-"))
+        self.assertEqual(ctx.borg.create_archive.call_args.args[2], [f"{snapshot}/./."])
+        ctx.borg.prune_archives.assert_called_once_with(
+            vm_data, glob="vm1-*", keep=(("daily", "7"),)
+        )
+        ctx.borg.compact_archives.assert_called_once_with(vm_data)
+        ctx.btrfs.cleanup_subvolume_best_effort.assert_called_once_with(
+            snapshot, "backup snapshot"
+        )
+        self.assertFalse(parent_left)
+        self.assertEqual(
+            list(run.timings),
+            ["prepare", "snapshot", "create", "prune", "compact", "cleanup"],
+        )
+
+    def test_success_records_create_stats_in_index(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            ctx = self._context(Path(tmp))
+            ctx.borg.index = mock.Mock()
+            ctx.borg.create_archive.return_value = {
+                "stats": {"original_size": 4096, "deduplicated_size": 512}
+            }
+            vm_data = ctx.manifest.vms["vm1"]
+
+            with (
+                mock.patch.object(mib, "refresh_archive_index") as refresh,
+                self.assertLogs(mib.LOGGER, level="INFO"),
+                mib.BackupRun(ctx, "vm1", vm_data) as run,
+            ):
+                run.snapshot_taken = True
+                run.run()
+
+        ctx.borg.index.record_created.assert_called_once_with(
+            vm_data.repo, run.archive, deduplicated_size=512
+        )
+        refresh.assert_called_once_with(ctx.borg, ctx.borg.index, "vm1", vm_data)
+
+    def test_refuses_to_run_while_backup_job_is_active(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            ctx = self._context(Path(tmp))
+            ctx.systemd.is_active.return_value = True
+
+            with self.assertRaisesRegex(mib.CliError, "borgbackup-job-microvm-vm1"):
+                with mib.BackupRun(ctx, "vm1", ctx.manifest.vms["vm1"]) as run:
+                    run.run()
+
+        ctx.systemd.is_active.assert_called_once_with(
+            "borgbackup-job-microvm-vm1.service"
+        )
+        ctx.btrfs.snapshot_subvolume.assert_not_called()
+        ctx.borg.create_archive.assert_not_called()
+
+    def test_create_relays_file_status_and_reports_files_cache_hits(self) -> None:
+        def check(cmd: list[str], **kwargs: object) -> subprocess.CompletedProcess[str]:
+            on_line = kwargs["on_stderr_line"]
+            for status, path in (("U", "big.img"), ("M", "small.img"), ("d", ".")):
+                on_line(json.dumps({"type": "file_status", "status": status, "path": path}))
+            on_line("not json")
+            return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps({"archive": {}}))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            ctx = self._context(root)
+            runner = mock.Mock(dry_run=False)
+            runner.check.side_effect = check
+            ctx.borg.create_archive.side_effect = mib.BorgService(runner).create_archive
+            snapshot = root / "snapshots" / "vm1" / "current"
+            snapshot.mkdir(parents=True)
+            (snapshot / "big.img").write_bytes(b"x" * 300)
+            (snapshot / "small.img").write_bytes(b"x" * 100)
+
+            with self.assertLogs(mib.LOGGER, level="INFO") as logs:
+                run = mib.BackupRun(ctx, "vm1", ctx.manifest.vms["vm1"])
+                run.snapshot_taken = True
+                run.run()
+
+        cmd = runner.check.call_args.args[0]
+        self.assertIn("--files-cache=mtime,size", cmd)
+        self.assertIn("--log-json", cmd)
+        report = run.files_cache_report()
+        self.assertEqual((report["hit_files"], report["files"]), (1, 2))
+        self.assertEqual(report["hit_rate"], 0.75)
+        self.assertTrue(any("(75.0%)" in line for line in logs.output))
+
+    def test_failed_create_still_removes_snapshot(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            ctx = self._context(root)
+            ctx.borg.create_archive.side_effect = mib.CliError("borg create failed")
+
+            with self.assertLogs(mib.LOGGER, level="INFO"):
+                with self.assertRaises(mib.CliError):
+                    with mib.BackupRun(ctx, "vm1", ctx.manifest.vms["vm1"]) as run:
+                        run.run()
+
+        ctx.borg.prune_archives.assert_not_called()
+        ctx.btrfs.cleanup_subvolume_best_effort.assert_called_once()
+
+
+class BackupBatchTests(unittest.TestCase):
+    def test_backup_all_starts_longest_expected_vm_first(self) -> None:
+        vm_data = make_manifest().vms["vm1"]
+        manifest = mib.Manifest(
+            volume_path=Path("/srv/microvms"),
+            vms={"short": vm_data, "long": vm_data, "new": vm_data},
+        )
+        history = {"short": [10.0, 12.0, 500.0], "long": [300.0, 290.0]}
+        index = mock.Mock()
+        index.search.side_effect = lambda vms, limit: [
+            mib.IndexedArchive(
+                vm=vms[0],
+                archive_id=str(i),
+                info=mib.dataclasses.replace(make_info(f"a{i}"), duration=seconds),
+            )
+            for i, seconds in enumerate(history.get(vms[0], [])[:limit])
+        ]
+        borg = mock.Mock()
+        borg.index = index
+        ctx = mib.AppContext(
+            manifest=manifest,
+            runner=mib.CommandRunner(dry_run=False),
+            btrfs=mock.Mock(),
+            borg=borg,
+            systemd=mock.Mock(),
+        )
+        args = mib.build_parser().parse_args(["backup", "--all", "--per-host", "1"])
+
+        started: list[str] = []
+
+        def backup_run(ctx: object, vm: str, vm_data: object, **kwargs: object) -> mock.MagicMock:
+            run = mock.MagicMock()
+            run.__enter__.return_value = run
+            run.__exit__.return_value = False
+            run.run.side_effect = lambda: started.append(vm)
+            return run
+
+        with (
+            mock.patch.object(mib, "BackupRun", side_effect=backup_run),
+            self.assertLogs(mib.LOGGER, level="INFO") as logs,
+        ):
+            mib.handle_backup(ctx, args)
+
+        self.assertEqual(started, ["new", "long", "short"])
+        index.search.assert_any_call(vms=["long"], limit=mib.BACKUP_HISTORY_SAMPLES)
+        self.assertTrue(any("makespan" in line for line in logs.output))
+
+
+class GroupFreezeTests(unittest.TestCase):
+    @staticmethod
+    def _guest(path: Path, timeout: float) -> mock.MagicMock:
+        return mock.MagicMock(name=path.stem)
+
+    def test_freezes_all_guests_runs_once_and_emergency_thaws_failed_thaw(self) -> None:
+        qga = mib.qga_client
+        events: list[str] = []
+
+        def freeze(client: mock.MagicMock) -> int:
+            events.append(f"freeze {client._mock_name}")
+            return 1
+
+        def thaw(client: mock.MagicMock) -> int:
+            events.append(f"thaw {client._mock_name}")
+            if client._mock_name == "b":
+                raise qga.QgaError("thaw timed out")
+            return 1
+
+        clients = [Path("/a.sock"), Path("/b.sock")]
+        with (
+            mock.patch.object(qga, "_open_thawed_guest", self._guest),
+            mock.patch.object(qga, "_freeze_guest", side_effect=freeze),
+            mock.patch.object(qga, "_thaw_guest", side_effect=thaw),
+            mock.patch.object(qga, "emergency_thaw", return_value=1) as emergency,
+        ):
+            with self.assertRaisesRegex(qga.QgaError, "group thaw failed"):
+                qga.group_freeze_call(
+                    clients,
+                    1.0,
+                    lambda: events.append("snapshot"),
+                    report=lambda message: None,
+                )
+
+        self.assertEqual(events.count("snapshot"), 1)
+        self.assertLess(events.index("freeze b"), events.index("snapshot"))
+        self.assertLess(events.index("snapshot"), events.index("thaw a"))
+        emergency.assert_called_once_with(Path("/b.sock"), 1.0)
+
+    def test_failed_freeze_skips_action_and_thaws_every_guest(self) -> None:
+        qga = mib.qga_client
+        action = mock.Mock()
+
+        def freeze(client: mock.MagicMock) -> int:
+            if client._mock_name == "b":
+                raise qga.QgaError("no filesystems")
+            return 2
+
+        with (
+            mock.patch.object(qga, "_open_thawed_guest", self._guest),
+            mock.patch.object(qga, "_freeze_guest", side_effect=freeze),
+            mock.patch.object(qga, "_thaw_guest", return_value=1) as thaw,
+            mock.patch.object(qga, "emergency_thaw") as emergency,
+        ):
+            with self.assertRaisesRegex(qga.QgaError, "group freeze failed"):
+                qga.group_freeze_call(
+                    [Path("/a.sock"), Path("/b.sock")],
+                    1.0,
+                    action,
+                    report=lambda message: None,
+                )
+
+        action.assert_not_called()
+        self.assertEqual(thaw.call_count, 2)
+        emergency.assert_not_called()
+
+    @staticmethod
+    def _group_context(root: Path) -> tuple[mib.AppContext, dict[str, Path]]:
+        vm_data = mib.VmBackupConfig(
+            repo="ssh://example/repo",
+            pass_file=Path("/var/keys/pass"),
+            ssh_key_path=Path("/var/keys/key"),
+        )
+        sockets = {vm: root / f"{vm}.sock" for vm in ("app", "db")}
+        for path in sockets.values():
+            path.touch()
+        manifest = mib.Manifest(
+            volume_path=root / "volumes",
+            vms={
+                vm: mib.dataclasses.replace(vm_data, qga_socket=path)
+                for vm, path in sockets.items()
+            },
+            snapshot_root=root / "snapshots",
+        )
+        borg = mock.Mock()
+        borg.index = None
+        borg.create_archive.return_value = {}
+        systemd = mock.Mock()
+        systemd.is_active.return_value = False
+        ctx = mib.AppContext(
+            manifest=manifest,
+            runner=mib.CommandRunner(dry_run=False),
+            btrfs=mock.Mock(),
+            borg=borg,
+            systemd=systemd,
+        )
+        return ctx, sockets
+
+    def test_backup_group_takes_all_snapshots_in_one_freeze(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            ctx, sockets = self._group_context(root)
+            borg = ctx.borg
+            metrics = root / "metrics.jsonl"
+            args = mib.build_parser().parse_args(
+                ["backup", "--group", "app", "db", "--metrics-file", str(metrics)]
+            )
+            freeze = mock.Mock(side_effect=lambda paths, timeout, action, report: action())
+            ticks = itertools.count()
+
+            class Clock(datetime):
+                @classmethod
+                def now(cls, tz=None):  # type: ignore[override]
+                    return datetime(2026, 3, 1, 12, 0) + timedelta(minutes=next(ticks))
+
+            with (
+                mock.patch.object(mib.qga_client, "group_freeze_call", freeze),
+                mock.patch.object(mib, "datetime", Clock),
+                self.assertLogs(mib.LOGGER, level="INFO") as logs,
+            ):
+                mib.handle_backup(ctx, args)
+            records = [json.loads(line) for line in metrics.read_text().splitlines()]
+
+        freeze.assert_called_once()
+        self.assertEqual(freeze.call_args.args[0], [sockets["app"], sockets["db"]])
+        ctx.btrfs.snapshot_subvolumes.assert_called_once_with(
+            [
+                (root / "volumes" / "app", root / "snapshots" / "app" / "current"),
+                (root / "volumes" / "db", root / "snapshots" / "db" / "current"),
+            ],
+            readonly=True,
+        )
+        ctx.btrfs.snapshot_subvolume.assert_not_called()
+        self.assertEqual(borg.create_archive.call_count, 2)
+        self.assertEqual(
+            sorted(call.args[1] for call in borg.create_archive.call_args_list),
+            ["app-2026-03-01T12:00:00", "db-2026-03-01T12:00:00"],
+        )
+        self.assertEqual(ctx.btrfs.cleanup_subvolume_best_effort.call_count, 2)
+        self.assertEqual(ctx.systemd.is_active.call_count, 2)
+        self.assertTrue(any("makespan" in line for line in logs.output))
+        group = [record for record in records if record["event"] == "backup-group"]
+        self.assertEqual(set(group[0]["vms"]), {"app", "db"})
+
+    def test_backup_group_interrupted_in_scheduler_still_removes_snapshots(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            ctx, _ = self._group_context(Path(tmp))
+            args = mib.build_parser().parse_args(["backup", "--group", "app", "db"])
+
+            with (
+                mock.patch.object(
+                    mib.qga_client,
+                    "group_freeze_call",
+                    side_effect=lambda paths, timeout, action, report: action(),
+                ),
+                mock.patch.object(mib.BatchScheduler, "run", side_effect=KeyboardInterrupt),
+                self.assertLogs(mib.LOGGER, level="INFO"),
+            ):
+                with self.assertRaises(KeyboardInterrupt):
+                    mib.handle_backup(ctx, args)
+
+        ctx.borg.create_archive.assert_not_called()
+        self.assertEqual(ctx.btrfs.cleanup_subvolume_best_effort.call_count, 2)
+
+
+class DeltaRestoreTests(unittest.TestCase):
+    @staticmethod
+    def _file_item(path: str, size: int, mtime: float) -> mib.ArchiveItem:
+        return mib.ArchiveItem(
+            path=path,
+            type="-",
+            size=size,
+            mtime=mib.datetime.fromtimestamp(mtime).isoformat(timespec="microseconds"),
+            linktarget="",
+        )
+
+    def test_plan_extracts_only_changed_items_and_removes_extras(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "images").mkdir()
+            (root / "images" / "same.img").write_bytes(b"1234")
+            os.utime(root / "images" / "same.img", (1_700_000_000, 1_700_000_000))
+            (root / "images" / "grown.img").write_bytes(b"12")
+            os.utime(root / "images" / "grown.img", (1_700_000_000, 1_700_000_000))
+            (root / "stray.txt").write_text("x", encoding="utf-8")
+            (root / "stray-dir").mkdir()
+            (root / "stray-dir" / "nested").write_text("x", encoding="utf-8")
+
+            items = [
+                mib.ArchiveItem(path=".", type="d", size=0, mtime="", linktarget=""),
+                mib.ArchiveItem(path="images", type="d", size=0, mtime="", linktarget=""),
+                self._file_item("images/same.img", 4, 1_700_000_000),
+                self._file_item("images/grown.img", 4, 1_700_000_000),
+                self._file_item("images/new.img", 4, 1_700_000_000),
+            ]
+            changed, remove = mib.plan_delta_restore(root, items)
+
+        self.assertEqual(changed, ["images/grown.img", "images/new.img"])
+        self.assertEqual(
+            sorted(path.name for path in remove), ["stray-dir", "stray.txt"]
+        )
+
+    def test_extract_selected_paths_uses_pattern_file(self) -> None:
+        captured: dict[str, object] = {}
+
+        def check(cmd: list[str], **kwargs: object) -> subprocess.CompletedProcess[str]:
+            pattern_file = cmd[cmd.index("--patterns-from") + 1]
+            captured["cmd"] = cmd
+            captured["patterns"] = Path(pattern_file).read_text(encoding="utf-8")
+            return subprocess.CompletedProcess(cmd, 0)
+
+        runner = mock.Mock()
+        runner.check.side_effect = check
+        borg = mib.BorgService(runner)
+
+        borg.extract_archive(
+            make_manifest().vms["vm1"],
+            "a1",
+            cwd=Path("/srv/microvms/.vm1.restore-new"),
+            paths=["images/disk.img"],
+        )
+
+        self.assertEqual(captured["cmd"][-1], "::a1")
+        self.assertEqual(captured["patterns"], "+ pf:images/disk.img\n- fm:*\n")
+
+
+class BackupDaemonTests(unittest.TestCase):
+    def test_serves_list_info_and_restore_over_socket(self) -> None:
+        borg = mock.Mock()
+        borg.list_archive_metadata.return_value = [make_info("a1"), make_info("a2")]
+        borg.fetch_archive_info.side_effect = lambda vm_data, archive, **kw: make_info(
+            archive
+        )
+        ctx = make_context(dry_run=False, borg=borg)
+
+        class FakeTransaction:
+            calls: list[tuple] = []
+
+            def __init__(self, *args, **kwargs) -> None:
+                FakeTransaction.calls.append((args[1:3], kwargs))
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc) -> bool:
+                return False
+
+            def run(self) -> None:
+                mib.LOGGER.info("restoring inside daemon")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            socket_path = Path(tmp) / "control.sock"
+            listener = mib._daemon_listener(socket_path)
+            daemon = mib.BackupDaemon(ctx, listener, idle_timeout=0.3)
+            thread = threading.Thread(target=daemon.serve_forever)
+            thread.start()
+            try:
+                client = mib.DaemonClient.connect(socket_path)
+                self.assertIsNotNone(client)
+                self.assertEqual(
+                    [i.archive for i in client.list_archives("vm1", bypass_lock=True)],
+                    ["a1", "a2"],
+                )
+                client.list_archives("vm1")
+                self.assertEqual(client.archive_info("vm1", "a2").archive, "a2")
+                with self.assertRaisesRegex(mib.CliError, "Unknown VM"):
+                    client.list_archives("missing")
+
+                with (
+                    mock.patch.object(mib, "RestoreTransaction", FakeTransaction),
+                    self.assertLogs(mib.LOGGER, level="INFO") as logs,
+                ):
+                    client.restore("vm1", "a2", metrics_path=None, delta=True)
+            finally:
+                thread.join(timeout=5)
+                listener.close()
+
+        self.assertFalse(thread.is_alive())
+        borg.list_archive_metadata.assert_called_once_with(mock.ANY, bypass_lock=True)
+        self.assertEqual(
+            FakeTransaction.calls,
+            [(("vm1", "a2"), {"metrics_path": None, "delta": True})],
+        )
+        self.assertTrue(
+            any("restoring inside daemon" in line for line in logs.output)
+        )
+
+    @staticmethod
+    def _write_manifest(path: Path, vms: list[str]) -> None:
+        raw = {
+            "volumePath": "/srv/microvms",
+            "vms": {
+                vm: {
+                    "repo": "ssh://example/repo",
+                    "passFile": "/var/keys/pass",
+                    "sshKeyPath": "/var/keys/key",
+                }
+                for vm in vms
+            },
+        }
+        staged = path.with_suffix(".tmp")
+        staged.write_text(json.dumps(raw), encoding="utf-8")
+        os.replace(staged, path)
+
+    def test_reloads_manifest_when_it_changes(self) -> None:
+        borg = mock.Mock()
+        borg.list_archive_metadata.return_value = [make_info("a1")]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "manifest.json"
+            self._write_manifest(path, ["vm1"])
+            ctx = mib.dataclasses.replace(
+                make_context(dry_run=False, borg=borg), manifest=mib.load_manifest(str(path))
+            )
+            daemon = mib.BackupDaemon(ctx, mock.Mock(), manifest_path=path)
+            send = mock.Mock()
+
+            with self.assertRaisesRegex(mib.CliError, "Unknown VM"):
+                daemon._dispatch({"op": "list", "vm": "vm2"}, send)
+            self._write_manifest(path, ["vm1", "vm2"])
+            with self.assertLogs(mib.LOGGER, level="INFO"):
+                response = daemon._dispatch({"op": "list", "vm": "vm2"}, send)
+
+        self.assertEqual(response["status"], "ok")
+        self.assertEqual(borg.list_archive_metadata.call_args.args[0].name, "vm2")
+
+    def test_daemon_borg_service_passes_vm_name_for_identical_configs(self) -> None:
+        daemon = mock.Mock()
+        daemon.list_archives.return_value = []
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "manifest.json"
+            self._write_manifest(path, ["vm1", "vm2"])
+            manifest = mib.load_manifest(str(path))
+        borg = mib.DaemonBorgService(mib.CommandRunner(dry_run=False), daemon)
+
+        borg.list_archive_metadata(manifest.vms["vm2"], bypass_lock=True)
+        borg.fetch_archive_info(manifest.vms["vm1"], "a1")
+
+        daemon.list_archives.assert_called_once_with("vm2", refresh=False, bypass_lock=True)
+        daemon.archive_info.assert_called_once_with("vm1", "a1", bypass_lock=False)
+
+    def test_cli_uses_daemon_only_when_reachable(self) -> None:
+        parser = mib.build_parser()
+        with mock.patch.dict(
+            os.environ, {mib.DAEMON_SOCKET_ENV: "/nonexistent/control.sock"}
+        ):
+            self.assertIsNone(mib._connect_daemon(parser.parse_args(["list"])))
+        self.assertIsNone(
+            mib._connect_daemon(parser.parse_args(["--dry-run", "list", "vm1"]))
+        )
+        self.assertIsNone(mib._connect_daemon(parser.parse_args(["cleanup"])))
+
+
+class BatchRestoreTests(unittest.TestCase):
+    @staticmethod
+    def _job(vm: str, host: str, disk: str = "disk") -> mib.RestoreJob:
+        return mib.RestoreJob(
+            vm=vm,
+            archive=f"{vm}-latest",
+            vm_data=make_manifest().vms["vm1"],
+            repo_host=host,
+            disk=disk,
+        )
+
+    def test_scheduler_bounds_concurrency_per_host(self) -> None:
+        lock = threading.Lock()
+        active: dict[str, int] = {}
+        peak: dict[str, int] = {}
+
+        def run_job(job: mib.RestoreJob) -> None:
+            with lock:
+                active[job.repo_host] = active.get(job.repo_host, 0) + 1
+                peak[job.repo_host] = max(peak.get(job.repo_host, 0), active[job.repo_host])
+            time.sleep(0.05)
+            with lock:
+                active[job.repo_host] -= 1
+            if job.vm == "b2":
+                raise mib.CliError("extract failed")
+
+        scheduler = mib.BatchScheduler(per_host=1, per_disk=4, run_job=run_job)
+        results = scheduler.run(
+            [
+                self._job("a1", "host-a"),
+                self._job("a2", "host-a"),
+                self._job("b1", "host-b"),
+                self._job("b2", "host-b"),
+            ]
+        )
+
+        self.assertEqual(peak, {"host-a": 1, "host-b": 1})
+        self.assertIsNone(results["a1"])
+        self.assertIsInstance(results["b2"], mib.CliError)
+
+    def test_all_restores_latest_archive_of_every_vm(self) -> None:
+        parser = mib.build_parser()
+        args = parser.parse_args(["restore-batch", "--yes", "--all"])
+        borg = mock.Mock()
+        borg.latest_archive.return_value = "vm1-latest"
+        ctx = make_context(dry_run=False, borg=borg)
+
+        tx = mock.MagicMock()
+        tx.__enter__.return_value = tx
+        tx.__exit__.return_value = False
+        with (
+            mock.patch.object(mib, "RestoreTransaction", return_value=tx) as tx_cls,
+            redirect_stdout(io.StringIO()),
+        ):
+            mib.handle_restore_batch(ctx, args)
+
+        tx_cls.assert_called_once_with(
+            ctx,
+            "vm1",
+            "vm1-latest",
+            ctx.manifest.vms["vm1"],
+            metrics_path=None,
+            defer_cleanup=False,
+            verify=None,
+        )
+        tx.run.assert_called_once()
+
+
 class PreviewServerTests(unittest.TestCase):
     @staticmethod
     def _wait_for(predicate: callable, timeout: float = 1.0) -> bool:
@@ -521,7 +2243,7 @@ class PreviewServerTests(unittest.TestCase):
         self.assertEqual(second.get("status"), "ready")
         self.assertEqual(fake_borg.calls.get("flaky"), 2)
 
-    def test_prefetch_skips_when_demand_pending(self) -> None:
+    def test_prefetch_deferred_while_demand_pending(self) -> None:
         fake_borg = self.PriorityBorg(blocked={"busy"})
         vm_data = make_manifest().vms["vm1"]
         response_holder: dict[str, dict[str, object]] = {}
@@ -542,12 +2264,18 @@ class PreviewServerTests(unittest.TestCase):
 
                 server.prefetch_archives(["later-prefetch"])
                 time.sleep(0.1)
+                self.assertNotIn("later-prefetch", fake_borg.order)
                 fake_borg.release_events["busy"].set()
                 thread.join(timeout=2.0)
                 self.assertFalse(thread.is_alive())
-                time.sleep(0.1)
 
-                self.assertNotIn("later-prefetch", fake_borg.order)
+                self.assertTrue(
+                    self._wait_for(
+                        lambda: fake_borg.started.get(
+                            "later-prefetch", threading.Event()
+                        ).is_set()
+                    )
+                )
                 direct = mib._preview_rpc(
                     {"op": "get_preview", "archive": "later-prefetch", "wait_ms": 800},
                     timeout_seconds=3.0,
@@ -643,6 +2371,165 @@ class PreviewServerTests(unittest.TestCase):
         self.assertEqual(second.get("status"), "ready")
         self.assertEqual(fake_borg.calls, 1)
 
+    def test_loading_response_includes_bulk_summary(self) -> None:
+        fake_borg = FakeBorgForPreview(delay=0.3)
+        fake_borg.format_archive_overview = lambda info: f"Start: {info.start}"
+        vm_data = make_manifest().vms["vm1"]
+
+        with mib.InlinePreviewServer(
+            vm_data=vm_data, borg=fake_borg, summaries={"a1": make_info("a1")}
+        ) as server:
+            with mock.patch.dict(os.environ, {mib.PREVIEW_SOCKET_ENV: server.socket_name}):
+                response = mib._preview_rpc(
+                    {"op": "get_preview", "archive": "a1", "wait_ms": 0},
+                    timeout_seconds=3.0,
+                )
+
+        self.assertEqual(response.get("status"), "loading")
+        self.assertIn("Start: 2026-02-20 00:00:00", str(response.get("text")))
+
+    def test_concurrency_backs_off_on_lock_failure_and_recovers(self) -> None:
+        vm_data = make_manifest().vms["vm1"]
+        server = mib.InlinePreviewServer(
+            vm_data=vm_data, borg=FakeBorgForPreview(delay=0), max_workers=4
+        )
+        try:
+            self.assertEqual(server.concurrency_limit, mib.FETCH_WORKERS)
+
+            for _ in range(mib.ADAPTIVE_SCALE_UP_SUCCESSES * 4):
+                server._record_outcome(lock_failure=False)  # type: ignore[attr-defined]
+            self.assertEqual(server.concurrency_limit, 4)
+
+            server._record_outcome(lock_failure=True)  # type: ignore[attr-defined]
+            self.assertEqual(server.concurrency_limit, 2)
+            server._record_outcome(lock_failure=True)  # type: ignore[attr-defined]
+            server._record_outcome(lock_failure=True)  # type: ignore[attr-defined]
+            self.assertEqual(server.concurrency_limit, 1)
+        finally:
+            server.stop()
+
+    def test_prefetch_respects_single_worker_limit(self) -> None:
+        fake_borg = self.PriorityBorg(blocked={"p1"})
+        vm_data = make_manifest().vms["vm1"]
+
+        with mib.InlinePreviewServer(
+            vm_data=vm_data, borg=fake_borg, max_workers=1
+        ) as server:
+            server.prefetch_archives(["p1", "p2"])
+            self.assertTrue(
+                self._wait_for(lambda: fake_borg.started.get("p1", threading.Event()).is_set())
+            )
+            time.sleep(0.1)
+            self.assertNotIn("p2", fake_borg.order)
+            fake_borg.release_events["p1"].set()
+            self.assertTrue(
+                self._wait_for(lambda: fake_borg.started.get("p2", threading.Event()).is_set())
+            )
+
+    def test_bypass_lock_mode_is_forwarded_to_borg(self) -> None:
+        fake_borg = mock.Mock()
+        fake_borg.fetch_archive_info.return_value = make_info("a1")
+        fake_borg.format_archive_details.return_value = "Archive: a1"
+        vm_data = make_manifest().vms["vm1"]
+
+        with mib.InlinePreviewServer(
+            vm_data=vm_data, borg=fake_borg, bypass_lock=True
+        ) as server:
+            record = server.get_preview(archive="a1", wait_ms=1000)
+
+        self.assertEqual(record.status, "ready")
+        fake_borg.fetch_archive_info.assert_called_once_with(
+            vm_data, "a1", bypass_lock=True
+        )
+
+    def test_prefetch_ordered_around_cursor_and_stale_entries_cancelled(self) -> None:
+        fake_borg = self.PriorityBorg(blocked={"r0"})
+        vm_data = make_manifest().vms["vm1"]
+        rows = [f"r{i}" for i in range(40)]
+
+        with mib.InlinePreviewServer(
+            vm_data=vm_data, borg=fake_borg, max_workers=1
+        ) as server:
+            server.set_archive_order(rows)
+            server.focus_archive("r0")
+            self.assertTrue(
+                self._wait_for(lambda: fake_borg.started.get("r0", threading.Event()).is_set())
+            )
+
+            with mock.patch.dict(os.environ, {mib.PREVIEW_SOCKET_ENV: server.socket_name}):
+                mib._preview_rpc(
+                    {"op": "prefetch", "archive": "r30"}, timeout_seconds=3.0
+                )
+            fake_borg.release_events["r0"].set()
+            self.assertTrue(
+                self._wait_for(lambda: fake_borg.started.get("r22", threading.Event()).is_set())
+            )
+
+        self.assertEqual(fake_borg.order[:4], ["r0", "r30", "r29", "r31"])
+        self.assertNotIn("r5", fake_borg.order)
+
+    def test_connection_pipelines_requests_and_pushes_ready_records(self) -> None:
+        fake_borg = FakeBorgForPreview(delay=0.2)
+        vm_data = make_manifest().vms["vm1"]
+        events: list[dict[str, object]] = []
+        ready = threading.Event()
+
+        def on_event(event: dict[str, object]) -> None:
+            events.append(event)
+            if event.get("archive") == "a2":
+                ready.set()
+
+        with mib.InlinePreviewServer(vm_data=vm_data, borg=fake_borg) as server:
+            with (
+                mock.patch.dict(os.environ, {mib.PREVIEW_SOCKET_ENV: server.socket_name}),
+                mib.PreviewConnection.open(timeout_seconds=3.0, on_event=on_event) as conn,
+            ):
+                subscribed = conn.request({"op": "subscribe", "archives": ["a2"]})
+                slow = conn.request({"op": "get_preview", "archive": "a1", "wait_ms": 3000})
+                quick = conn.request({"op": "get_preview", "archive": "a2", "wait_ms": 0})
+
+                self.assertEqual(subscribed.result(timeout=3)["status"], "ok")
+                self.assertEqual(quick.result(timeout=3)["status"], "loading")
+                self.assertFalse(slow.done())
+                self.assertEqual(slow.result(timeout=3)["status"], "ready")
+                self.assertTrue(ready.wait(timeout=3))
+
+        self.assertEqual([e["archive"] for e in events], ["a2"])
+        self.assertEqual(events[0]["status"], "ready")
+
+    def test_subscriber_that_stops_reading_is_dropped_without_blocking_publish(self) -> None:
+        vm_data = make_manifest().vms["vm1"]
+        server = mib.InlinePreviewServer(vm_data=vm_data, borg=FakeBorgForPreview(delay=0.0))
+        client, served = socket.socketpair()
+        handler = threading.Thread(target=server._handle_connection, args=(served,))
+        handler.start()
+        record = mib.PreviewRecord(status="ready", text="x" * 65536, info=None)
+        try:
+            with client:
+                client.sendall(mib._encode_frame({"op": "subscribe"}))
+                self.assertTrue(self._wait_for(lambda: bool(server._subscribers)))
+
+                started = time.monotonic()
+                for _ in range(2 * mib.PREVIEW_OUTBOX_FRAMES):
+                    server._publish("a1", record)
+                self.assertLess(time.monotonic() - started, 1.0)
+                self.assertTrue(self._wait_for(lambda: not server._subscribers))
+                handler.join(timeout=3.0)
+                self.assertFalse(handler.is_alive())
+        finally:
+            server.stop()
+
+    def test_frames_round_trip_binary_safe_text(self) -> None:
+        left, right = socket.socketpair()
+        with left, right:
+            message = {"text": "line\nwith \x00 nul and \u00fcnicode"}
+            left.sendall(mib._encode_frame(message) * 2)
+            left.shutdown(socket.SHUT_WR)
+
+            self.assertEqual(mib._read_frame(right), message)
+            self.assertEqual(mib._read_frame(right), message)
+            self.assertIsNone(mib._read_frame(right))
+
     def test_timeout_response_when_fetch_is_slow(self) -> None:
         fake_borg = FakeBorgForPreview(delay=0.5)
         vm_data = make_manifest().vms["vm1"]